@@ -3,7 +3,8 @@ import pandas as pd
 import os
 from patents_core.utils.config import load_env, setup_api_keys
 from patents_core.state import AppState
-from patents_core.agent import run_interaction, execute_patent_search_workflow, run_summary_workflow
+from patents_core.agent import run_interaction, execute_patent_search_workflow, run_summary_workflow, rerank_results, fetch_more_results, scored_results
+from patents_core.core.saved_search import save_search
 
 # 環境変数の読み込み
 load_env()
@@ -116,6 +117,11 @@ with col2:
     with st.expander("詳細条件（任意）"):
         app_state.search_query.publication_date_from = st.text_input("公開日（From: YYYYMMDD）", value=app_state.search_query.publication_date_from or "")
         app_state.search_query.publication_date_to = st.text_input("公開日（To: YYYYMMDD）", value=app_state.search_query.publication_date_to or "")
+        country_codes_str = st.text_input("国コード（カンマ区切り。例: JP, US）", value=", ".join(app_state.search_query.country_codes or []))
+        app_state.search_query.country_codes = [c.strip() for c in country_codes_str.split(",") if c.strip()] or None
+        assignees_str = st.text_area("出願人（1行に1つ）", value="\n".join(app_state.search_query.assignees or []), height=80)
+        app_state.search_query.assignees = [a.strip() for a in assignees_str.splitlines() if a.strip()] or None
+        app_state.search_query.max_results_per_country = st.number_input("国ごとの最大取得件数", min_value=1, max_value=1000, value=app_state.search_query.max_results_per_country)
         app_state.search_query.limit = st.number_input("検索件数の上限 (LIMIT)", min_value=1, max_value=1000, value=app_state.search_query.limit)
 
 # --- 検索実行と結果表示 --- 
@@ -143,6 +149,11 @@ with col_sql:
         if app_state.generated_sql:
             st.markdown(f"**SQL解説:** {app_state.sql_explanation}")
             st.code(app_state.generated_sql, language="sql")
+            estimate = app_state.query_cost_estimate
+            if estimate:
+                st.markdown(f"**処理量の見積もり（ドライラン）:** {estimate.total_bytes_processed / 1024 ** 3:.2f} GiB（約 ${estimate.estimated_cost_usd:.2f}）")
+                if estimate.exceeds_limit:
+                    st.warning(f"見積もりが課金バイト数の上限（{estimate.maximum_bytes_billed / 1024 ** 3:.2f} GiB）を超えています。")
             st.markdown(f"**検索条件オブジェクト解説:** {app_state.search_query_explanation}")
         else:
             st.info("SQLはまだ生成されていません。")
@@ -169,14 +180,43 @@ with st.expander("類似度分析の詳細と重み調整", expanded=False):
             w_abstract /= total_weight
             w_claims /= total_weight
     
-    app_state.similarity_weights = {"title": w_title, "abstract": w_abstract, "claims": w_claims}
+    new_weights = {"title": w_title, "abstract": w_abstract, "claims": w_claims}
+    if new_weights != app_state.similarity_weights:
+        app_state.similarity_weights = new_weights
+        # 保持済みの類似度から並び順だけを再計算する（埋め込みの再計算は行わない）
+        st.session_state.app_state = rerank_results(app_state)
     st.write(f"現在の重み: Title={w_title:.2f}, Abstract={w_abstract:.2f}, Claims={w_claims:.2f}")
 
 # 結果表示エリア
 st.header("5. 検索結果")
 if app_state.analyzed_results is not None and not app_state.analyzed_results.empty:
     st.write(f"取得件数: {len(app_state.analyzed_results)}件")
-    
+    if app_state.search_cache_hit:
+        st.caption(f"検索結果キャッシュを使用しました（{app_state.search_cache_age_seconds / 60:.0f}分前の検索結果）")
+
+    # 検索結果の続きを取得（最初の1回だけ候補を検索し、以降は保存済みの候補から読み進める）
+    col_more_n, col_more_button = st.columns([1, 3])
+    with col_more_n:
+        fetch_more_n = st.number_input("追加取得件数", min_value=1, max_value=1000, value=50)
+    with col_more_button:
+        if st.button("さらに取得"):
+            with st.spinner("検索結果の続きを取得・分析中..."):
+                st.session_state.app_state = fetch_more_results(app_state, int(fetch_more_n))
+            st.rerun()
+
+    # 検索条件と結果を保存し、scripts/run_watch.py で新しい公開だけを定期的に再検索できるようにする
+    with st.expander("この検索を保存（新しい公開の定期チェック用）", expanded=False):
+        saved_search_name = st.text_input("保存名", placeholder="例: autonomous_driving_lidar")
+        if st.button("この検索を保存", disabled=not saved_search_name):
+            try:
+                save_search(
+                    saved_search_name, app_state.search_query, app_state.plan_text or "",
+                    scored_results(app_state), app_state.similarity_weights,
+                )
+                st.success(f"「{saved_search_name}」として保存しました。`python scripts/run_watch.py {saved_search_name}` で新しい公開だけを再検索できます。")
+            except Exception as e:
+                st.error(f"検索の保存中にエラーが発生しました: {e}")
+
     display_df = app_state.analyzed_results.copy()
     
     # スコア関連のカラムをフォーマット
@@ -196,7 +236,8 @@ if app_state.analyzed_results is not None and not app_state.analyzed_results.emp
             'score': 'スコア',
             'sim_title': 'タイトル類似度',
             'sim_abstract': '要約類似度',
-            'sim_claims': '請求項類似度'
+            'sim_claims': '請求項類似度',
+            'partially_scored': '部分評価'
         })
     else: # en
         display_df = display_df.rename(columns={
@@ -209,7 +250,8 @@ if app_state.analyzed_results is not None and not app_state.analyzed_results.emp
             'score': 'Score',
             'sim_title': 'Title Similarity',
             'sim_abstract': 'Abstract Similarity',
-            'sim_claims': 'Claims Similarity'
+            'sim_claims': 'Claims Similarity',
+            'partially_scored': 'Partially Scored'
         })
 
     # 表示するカラムを選択
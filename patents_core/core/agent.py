@@ -1,26 +1,50 @@
 from langgraph.graph import StateGraph, END
-from typing import Literal
-from patents_core.core.state import AppState, SearchQuery
-from patents_core.core.tools import build_patent_query, search_patents_in_bigquery
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from typing import Iterable, Iterator, Literal, Optional, Tuple
+from patents_core.core.state import SECTIONS, AppState, QueryCostEstimate, SearchQuery
+from patents_core.core.tools import DEFAULT_BIGQUERY_CONFIG, build_configured_patent_query, estimate_query_cost, get_search_backend, hydrate_claims, is_search_cached, lazy_claims_enabled, iter_search_result_pages
+from patents_core.core.async_search import submit_search
+from patents_core.core.result_cursor import close_result_cursor, fetch_more, open_result_cursor
+from patents_core.core.saved_search import SCORE_COLUMNS, load_saved_search, record_run, search_new_publications
+from patents_core.core.embedding_cache import get_embedding_cache
+from patents_core.core.embedding_pipeline import embed_sections
+from patents_core.core.embedding_backends import create_embeddings_backend, get_embedding_dimensions
+from patents_core.core.scoring import ScoringEngine, impute_similarity, rank, select_cascade_rows, top_k_indices
+from patents_core.utils.config import load_config_section
+from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 import os
+import datetime
+from pathlib import Path
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-import yaml
-from pathlib import Path
-
-def load_similarity_weights():
-    weights_path = Path(__file__).resolve().parents[2] / "config" / "weights.yaml"
-    with open(weights_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-    return config.get("similarity_weights", {"title": 0.4, "abstract": 0.4, "claims": 0.2})
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # --- モデル定義 ---
 model = ChatOpenAI(temperature=0, model="gpt-4o", api_key=os.environ.get("OPENAI_API_KEY"))
-embeddings_model = OpenAIEmbeddings(model="text-embedding-3-small", api_key=os.environ.get("OPENAI_API_KEY"))
-SIMILARITY_WEIGHTS = load_similarity_weights()
+# 埋め込みバックエンド（OpenAI / ローカルCPU）は config/weights.yaml の embedding セクションか環境変数で切り替える
+embeddings_model, EMBEDDING_MODEL_NAME = create_embeddings_backend()
+# top_k: 分析結果として残す上位件数（None の場合は全件を並べ替える）
+# storage_dtype: スコア計算時に埋め込み行列を保持する形式（float32 / float16 / int8）
+DEFAULT_SCORING_CONFIG = {"top_k": None, "storage_dtype": "float32"}
+# カスケード評価: 第1段（first_stage_sections）のスコア上位 top_n 件と score_threshold 以上の行だけ請求項をベクトル化する
+DEFAULT_CASCADE_CONFIG = {
+    "enabled": False,
+    "first_stage_sections": ["title", "abstract"],
+    "top_n": 50,
+    "score_threshold": None,
+}
+
+# 要約: 分析後に自動で要約対象とする上位件数（請求項を後から取得するモードでは、この件数だけ請求項を取得する）
+DEFAULT_SUMMARY_CONFIG = {"max_rows": 20}
+
+# ストリーミング検索: page_size 件ずつ受信・評価し、上位 top_k 件だけをメモリに残す（全行は spill_dir のParquetへ）
+DEFAULT_STREAMING_CONFIG = {
+    "page_size": 500,
+    "top_k": 100,
+    "spill_dir": ".cache/spill",
+}
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
 # --- プロンプトテンプレート ---
 # ルーター用プロンプト
@@ -234,15 +258,29 @@ def generate_query(state: AppState) -> AppState:
     return state
 
 
-def generate_sql_and_explanation(state: AppState) -> AppState:
-    """検索クエリからSQL文と解説を生成する"""
+def generate_sql_and_explanation(state: AppState, submit: bool = True) -> AppState:
+    """
+    検索クエリからSQL文と解説を生成する。
+    submit が True なら検索を先に投入して state.search_handle に保持する（execute_search で結果を受け取る）。
+    ページ単位で検索する stream_search_and_analyze に続ける場合は、検索が二重に実行されないよう False にする。
+    """
     print("--- Node: generate_sql_and_explanation ---")
     state.current_agent_node = "generate_sql_and_explanation"
 
     # 統一されたビルダー関数を使い、SQLとパラメータを生成
-    sql, _ = build_patent_query(state.search_query)
+    sql, _ = build_configured_patent_query(state.search_query)
     state.generated_sql = sql
 
+    # 実行前にドライランで処理量と料金を見積もる（検索結果キャッシュにある検索は実行しないため見積もらない）
+    state.query_cost_estimate = estimate_search_cost(state.search_query)
+
+    # 検索を先に投入し、以下の解説の生成と並行して実行する（結果は execute_search で受け取る）
+    if state.search_handle is not None:
+        state.search_handle.cancel()
+        state.search_handle = None
+    if submit:
+        state.search_handle = submit_search(state.search_query, state.query_cost_estimate)
+
     # 生成されたSQLをユーザー向けに解説
     chain_sql_explain = PROMPT_EXPLAIN_SQL | model
     state.sql_explanation = chain_sql_explain.invoke({"sql": sql}).content
@@ -253,16 +291,142 @@ def generate_sql_and_explanation(state: AppState) -> AppState:
     
     return state
 
+def estimate_search_cost(query: SearchQuery) -> Optional[QueryCostEstimate]:
+    """
+    検索条件をドライランして処理量と料金を見積もる。見積もりに失敗しても検索は続けられるよう None を返す。
+    ローカルの検索バックエンドと、検索結果キャッシュにあってBigQueryを実行しない検索では見積もらない（None）。
+    """
+    if get_search_backend() != "bigquery":
+        return None
+    try:
+        if is_search_cached(query):
+            print("検索結果キャッシュにあるため、ドライランによる見積もりを省略します。")
+            return None
+        return estimate_query_cost(query)
+    except Exception as e:
+        print(f"ドライランによる見積もりに失敗しました: {e}")
+        return None
+
+def warm_plan_embedding(plan_text: str) -> None:
+    """調査方針をベクトル化して埋め込みキャッシュに入れておく（検索の完了を待つ間に行い、分析時はキャッシュから読む）"""
+    embed_sections(
+        pd.DataFrame(), plan_text, embeddings_model, EMBEDDING_MODEL_NAME, get_embedding_cache(),
+        dimensions=get_embedding_dimensions(), sections=(),
+    )
+
 def execute_search(state: AppState) -> AppState:
     print("--- Node: execute_search ---")
     state.current_agent_node = "execute_search"
+
+    # SQL生成時に投入済みの検索を使う。検索条件がその後に編集されていれば、古い検索を中止して投入し直す
+    # （保持している見積もりは編集前の検索条件のものかもしれないため、見積もり直してから上限を確認する）
+    handle = state.search_handle
+    if handle is None or not handle.matches(state.search_query):
+        if handle is not None:
+            handle.cancel()
+        state.query_cost_estimate = estimate_search_cost(state.search_query)
+        handle = submit_search(state.search_query, state.query_cost_estimate)
+    state.search_handle = None
+    # 新しい検索ではカーソルを作り直す（古いカーソルの保存先は削除する）
+    close_result_cursor(state.result_cursor)
+    state.result_cursor = None
+
+    # 検索の実行中に、調査方針のベクトル化を済ませておく
+    plan_text = state.plan_text or "\n".join([msg for role, msg in state.chat_history if role == "user"])
+    if plan_text and not handle.done():
+        try:
+            warm_plan_embedding(plan_text)
+        except Exception as e:
+            print(f"調査方針の事前ベクトル化に失敗しました: {e}")
+
+    timeout = load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)["search_timeout_seconds"]
     try:
-        df = search_patents_in_bigquery(state.search_query)
+        df, cache_age = handle.result(timeout=float(timeout) if timeout else None)
         state.search_results = df
+        state.search_cache_hit = cache_age is not None
+        state.search_cache_age_seconds = cache_age
     except Exception as e:
         state.error = f"検索中にエラーが発生しました: {e}"
     return state
 
+def compute_section_similarities(df: pd.DataFrame, plan_text: str, embedding_stats: dict) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    検索結果の各行について、調査方針とのセクション別コサイン類似度 (行数, [title, abstract, claims]) を計算する。
+
+    カスケード評価が有効な場合は、まず first_stage_sections（既定はタイトルと要約）だけで全行を評価し、
+    上位の行・閾値以上の行だけ残りのセクション（請求項など）をベクトル化する。残りの行のそれらのセクションの類似度は補完し、
+    戻り値の2つ目（部分評価フラグの配列）で True とする。無効な場合（と補完した値がない場合）は None を返す。
+
+    請求項を後から取得するモード（df に claims 列がない、または請求項が未取得の行がある）では常にカスケード評価を行い、
+    第2段で選ばれた行の請求項だけを取得して df の claims 列に書き込む。カスケード評価が無効な場合は、
+    第1段の上位 bigquery.lazy_claims_top_n 件を第2段に選ぶ。
+    """
+    cache = get_embedding_cache()
+    dimensions = get_embedding_dimensions()
+    storage_dtype = load_config_section("scoring", DEFAULT_SCORING_CONFIG)["storage_dtype"]
+    cascade = load_config_section("cascade", DEFAULT_CASCADE_CONFIG)
+    # 請求項を後から取得するモードでは、claims 列がない場合に加えて、未取得（欠損）の行がある場合も取得する
+    # （保存済みの結果に続きを加える場合など、列はあっても新しい行の請求項は未取得のことがある）
+    lazy_claims = "claims" not in df.columns or (lazy_claims_enabled() and bool(df["claims"].isna().any()))
+    if lazy_claims and not cascade["enabled"]:
+        # カスケード評価が無効でも、請求項は第1段の上位 bigquery.lazy_claims_top_n 件だけ取得してベクトル化する
+        lazy_top_n = load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)["lazy_claims_top_n"]
+        cascade = {**cascade, "top_n": lazy_top_n, "score_threshold": None}
+
+    if not cascade["enabled"] and not lazy_claims:
+        # 調査方針と全セクションのテキストを重複を除いて一括でベクトル化する（キャッシュにあるものは再計算しない）
+        plan_embedding, section_embeddings = embed_sections(
+            df, plan_text, embeddings_model, EMBEDDING_MODEL_NAME, cache, embedding_stats, dimensions=dimensions,
+        )
+        # 全セクションのコサイン類似度を1回の行列積で計算する
+        return ScoringEngine(plan_embedding, section_embeddings, storage_dtype=storage_dtype).similarities(), None
+
+    # 第1段: タイトル（と要約）だけで全行を評価する
+    first_sections = tuple(cascade["first_stage_sections"])
+    second_sections = tuple(name for name in SECTIONS if name not in first_sections)
+    if lazy_claims and "claims" in first_sections:
+        df["claims"] = hydrate_claims(df)["claims"]
+    plan_embedding, first_embeddings = embed_sections(
+        df, plan_text, embeddings_model, EMBEDDING_MODEL_NAME, cache, embedding_stats,
+        dimensions=dimensions, sections=first_sections,
+    )
+    first_similarities = ScoringEngine(plan_embedding, first_embeddings, first_sections, storage_dtype).similarities()
+    first_score = first_similarities.mean(axis=1)
+    if not second_sections:
+        # 第1段で全セクションを評価した場合は、補完する値がない
+        return np.ascontiguousarray(first_similarities[:, [first_sections.index(name) for name in SECTIONS]]), None
+    rows = select_cascade_rows(first_score, cascade["top_n"], cascade["score_threshold"])
+
+    # 第2段: 選ばれた行だけ、第1段に含めなかったセクション（請求項など）をベクトル化する
+    if lazy_claims and "claims" in second_sections:
+        df["claims"] = hydrate_claims(df, rows.tolist())["claims"]
+    second_values = np.empty((0, len(second_sections)), dtype=np.float32)
+    if rows.size:
+        plan_embedding, second_embeddings = embed_sections(
+            df.iloc[rows], plan_text, embeddings_model, EMBEDDING_MODEL_NAME, cache, embedding_stats,
+            dimensions=dimensions, sections=second_sections,
+        )
+        second_values = ScoringEngine(plan_embedding, second_embeddings, second_sections, storage_dtype).similarities()
+    embedding_stats["claims_rows_skipped"] = embedding_stats.get("claims_rows_skipped", 0) + len(df) - rows.size
+    print(f"カスケード評価: {', '.join(second_sections)} を{rows.size}/{len(df)}件だけベクトル化しました。")
+
+    # 選ばれなかった行の第2段のセクションは、セクションごとに第1段の類似度から補完する
+    similarities = np.empty((len(df), len(SECTIONS)), dtype=np.float32)
+    for i, name in enumerate(SECTIONS):
+        if name in first_sections:
+            similarities[:, i] = first_similarities[:, first_sections.index(name)]
+        else:
+            similarities[:, i] = impute_similarity(first_similarities, rows, second_values[:, second_sections.index(name)])
+    partially_scored = np.ones(len(df), dtype=bool)
+    partially_scored[rows] = False
+    return similarities, partially_scored
+
+def summary_candidates(analyzed_results: pd.DataFrame) -> list:
+    """スコア順に並んだ分析結果から、要約対象とする上位 summary.max_rows 件の公開番号を返す（None なら全件）"""
+    max_rows = load_config_section("summary", DEFAULT_SUMMARY_CONFIG)["max_rows"]
+    numbers = analyzed_results['publication_number'].tolist()
+    return numbers if max_rows is None else numbers[:int(max_rows)]
+
 def analyze_results(state: AppState) -> AppState:
     """検索結果を分析し、調査方針との類似度を計算する"""
     print("--- Node: analyze_results ---")
@@ -283,43 +447,19 @@ def analyze_results(state: AppState) -> AppState:
         state.selected_patents_for_summary = [] # 要約対象を空にする
         return state
 
-    # 各セクションのテキストを準備
-    titles = df["title"].fillna("").tolist()
-    abstracts = df["abstract"].fillna("").tolist()
-    claims = df["claims"].fillna("").tolist()
-
     try:
-        # 調査方針と各セクションのEmbeddingを計算
-        plan_embedding = embeddings_model.embed_query(plan_text)
-        title_embeddings = embeddings_model.embed_documents(titles)
-        abstract_embeddings = embeddings_model.embed_documents(abstracts)
-        claim_embeddings = embeddings_model.embed_documents(claims)
-
-        # コサイン類似度を計算
-        sim_title = cosine_similarity([plan_embedding], title_embeddings)[0]
-        sim_abstract = cosine_similarity([plan_embedding], abstract_embeddings)[0]
-        sim_claims = cosine_similarity([plan_embedding], claim_embeddings)[0]
-
-        # 重み付け平均でスコアを算出
-        weights = SIMILARITY_WEIGHTS
-        score = (
-            sim_title * weights.get("title", 0.4) +
-            sim_abstract * weights.get("abstract", 0.4) +
-            sim_claims * weights.get("claims", 0.2)
-        )
+        embedding_stats = {"hits": 0, "misses": 0, "tokens_saved": 0}
+        similarities, partially_scored = compute_section_similarities(df, plan_text, embedding_stats)
+        state.embedding_stats = embedding_stats
+        print(f"埋め込みキャッシュ: ヒット {embedding_stats['hits']}件 / ミス {embedding_stats['misses']}件")
 
-        # 結果をDataFrameに追加
-        analyzed_df = df.copy()
-        analyzed_df["sim_title"] = sim_title
-        analyzed_df["sim_abstract"] = sim_abstract
-        analyzed_df["sim_claims"] = sim_claims
-        analyzed_df["score"] = score
-        
-        # スコアで降順にソート
-        state.analyzed_results = analyzed_df.sort_values(by="score", ascending=False).reset_index(drop=True)
-        
-        # すべての検索結果を要約対象とする
-        state.selected_patents_for_summary = state.analyzed_results['publication_number'].tolist()
+        # セクション別類似度を状態に保持する（重み変更時の再ランキング用）
+        state.section_similarities = similarities
+        state.partially_scored = partially_scored
+        state = rerank_results(state)
+
+        # スコア上位の行を要約対象とする
+        state.selected_patents_for_summary = summary_candidates(state.analyzed_results)
 
     except Exception as e:
         state.error = f"埋め込みベクトルの計算または類似度計算中にエラーが発生しました: {e}"
@@ -329,6 +469,216 @@ def analyze_results(state: AppState) -> AppState:
     print("分析が完了しました。")
     return state
 
+def rerank_results(state: AppState) -> AppState:
+    """
+    保持済みのセクション別類似度と現在の重み（state.similarity_weights）から、スコアと並び順だけを再計算する。
+    埋め込みは再計算しないため、UIの重みスライダー操作に即座に追従できる。
+    """
+    if state.search_results is None or state.section_similarities is None:
+        return state
+    top_k = load_config_section("scoring", DEFAULT_SCORING_CONFIG)["top_k"]
+    state.analyzed_results = scored_results(state, top_k)
+    return state
+
+def scored_results(state: AppState, top_k: Optional[int] = None) -> pd.DataFrame:
+    """
+    検索結果にセクション別類似度・スコア（・部分評価フラグ）の列を加え、スコア順に並べたDataFrameを返す。
+    top_k を省略すると全行を返す（保存済みの検索には、表示用に上位k件に絞る前の全行を保存する）。
+    """
+    df = state.search_results
+    order, score = rank(state.section_similarities, state.similarity_weights, top_k)
+    # 列ごとに並べ替えてから組み立てる（DataFrame全体のiloc + 列追加より高速）
+    columns = {col: df[col].array.take(order) for col in df.columns}
+    columns["sim_title"] = state.section_similarities[order, 0]
+    columns["sim_abstract"] = state.section_similarities[order, 1]
+    columns["sim_claims"] = state.section_similarities[order, 2]
+    columns["score"] = score[order]
+    if state.partially_scored is not None:
+        columns["partially_scored"] = state.partially_scored[order]
+    return pd.DataFrame(columns, copy=False)
+
+def append_scored_rows(state: AppState, new_df: pd.DataFrame, plan_text: str) -> AppState:
+    """
+    新しく取得した行だけをベクトル化・スコア付けし、検索結果・セクション別類似度・部分評価フラグに加えて並べ直す。
+    請求項を後から取得するモードでは、新しい行の請求項は compute_section_similarities が必要な行だけ取得する。
+    """
+    new_df = new_df.reset_index(drop=True)
+    embedding_stats = dict(state.embedding_stats)
+    similarities, partially_scored = compute_section_similarities(new_df, plan_text, embedding_stats)
+    state.embedding_stats = embedding_stats
+
+    if state.search_results is None or state.section_similarities is None:
+        state.search_results = new_df
+        state.section_similarities = similarities
+        state.partially_scored = partially_scored
+        return rerank_results(state)
+
+    previous_rows = len(state.search_results)
+    if partially_scored is not None or state.partially_scored is not None:
+        old_flags = state.partially_scored if state.partially_scored is not None else np.zeros(previous_rows, dtype=bool)
+        new_flags = partially_scored if partially_scored is not None else np.zeros(len(new_df), dtype=bool)
+        state.partially_scored = np.concatenate([old_flags, new_flags])
+    # 既存の結果にあって新しい行にない列（請求項を取得しなかった場合の claims など）は、同じ型の欠損値で埋める
+    columns = state.search_results.columns
+    for column in columns:
+        if column not in new_df.columns:
+            new_df[column] = pd.Series(pd.NA, index=new_df.index, dtype=state.search_results[column].dtype)
+    state.search_results = pd.concat([state.search_results, new_df[columns]], ignore_index=True)
+    state.section_similarities = np.vstack([state.section_similarities, similarities])
+    return rerank_results(state)
+
+def fetch_more_results(state: AppState, n: int) -> AppState:
+    """
+    検索結果の続きを n 件取得し、新しい行だけをベクトル化・スコア付けして analyzed_results に加える。
+    最初の呼び出しで、検索条件を広げた候補を1回だけ検索してカーソルを作る（以降は公開データセットを走査しない）。
+    """
+    print("--- fetch_more_results ---")
+    if state.search_results is None or state.section_similarities is None:
+        state.error = "先に検索を実行してください。"
+        return state
+    plan_text = state.plan_text or "\n".join([msg for role, msg in state.chat_history if role == "user"])
+
+    try:
+        if state.result_cursor is None:
+            state.result_cursor = open_result_cursor(state.search_query, state.search_results["publication_number"].tolist())
+        new_df = fetch_more(state.result_cursor, n)
+        if new_df.empty:
+            print("これ以上の検索結果はありません。")
+            return state
+
+        state = append_scored_rows(state, new_df, plan_text)
+        print(f"{len(new_df)}件を追加しました（合計 {len(state.search_results)}件）。")
+    except Exception as e:
+        state.error = f"検索結果の続きの取得中にエラーが発生しました: {e}"
+    return state
+
+def refresh_saved_search(name: str) -> AppState:
+    """
+    保存済みの検索を再実行する。前回の最新の公開日（ウォーターマーク）以降だけを検索し、
+    取得済みでない行だけをベクトル化・スコア付けして、保存済みの結果に加えて並べ直し、保存し直す。
+    保存するのは全行（scored_results）で、戻り値の analyzed_results は通常の分析結果と同じく scoring.top_k 件に絞った表示用の結果。
+    """
+    print(f"--- refresh_saved_search: {name} ---")
+    saved, stored = load_saved_search(name)
+    state = AppState(search_query=saved.search_query, plan_text=saved.plan_text, similarity_weights=saved.similarity_weights)
+    if not stored.empty:
+        state.search_results = stored.drop(columns=[col for col in SCORE_COLUMNS if col in stored.columns])
+        state.section_similarities = stored[["sim_title", "sim_abstract", "sim_claims"]].to_numpy(dtype=np.float32)
+        if "partially_scored" in stored.columns:
+            state.partially_scored = stored["partially_scored"].to_numpy(dtype=bool)
+
+    try:
+        new_df = search_new_publications(saved)
+        if new_df.empty:
+            print("新しい公開はありません。")
+            state = rerank_results(state)
+            if state.analyzed_results is None:
+                state.analyzed_results = stored
+            record_run(saved, stored, new_df)
+            return state
+
+        state = append_scored_rows(state, new_df, saved.plan_text)
+        record_run(saved, scored_results(state), new_df)
+        print(f"{len(new_df)}件を追加しました（合計 {len(state.search_results)}件、ウォーターマーク: {saved.watermark}）。")
+    except Exception as e:
+        state.error = f"保存済みの検索の再実行中にエラーが発生しました: {e}"
+    return state
+
+def stream_search_and_analyze(state: AppState, pages: Optional[Iterable[pd.DataFrame]] = None) -> Iterator[AppState]:
+    """
+    検索結果をページ単位で受け取り、ページごとにベクトル化・スコア計算して上位k件を更新しながら状態を返すジェネレータ。
+    全行はスコア付きでParquetファイルに書き出し、メモリには上位k件だけを保持する。
+    pages を省略すると、state.search_query でBigQueryを検索してページを受信する。
+    """
+    print("--- Node: stream_search_and_analyze ---")
+    state.current_agent_node = "stream_search_and_analyze"
+    config = load_config_section("streaming", DEFAULT_STREAMING_CONFIG)
+    top_k = int(config["top_k"])
+
+    plan_text = state.plan_text or "\n".join([msg for role, msg in state.chat_history if role == "user"])
+    if not plan_text:
+        state.error = "類似度計算の基準となる調査方針またはユーザー入力がありません。"
+        return
+
+    if pages is None:
+        # 投入済みの検索があれば中止する（ここで別にページ単位の検索を実行するため、残すと二重に課金される）
+        if state.search_handle is not None:
+            state.search_handle.cancel()
+            state.search_handle = None
+        pages = iter_search_result_pages(state.search_query, int(config["page_size"]))
+
+    spill_dir = Path(config["spill_dir"])
+    if not spill_dir.is_absolute():
+        spill_dir = PROJECT_ROOT / spill_dir
+    spill_dir.mkdir(parents=True, exist_ok=True)
+    spill_path = spill_dir / f"results_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.parquet"
+
+    embedding_stats = {"hits": 0, "misses": 0, "tokens_saved": 0}
+    writer = None
+    top_df = None
+    source_columns = None
+    cascade_used = False
+    try:
+        for page in pages:
+            if page.empty:
+                continue
+            page = page.reset_index(drop=True)
+            source_columns = source_columns or list(page.columns)
+            similarities, partially_scored = compute_section_similarities(page, plan_text, embedding_stats)
+            cascade_used = partially_scored is not None
+            _, score = rank(similarities, state.similarity_weights)
+            scored = page.assign(
+                sim_title=similarities[:, 0],
+                sim_abstract=similarities[:, 1],
+                sim_claims=similarities[:, 2],
+                score=score,
+                partially_scored=partially_scored if partially_scored is not None else False,
+            )
+
+            # 全行をディスクへ書き出す（スキーマは最初のページに合わせる）
+            table = pa.Table.from_pandas(scored, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(str(spill_path), table.schema)
+            else:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+
+            # これまでの上位k件と今回のページを合わせ、上位k件だけを残す
+            candidates = scored if top_df is None else pd.concat([top_df, scored], ignore_index=True)
+            keep = top_k_indices(candidates["score"].to_numpy(), top_k)
+            top_df = candidates.iloc[keep].reset_index(drop=True)
+
+            state.analyzed_results = top_df
+            state.embedding_stats = embedding_stats
+            yield state
+    except Exception as e:
+        state.error = f"ストリーミング分析中にエラーが発生しました: {e}"
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if top_df is None:
+        print("分析対象の検索結果がないため、スキップします。")
+        state.analyzed_results = pd.DataFrame()
+        state.selected_patents_for_summary = []
+        return
+
+    # 上位k件を通常の分析結果と同じ形で状態に残す（重み変更時の再ランキングは上位k件の範囲で行う）
+    state.search_results = top_df[source_columns]
+    state.section_similarities = top_df[["sim_title", "sim_abstract", "sim_claims"]].to_numpy(dtype=np.float32)
+    state.partially_scored = top_df["partially_scored"].to_numpy(dtype=bool) if cascade_used else None
+    state.spilled_results_path = str(spill_path)
+    state = rerank_results(state)
+    state.selected_patents_for_summary = summary_candidates(state.analyzed_results)
+    print(f"ストリーミング分析が完了しました。全件は {spill_path} に保存しました。")
+    yield state
+
+def run_streaming_search(state: AppState) -> AppState:
+    """stream_search_and_analyze を最後まで実行し、最終状態を返す"""
+    for state in stream_search_and_analyze(state):
+        pass
+    return state
+
 def summarize_selected_patents(state: AppState) -> AppState:
     print("--- Node: summarize_selected_patents ---")
     state.current_agent_node = "summarize_selected_patents"
@@ -343,6 +693,10 @@ def summarize_selected_patents(state: AppState) -> AppState:
         state.summary_result = "選択された特許が見つかりません。"
         return state
 
+    # 請求項を後から取得するモードでは、要約対象の行の請求項（類似度計算で未取得のもの）だけをここで取得する
+    if lazy_claims_enabled():
+        selected_df = hydrate_claims(selected_df)
+
     patent_list_str = selected_df.to_string(index=False)
     chain = PROMPT_SUMMARIZE_PATENTS | model
     state.summary_result = chain.invoke({"patent_list": patent_list_str, "plan_text": state.plan_text}).content
@@ -378,6 +732,15 @@ search_execution_workflow.add_edge("analyze_results", "summarize_selected_patent
 search_execution_workflow.add_edge("summarize_selected_patents", END) # 要約の後に終了
 search_execution_app = search_execution_workflow.compile()
 
+# 検索結果が用意済みの場合（search_patents_batch でまとめて検索した評価など）に、分析と要約だけを行う
+analysis_workflow = StateGraph(AppState)
+analysis_workflow.add_node("analyze_results", analyze_results)
+analysis_workflow.add_node("summarize_selected_patents", summarize_selected_patents)
+analysis_workflow.set_entry_point("analyze_results")
+analysis_workflow.add_edge("analyze_results", "summarize_selected_patents")
+analysis_workflow.add_edge("summarize_selected_patents", END)
+analysis_app = analysis_workflow.compile()
+
 synopsis_workflow = StateGraph(AppState)
 synopsis_workflow.add_node("summarize_selected_patents", summarize_selected_patents)
 synopsis_workflow.set_entry_point("summarize_selected_patents")
@@ -393,6 +756,11 @@ def execute_patent_search_workflow(state: AppState) -> AppState:
     result_dict = search_execution_app.invoke(state)
     return AppState(**result_dict)
 
+def run_analysis_workflow(state: AppState) -> AppState:
+    """state.search_results に設定済みの検索結果を分析・要約する（検索は実行しない）"""
+    result_dict = analysis_app.invoke(state)
+    return AppState(**result_dict)
+
 def run_summary_workflow(state: AppState) -> AppState:
     result_dict = synopsis_app.invoke(state)
     return AppState(**result_dict)
\ No newline at end of file
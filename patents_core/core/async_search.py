@@ -0,0 +1,128 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from patents_core.core.bigquery_client import get_bigquery_client
+from patents_core.core.search_cache import canonicalize_search_query, get_search_cache
+from patents_core.core.state import QueryCostEstimate, SearchQuery
+from patents_core.core.tools import (
+    check_query_cost_limit,
+    date_sharding_enabled,
+    fetch_search_job_results,
+    local_search_backend_enabled,
+    search_cache_key,
+    search_patents_with_cache,
+    submit_search_job,
+)
+
+# 結果の取得（ジョブの完了待ちとダウンロード）を行うワーカースレッド数
+_MAX_WORKERS = 4
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="patent-search")
+        return _executor
+
+
+class SearchHandle:
+    """
+    投入済みの検索のハンドル。結果は (検索結果, キャッシュヒット時の経過秒数。ミスなら None) で、
+    done() でのポーリング、result(timeout) での待機、await による asyncio からの待機、cancel() での中止ができる。
+    """
+
+    def __init__(self, query: SearchQuery, future: Future, query_job=None):
+        self.query = canonicalize_search_query(query)
+        self.future = future
+        self.query_job = query_job
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def matches(self, query: SearchQuery) -> bool:
+        """このハンドルが、指定した検索条件（正規形で比較）の検索かどうか"""
+        return canonicalize_search_query(query) == self.query
+
+    def cancel(self) -> bool:
+        """
+        検索を中止する。未実行の取得処理は取り消し、BigQueryのジョブが実行中ならジョブのキャンセルを要求する。
+        中止できた（またはキャンセルを要求した）場合は True を返す。
+        """
+        cancelled = self.future.cancel()
+        if self.query_job is not None and not self.query_job.done():
+            try:
+                self.query_job.cancel()
+                cancelled = True
+                print(f"BigQueryのジョブのキャンセルを要求しました: {self.query_job.job_id}")
+            except Exception as e:
+                print(f"BigQueryのジョブのキャンセルに失敗しました: {e}")
+        return cancelled
+
+    def result(self, timeout: Optional[float] = None) -> Tuple[pd.DataFrame, Optional[float]]:
+        """
+        検索の完了を待って結果を返す。timeout 秒以内に終わらなければ検索を中止して TimeoutError を送出する。
+        検索中のエラーはそのまま送出する。中止された検索では CancelledError を送出する。
+        """
+        try:
+            return self.future.result(timeout)
+        except FutureTimeoutError:
+            self.cancel()
+            raise TimeoutError(f"検索が{timeout:.0f}秒以内に終わらなかったため、中止しました。")
+
+    def __await__(self):
+        return asyncio.wrap_future(self.future).__await__()
+
+
+def _completed(value=None, error: Optional[BaseException] = None) -> Future:
+    future: Future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+    return future
+
+
+def _fetch_and_cache(query_job, client, key: str) -> Tuple[pd.DataFrame, Optional[float]]:
+    """ジョブの完了を待って結果を取得し、空でなければ検索結果キャッシュに保存する（ワーカースレッドで呼ばれる）"""
+    results_df = fetch_search_job_results(query_job, client)
+    print(f"{len(results_df)}件の特許が見つかりました。")
+    cache = get_search_cache()
+    if cache is not None and not results_df.empty:
+        cache.put(key, results_df)
+    return results_df, None
+
+
+def submit_search(_query: SearchQuery, cost_estimate: Optional[QueryCostEstimate] = None) -> SearchHandle:
+    """
+    search_patents_with_cache と同じ検索を、完了を待たずに開始してハンドルを返す（例外は送出せず、result() で送出する）。
+    検索結果キャッシュにあれば完了済みのハンドルを返す。なければBigQueryにジョブを投入し、
+    結果の取得をワーカースレッドで行う。ローカルの検索バックエンドと年ごとの分割検索では、検索全体をワーカースレッドで行う。
+    """
+    if local_search_backend_enabled() or date_sharding_enabled():
+        return SearchHandle(_query, _get_executor().submit(search_patents_with_cache, _query, cost_estimate))
+
+    try:
+        cache = get_search_cache()
+        key = search_cache_key(_query)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            results_df, age_seconds = cached
+            print(f"--- Search cache hit ({len(results_df)}件, {age_seconds:.0f}秒前の結果) ---")
+            return SearchHandle(_query, _completed((results_df, age_seconds)))
+
+        check_query_cost_limit(cost_estimate)
+        print("--- Submitting BigQuery Search ---")
+        client = get_bigquery_client()
+        query_job = submit_search_job(_query, client)
+    except Exception as e:
+        return SearchHandle(_query, _completed(error=e))
+    return SearchHandle(_query, _get_executor().submit(_fetch_and_cache, query_job, client, key), query_job)
+
@@ -0,0 +1,81 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from google.cloud.bigquery import Client
+
+# 現在の認証情報のクライアント: (パス, ファイルの更新時刻, BigQueryクライアント, Storage Read APIクライアント)
+# setup_api_keys は入力のたびに新しい一時ファイルを作るため、認証情報ごとには持たず、変わったら閉じて置き換える
+_current: Optional[Tuple[Optional[str], Optional[float], Client, object]] = None
+_lock = threading.Lock()
+_stats = {"clients_created": 0, "client_reuses": 0, "clients_closed": 0, "storage_clients_created": 0}
+
+
+def _credentials_key() -> Tuple[Optional[str], Optional[float]]:
+    """現在の GOOGLE_APPLICATION_CREDENTIALS のパスと、そのファイルの更新時刻を返す"""
+    path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    try:
+        mtime = os.path.getmtime(path) if path else None
+    except OSError:
+        mtime = None
+    return path, mtime
+
+
+def _close(client: Client, storage_client) -> None:
+    try:
+        client.close()
+        if storage_client is not None:
+            storage_client.transport.close()
+    except Exception as e:
+        print(f"BigQueryクライアントのクローズに失敗しました: {e}")
+    _stats["clients_closed"] += 1
+
+
+def get_bigquery_client() -> Client:
+    """
+    BigQueryクライアント（認証済みのHTTPセッションを含む）を使い回して返す。
+    GOOGLE_APPLICATION_CREDENTIALS のパスが変わった場合や、ファイルが更新された場合は、古いクライアントを閉じて作り直す。
+    スレッドセーフ。
+    """
+    global _current
+    path, mtime = _credentials_key()
+    with _lock:
+        if _current is not None and _current[:2] == (path, mtime):
+            _stats["client_reuses"] += 1
+            return _current[2]
+        if _current is not None:
+            _close(_current[2], _current[3])
+            _current = None
+        client = Client()
+        _current = (path, mtime, client, None)
+        _stats["clients_created"] += 1
+        print(f"BigQueryクライアントを作成しました（認証情報: {path or 'デフォルト'}）")
+        return client
+
+
+def get_bqstorage_client(client: Client):
+    """
+    get_bigquery_client で得たクライアントと同じ認証情報を使う BigQuery Storage Read API クライアントを使い回して返す。
+    google-cloud-bigquery-storage がインストールされていない場合は None を返す。
+    """
+    global _current
+    try:
+        from google.cloud import bigquery_storage
+    except ImportError:
+        return None
+    with _lock:
+        if _current is not None and _current[2] is client:
+            path, mtime, _, storage_client = _current
+            if storage_client is None:
+                storage_client = bigquery_storage.BigQueryReadClient(credentials=client._credentials)
+                _current = (path, mtime, client, storage_client)
+                _stats["storage_clients_created"] += 1
+            return storage_client
+    # 現在のクライアント以外（作り直す前の古いクライアントなど）の場合は使い回さずに作成する
+    return bigquery_storage.BigQueryReadClient(credentials=client._credentials)
+
+
+def get_client_stats() -> Dict[str, int]:
+    """クライアントの作成回数と再利用回数を返す"""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,171 @@
+import os
+import re
+import unicodedata
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from patents_core.utils.config import load_config_section
+
+# backend: "openai"（既定）/ "hashing"（特徴ハッシング, 依存なし）/ "sentence_transformers"（ローカルモデル）
+DEFAULT_EMBEDDING_CONFIG = {
+    "backend": "openai",
+    "openai_model": "text-embedding-3-small",
+    # dimensions: スコア計算に使う次元数（先頭から切り詰めて再正規化する。None なら全次元）
+    # api_dimensions: OpenAI API に短縮した次元で出力させる場合の次元数（None なら全次元を取得しキャッシュする）
+    "dimensions": None,
+    "api_dimensions": None,
+    "hashing_dimensions": 1024,
+    "sentence_transformer_model": "intfloat/multilingual-e5-small",
+    "batch_size": 64,
+    "max_workers": 4,
+}
+
+# OpenAI の埋め込みモデルが api_dimensions を指定しない場合に出力する次元数
+OPENAI_NATIVE_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿]+")
+
+
+def _tokenize(text: str) -> List[str]:
+    """英数字は単語単位、日本語（かな・漢字）は文字bigram単位でトークン化する"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    tokens = _WORD_PATTERN.findall(text)
+    for run in _CJK_PATTERN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    特徴ハッシングによるローカルCPU埋め込み。
+    ネットワークやAPIキーが不要なため、閉域環境での実行や大規模な結果集合の再ランキングに使う。
+    """
+
+    def __init__(self, dimensions: int = 1024, batch_size: int = 64, max_workers: int = 4):
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        tokens = _tokenize(text)
+        if not tokens:
+            return np.zeros(self.dimensions, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint32, count=len(tokens))
+        # 下位ビットで次元を、最上位ビットで符号を決める（符号付きハッシングで衝突の偏りを抑える）
+        index = (hashes % self.dimensions).astype(np.int64)
+        signs = np.where(hashes >> 31, -1.0, 1.0)
+        vector = np.bincount(index, weights=signs, minlength=self.dimensions)
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm > 0 else vector).astype(np.float32)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(t).tolist() for t in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(texts)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self._embed_batch, batches)
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_one(text).tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """sentence-transformers の多言語モデルによるローカルCPU埋め込み（任意の依存パッケージ）"""
+
+    def __init__(self, model_name: str, batch_size: int = 64, max_workers: int = 4):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "sentence_transformers バックエンドを使うには `pip install sentence-transformers` が必要です。"
+            ) from e
+        try:
+            import torch
+            torch.set_num_threads(max_workers)
+        except ImportError:
+            pass
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True, show_progress_bar=False)
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_embeddings_backend() -> Tuple[Embeddings, str]:
+    """
+    設定に従って埋め込みバックエンドを生成し、(モデル, キャッシュキー用のモデル名) を返す。
+    バックエンドは環境変数 PATENTS_EMBEDDING_BACKEND、なければ config/weights.yaml の embedding.backend で選ぶ。
+    """
+    config = load_config_section("embedding", DEFAULT_EMBEDDING_CONFIG)
+    backend = os.environ.get("PATENTS_EMBEDDING_BACKEND") or config["backend"]
+    batch_size = int(config["batch_size"])
+    max_workers = int(config["max_workers"])
+
+    if backend == "hashing":
+        dimensions = int(config["hashing_dimensions"])
+        return HashingEmbeddings(dimensions, batch_size, max_workers), f"hashing-{dimensions}"
+    if backend == "sentence_transformers":
+        model_name = config["sentence_transformer_model"]
+        return SentenceTransformerEmbeddings(model_name, batch_size, max_workers), f"st:{model_name}"
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        from patents_core.core.embedding_pipeline import DEFAULT_BATCH_CONFIG
+
+        model_name = config["openai_model"]
+        # バッチ分割は embed_sections 側で行うため、LangChain側では分割しないよう chunk_size を上限に合わせる
+        api_dimensions = config["api_dimensions"]
+        embeddings = OpenAIEmbeddings(
+            model=model_name,
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            chunk_size=int(load_config_section("embedding_batch", DEFAULT_BATCH_CONFIG)["max_inputs_per_request"]),
+            dimensions=int(api_dimensions) if api_dimensions else None,
+        )
+        return embeddings, model_name
+    raise ValueError(f"未知の埋め込みバックエンドです: {backend}")
+
+
+def native_dimensions(embeddings_model: Embeddings) -> Optional[int]:
+    """
+    バックエンドが出力するベクトルの次元数を返す（分からなければ None）。
+    OpenAI で api_dimensions を指定した場合は、その短縮した次元数。
+    """
+    if isinstance(embeddings_model, HashingEmbeddings):
+        return embeddings_model.dimensions
+    if isinstance(embeddings_model, SentenceTransformerEmbeddings):
+        return int(embeddings_model.model.get_sentence_embedding_dimension())
+    # OpenAIEmbeddings は dimensions（API に指定した次元数）と model を持つ
+    dimensions = getattr(embeddings_model, "dimensions", None)
+    if dimensions:
+        return int(dimensions)
+    return OPENAI_NATIVE_DIMENSIONS.get(getattr(embeddings_model, "model", None))
+
+
+def get_embedding_dimensions() -> Optional[int]:
+    """
+    スコア計算に使う埋め込みの次元数を返す（None は全次元）。
+    環境変数 PATENTS_EMBEDDING_DIMENSIONS、なければ config/weights.yaml の embedding.dimensions を使う。
+    """
+    config = load_config_section("embedding", DEFAULT_EMBEDDING_CONFIG)
+    dimensions = os.environ.get("PATENTS_EMBEDDING_DIMENSIONS") or config["dimensions"] or config["api_dimensions"]
+    return int(dimensions) if dimensions else None
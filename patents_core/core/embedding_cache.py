@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from patents_core.core.quantization import dequantize_vector, quantize_vector
+from patents_core.utils.config import load_config_section
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+DEFAULT_CACHE_CONFIG = {
+    "path": ".cache/embeddings.sqlite3",
+    "max_megabytes": 512,
+    "storage_dtype": "float16",
+}
+
+
+def normalize_text(text: str) -> str:
+    """キャッシュキー用にテキストを正規化する（NFKC・空白の圧縮・前後の空白除去）"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text: str) -> str:
+    """正規化したテキストのSHA-256ハッシュを返す"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    (埋め込みモデル名, 正規化テキストのハッシュ) をキーとする埋め込みベクトルの永続キャッシュ。
+    SQLiteに保存し、合計サイズが上限を超えたら最終アクセスの古いものから削除する（LRU）。
+    ベクトルは storage_dtype（float32 / float16 / int8）に量子化して保存する。
+    Streamlitの複数セッションやスクリプトから共有されるため、操作はロックで直列化する。
+    """
+
+    def __init__(self, path: Path, max_bytes: int, storage_dtype: str = "float32"):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.storage_dtype = storage_dtype
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                dtype TEXT NOT NULL DEFAULT 'float32',
+                scale REAL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        # 量子化導入前に作成されたキャッシュには dtype / scale 列を追加する
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "dtype" not in columns:
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN dtype TEXT NOT NULL DEFAULT 'float32'")
+        if "scale" not in columns:
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN scale REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: List[str], min_dim: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        ハッシュのリストに対応するベクトルを取得する。見つからないものは結果に含まれない。
+        min_dim を指定すると、それより次元数の小さいベクトルは見つからなかったものとして扱う。
+        """
+        found: Dict[str, np.ndarray] = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        with self._lock:
+            # SQLiteの変数上限を超えないよう分割して問い合わせる
+            for i in range(0, len(unique_hashes), 500):
+                chunk = unique_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector, dtype, scale FROM embeddings WHERE model = ? AND dim >= ? AND text_hash IN ({placeholders})",
+                    [model, min_dim or 0, *chunk],
+                ).fetchall()
+                for h, blob, dtype, scale in rows:
+                    found[h] = dequantize_vector(blob, dtype, scale)
+            self.hits += len(found)
+            self.misses += len(unique_hashes) - len(found)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        """
+        ハッシュとベクトルの組を保存し、必要に応じてLRU削除を行う。
+        既により次元数の大きいベクトルが保存されている場合は上書きしない（短い次元はそこから切り出せるため）。
+        """
+        if not vectors:
+            return
+        now = time.time()
+        rows = []
+        for h, vec in vectors.items():
+            blob, scale = quantize_vector(vec, self.storage_dtype)
+            rows.append((model, h, len(vec), blob, self.storage_dtype, scale, len(blob), now))
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO embeddings (model, text_hash, dim, vector, dtype, scale, nbytes, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (model, text_hash) DO UPDATE SET
+                    dim = excluded.dim, vector = excluded.vector, dtype = excluded.dtype,
+                    scale = excluded.scale, nbytes = excluded.nbytes, last_access = excluded.last_access
+                WHERE excluded.dim >= embeddings.dim
+                """,
+                rows,
+            )
+            self._conn.commit()
+            self._evict_if_needed()
+
+    def _evict_if_needed(self) -> None:
+        """合計サイズが上限を超えていれば、上限の9割に収まるまで古いエントリを削除する（ロック取得済みで呼ぶ）"""
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT model, text_hash, nbytes FROM embeddings ORDER BY last_access ASC").fetchall()
+        to_delete = []
+        for model, h, nbytes in rows:
+            if total <= target:
+                break
+            to_delete.append((model, h))
+            total -= nbytes
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", to_delete)
+        self._conn.commit()
+        print(f"埋め込みキャッシュから{len(to_delete)}件を削除しました（LRU）。")
+
+    def stats(self) -> Dict[str, int]:
+        """累計のヒット数・ミス数と、現在のエントリ数・合計バイト数を返す"""
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    プロセス内で共有される既定のキャッシュを返す。
+    パスは環境変数 PATENTS_EMBEDDING_CACHE、なければ config/weights.yaml の embedding_cache.path を使う。
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            config = load_config_section("embedding_cache", DEFAULT_CACHE_CONFIG)
+            path = Path(os.environ.get("PATENTS_EMBEDDING_CACHE") or config["path"])
+            if not path.is_absolute():
+                path = PROJECT_ROOT / path
+            max_bytes = int(float(config["max_megabytes"]) * 1024 * 1024)
+            _default_cache = EmbeddingCache(path, max_bytes, config["storage_dtype"])
+        return _default_cache
@@ -0,0 +1,184 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from patents_core.core.embedding_backends import native_dimensions
+from patents_core.core.embedding_cache import EmbeddingCache, text_hash
+from patents_core.core.state import SECTIONS
+from patents_core.core.text_budget import DEFAULT_BUDGET_CONFIG, apply_text_budget, count_tokens, truncate_tokens
+from patents_core.utils.config import load_config_section
+
+# OpenAI Embeddings API の1リクエストあたりの上限に合わせた既定値
+DEFAULT_BATCH_CONFIG = {
+    "max_tokens_per_request": 300000,
+    "max_inputs_per_request": 2048,
+    "max_tokens_per_input": 8191,
+    "max_concurrency": 4,
+    "min_inputs_per_request": 256,
+}
+
+
+def pack_batches(texts: List[str], token_counts: List[int], max_tokens: int, max_inputs: int) -> List[List[int]]:
+    """
+    テキストを先頭から順に、1リクエストあたりのトークン数と件数の上限に収まるよう詰める。
+    戻り値は各バッチに含まれるテキストのインデックスのリスト。
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+    for i, n_tokens in enumerate(token_counts):
+        if current and (current_tokens + n_tokens > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += n_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _aembed_batch(embeddings_model, texts: List[str], semaphore: asyncio.Semaphore) -> List[List[float]]:
+    """1バッチ分を非同期でベクトル化する。非同期APIを持たないバックエンドはスレッドで実行する"""
+    async with semaphore:
+        if hasattr(embeddings_model, "aembed_documents"):
+            return await embeddings_model.aembed_documents(texts)
+        return await asyncio.to_thread(embeddings_model.embed_documents, texts)
+
+
+async def aembed_texts(embeddings_model, texts: List[str], batches: List[List[int]], max_concurrency: int) -> List[List[List[float]]]:
+    """バッチ群を同時実行数の上限付きで並行にベクトル化し、バッチ順に結果を返す"""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [_aembed_batch(embeddings_model, [texts[i] for i in batch], semaphore) for batch in batches]
+    return await asyncio.gather(*tasks)
+
+
+def run_coroutine(coro):
+    """
+    同期コードからコルーチンを実行する。
+    既にイベントループが動いているスレッドから呼ばれた場合は、別スレッドで新しいループを回す。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+def embed_sections(
+    df: pd.DataFrame,
+    plan_text: str,
+    embeddings_model,
+    model_name: str,
+    cache: EmbeddingCache,
+    stats: Optional[Dict[str, int]] = None,
+    dimensions: Optional[int] = None,
+    sections: Sequence[str] = SECTIONS,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    調査方針と全セクション（タイトル・要約・請求項）のテキストを一つにまとめてベクトル化する。
+
+    1. 各セクションのテキストをトークン予算内に収める（請求項は第1請求項の抽出またはチャンク分割）
+    2. 全テキストを平坦化し、空文字と重複を除く
+    3. 永続キャッシュにないテキストだけをトークン数に基づいてバッチに詰め、まとめて送信する
+    4. 得られたベクトルを行・セクションに割り戻す（チャンクはプーリング、空文字はゼロベクトル）
+
+    dimensions を指定すると、各ベクトルの先頭 dimensions 次元だけを使う（再正規化はスコア計算時に行う）。
+    指定しなければバックエンドの出力次元をすべて使い、それより短いキャッシュのベクトルは使わない。
+    sections で対象セクションを絞ると、それ以外のセクションはベクトル化しない（カスケード評価用）。
+    戻り値は (調査方針のベクトル, {セクション名: (行数, 次元) の行列})。
+    """
+    config = load_config_section("embedding_batch", DEFAULT_BATCH_CONFIG)
+    budget_config = load_config_section("text_budget", DEFAULT_BUDGET_CONFIG)
+    max_tokens_per_input = int(config["max_tokens_per_input"])
+
+    # セクションごとにトークン予算を適用する（各セルはベクトル化するテキストのリストになる）
+    budget_stats: Dict[str, int] = {}
+    section_hashes: Dict[str, List[List[str]]] = {}
+    unique_texts: Dict[str, str] = {text_hash(plan_text): plan_text}
+    for name in sections:
+        cells = []
+        for text in df[name].fillna("").astype(str).tolist():
+            pieces = apply_text_budget(name, text, budget_config, budget_stats)
+            hashes = [text_hash(p) for p in pieces]
+            # 平坦化して重複・空文字を除く（調査方針も同じバッチに含める）
+            for h, p in zip(hashes, pieces):
+                unique_texts.setdefault(h, p)
+            cells.append(hashes)
+        section_hashes[name] = cells
+    if stats is not None:
+        for key, value in budget_stats.items():
+            stats[key] = stats.get(key, 0) + value
+    print(f"トークン予算: {budget_stats.get('tokens_saved', 0)}トークンを削減しました。")
+
+    # 次元数の指定がなければ、バックエンドの出力次元より短いベクトル（以前に短縮した次元で保存したものなど）は
+    # キャッシュにないものとして扱い、ベクトル化し直す（保存時に長いベクトルで上書きされる）
+    required_dim = dimensions or native_dimensions(embeddings_model)
+    vectors = cache.get_many(model_name, list(unique_texts.keys()), min_dim=required_dim)
+    missing = [h for h in unique_texts if h not in vectors]
+
+    if stats is not None:
+        stats["unique_texts"] = stats.get("unique_texts", 0) + len(unique_texts)
+        stats["hits"] = stats.get("hits", 0) + len(unique_texts) - len(missing)
+        stats["misses"] = stats.get("misses", 0) + len(missing)
+
+    if missing:
+        texts = [truncate_tokens(unique_texts[h], max_tokens_per_input) for h in missing]
+        token_counts = [count_tokens(t) for t in texts]
+        # 件数が多い場合は同時実行数の分だけリクエストが分かれるよう、1リクエストの件数を抑える
+        max_concurrency = int(config["max_concurrency"])
+        max_inputs = min(
+            int(config["max_inputs_per_request"]),
+            max(int(config["min_inputs_per_request"]), -(-len(texts) // max(1, max_concurrency))),
+        )
+        batches = pack_batches(texts, token_counts, int(config["max_tokens_per_request"]), max_inputs)
+        # バッチは互いに独立したI/Oなので、上限付きで並行に送信する
+        results = run_coroutine(aembed_texts(embeddings_model, texts, batches, max_concurrency))
+        for batch, batch_vectors in zip(batches, results):
+            fresh = {missing[i]: np.asarray(v, dtype=np.float32) for i, v in zip(batch, batch_vectors)}
+            cache.put_many(model_name, fresh)
+            vectors.update(fresh)
+        if stats is not None:
+            stats["requests"] = stats.get("requests", 0) + len(batches)
+            stats["tokens"] = stats.get("tokens", 0) + sum(token_counts)
+        print(f"埋め込みリクエスト: {len(batches)}回（{len(missing)}件, {sum(token_counts)}トークン）")
+
+    # キャッシュには指定より長いベクトルが入っていることがあるため、指定の次元に切り詰める。
+    # 指定がなく出力次元も分からない場合は最も長いベクトルの次元にそろえ、それより短いベクトルがあればエラーとする
+    lengths = {v.shape[0] for v in vectors.values()}
+    dim = dimensions or required_dim or max(lengths)
+    if min(lengths) < dim:
+        raise ValueError(
+            f"埋め込みの次元数がそろっていません（{sorted(lengths)}、必要な次元数: {dim}）。"
+            "埋め込みのモデル・次元数の設定と、埋め込みキャッシュの内容を確認してください。"
+        )
+    plan_vector = vectors[text_hash(plan_text)][:dim]
+
+    # 行・セクションへ割り戻す（複数チャンクのセルはプーリングする）
+    pooling = np.max if budget_config["pooling"] == "max" else np.mean
+    matrices: Dict[str, np.ndarray] = {}
+    for name in sections:
+        matrix = np.zeros((len(df), dim), dtype=np.float32)
+        for row, hashes in enumerate(section_hashes[name]):
+            if len(hashes) == 1:
+                matrix[row] = vectors[hashes[0]][:dim]
+            elif hashes:
+                matrix[row] = pooling(np.stack([vectors[h][:dim] for h in hashes]), axis=0)
+        matrices[name] = matrix
+    return plan_vector, matrices
@@ -0,0 +1,336 @@
+import bisect
+import threading
+import time
+from functools import reduce
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from patents_core.core.search_analyzer import SEARCH_DELIMITER_PATTERN, analyze_search_text
+from patents_core.core.search_cache import canonicalize_search_query, normalize_assignee
+from patents_core.core.state import SearchQuery
+from patents_core.core.tools import KEYWORD_SEARCH_COLUMNS, LOCALIZED_LANGUAGES, arrow_table_to_dataframe
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class PostingList:
+    """
+    昇順のID列を圧縮して保持するポスティングリスト。
+    疎なリストは先頭のIDと差分（ギャップ）の列を、最大のギャップが収まる最小の符号なし整数型で持ち、
+    密なリスト（ビットマップの方が小さい場合）は universe ビットのビットマップで持つ。
+    """
+
+    __slots__ = ("count", "first", "gaps", "bitmap", "universe")
+
+    def __init__(self, ids: np.ndarray, universe: int):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.count = len(ids)
+        self.universe = universe
+        self.first = int(ids[0]) if self.count else 0
+        self.gaps = None
+        self.bitmap = None
+        gaps = np.diff(ids)
+        dtype = np.min_scalar_type(int(gaps.max())) if len(gaps) else np.dtype(np.uint8)
+        if len(gaps) * dtype.itemsize > (universe + 7) // 8:
+            mask = np.zeros(universe, dtype=bool)
+            mask[ids] = True
+            self.bitmap = np.packbits(mask)
+        else:
+            self.gaps = gaps.astype(dtype)
+
+    @property
+    def nbytes(self) -> int:
+        return self.bitmap.nbytes if self.bitmap is not None else self.gaps.nbytes + 8
+
+    def decode(self) -> np.ndarray:
+        """昇順のID列（int64）に戻す"""
+        if self.bitmap is not None:
+            return np.flatnonzero(np.unpackbits(self.bitmap, count=self.universe)).astype(np.int64)
+        if not self.count:
+            return _EMPTY
+        ids = np.empty(self.count, dtype=np.int64)
+        ids[0] = self.first
+        np.cumsum(self.gaps, dtype=np.int64, out=ids[1:])
+        ids[1:] += self.first
+        return ids
+
+    def contains(self, ids: np.ndarray) -> np.ndarray:
+        """ids の各IDがこのリストに含まれるかどうか（ビットマップは展開せずにビットを調べる）"""
+        if self.bitmap is not None:
+            return ((self.bitmap[ids >> 3] >> (7 - (ids & 7))) & 1).astype(bool)
+        decoded = self.decode()
+        positions = np.minimum(np.searchsorted(decoded, ids), max(len(decoded) - 1, 0))
+        return (decoded[positions] == ids) if len(decoded) else np.zeros(len(ids), dtype=bool)
+
+
+def _intersect_postings(postings: List[PostingList]) -> np.ndarray:
+    """最も短いリストを展開し、残りのリストに含まれるIDだけを残す（処理量は最も短いリストの長さに比例する）"""
+    postings = sorted(postings, key=lambda p: p.count)
+    ids = postings[0].decode()
+    for posting in postings[1:]:
+        if not len(ids):
+            break
+        ids = ids[posting.contains(ids)]
+    return ids
+
+
+def _group_postings(keys: np.ndarray, ids: np.ndarray, universe: int) -> Tuple[np.ndarray, List[PostingList]]:
+    """(キー, ID) の組を重複を除いてキーごとにまとめ、(キーの配列, キーごとのポスティングリスト) を返す"""
+    pairs = np.unique(keys.astype(np.int64) * max(universe, 1) + ids.astype(np.int64))
+    if not len(pairs):
+        return _EMPTY, []
+    pair_keys = pairs // max(universe, 1)
+    pair_ids = pairs % max(universe, 1)
+    starts = np.flatnonzero(np.r_[True, pair_keys[1:] != pair_keys[:-1]])
+    ends = np.r_[starts[1:], len(pairs)]
+    return pair_keys[starts], [PostingList(pair_ids[s:e], universe) for s, e in zip(starts, ends)]
+
+
+def _flatten(column: pa.ChunkedArray) -> Tuple[np.ndarray, pa.Array]:
+    """リストの列を、(要素ごとの行番号, 要素) に展開する"""
+    array = column.combine_chunks()
+    return pc.list_parent_indices(array).to_numpy(), pc.list_flatten(array)
+
+
+def _list_field(column: pa.ChunkedArray, name: str) -> pa.ListArray:
+    """構造体のリストの列から、指定したフィールドだけのリストの列を作る"""
+    array = column.combine_chunks()
+    return pa.ListArray.from_arrays(array.offsets, pc.struct_field(array.values, name), mask=array.is_null())
+
+
+def _localized_text_column(column: pa.ChunkedArray, size: int) -> pa.Array:
+    """local_backend の localized_text と同じく、行ごとに日本語、なければ英語の最初のテキストを選ぶ"""
+    parents, entries = _flatten(column)
+    languages = pc.struct_field(entries, "language").to_numpy(zero_copy_only=False)
+    texts = pc.struct_field(entries, "text")
+    selected = []
+    for language in LOCALIZED_LANGUAGES:
+        positions = np.flatnonzero(languages == language)
+        rows, first = np.unique(parents[positions], return_index=True)
+        index = np.full(size, -1, dtype=np.int64)
+        index[rows] = positions[first]
+        selected.append(texts.take(pa.array(index, mask=index < 0)))
+    return pc.coalesce(*selected)
+
+
+class InvertedIndex:
+    """
+    publications と同じスキーマのテーブルに対する、build_patent_query と同じ検索条件の意味の検索エンジン。
+    文献IDは公開日・公開番号の降順に振り、結果の順序・国ごとの上位N件・公開日の範囲をIDの範囲と順序で扱う。
+    - キーワード: セクション（title/abstract/claims）ごとに、ja/en の各テキスト（1件の localized の要素）を単位とした
+      トークンの転置インデックス。SEARCH() と同じく、キーワードの全トークンを含む1つのテキストがあれば一致とする
+    - IPCコード: ソート済みのコード表と、コードごとの文献IDのポスティングリスト（前方一致はコード表の二分探索）
+    - 出願人: 正規化した出願人名ごとの文献IDのポスティングリスト
+    """
+
+    def __init__(self, table: pa.Table):
+        started = time.perf_counter()
+        order = pc.sort_indices(table, sort_keys=[("publication_date", "descending"), ("publication_number", "descending")])
+        table = table.take(order)
+        self.size = table.num_rows
+
+        self.dates = table.column("publication_date").to_numpy().astype(np.int64)
+        countries = pc.utf8_slice_codeunits(table.column("publication_number"), 0, 2).combine_chunks().dictionary_encode()
+        self.countries = countries.dictionary.to_pylist()
+        self.country_ids = countries.indices.to_numpy()
+
+        # キーワード: セクションごとに、テキスト単位のIDと文献IDの対応表と、トークンごとのテキスト単位IDのリスト
+        # トークン化は search_analyzer と同じ区切り文字で、Arrowの演算でまとめて行う（DuckDBの bq_tokens と同じ）
+        self._unit_docs: Dict[str, np.ndarray] = {}
+        self._text_postings: Dict[str, Dict[str, PostingList]] = {}
+        for field, column in KEYWORD_SEARCH_COLUMNS.items():
+            parents, entries = _flatten(table.column(column))
+            texts = pc.struct_field(entries, "text")
+            keep = pc.fill_null(pc.and_(
+                pc.is_in(pc.struct_field(entries, "language"), value_set=pa.array(LOCALIZED_LANGUAGES)),
+                pc.greater(pc.utf8_length(texts), 0),
+            ), False)
+            self._unit_docs[field] = parents[keep.to_numpy(zero_copy_only=False)]
+            tokens = pc.split_pattern_regex(pc.utf8_lower(texts.filter(keep)), pattern=SEARCH_DELIMITER_PATTERN)
+            units = pc.list_parent_indices(tokens)
+            tokens = pc.list_flatten(tokens)
+            non_empty = pc.greater(pc.utf8_length(tokens), 0)
+            encoded = tokens.filter(non_empty).dictionary_encode()
+            keys, postings = _group_postings(
+                encoded.indices.to_numpy(), units.filter(non_empty).to_numpy(), len(self._unit_docs[field]),
+            )
+            self._text_postings[field] = dict(zip(encoded.dictionary.take(pa.array(keys)).to_pylist(), postings))
+
+        # IPCコード: 前方一致を二分探索で求めるため、コード表はソートしておく
+        parents, entries = _flatten(table.column("ipc"))
+        codes = pc.struct_field(entries, "code")
+        present = pc.is_valid(codes)
+        encoded = codes.filter(present).dictionary_encode()
+        keys, postings = _group_postings(encoded.indices.to_numpy(), parents[present.to_numpy(zero_copy_only=False)], self.size)
+        ipc = sorted(zip(encoded.dictionary.take(pa.array(keys)).to_pylist(), postings), key=lambda item: item[0])
+        self._ipc_codes = [code for code, _ in ipc]
+        self._ipc_postings = [posting for _, posting in ipc]
+
+        # 出願人: 名寄せ済み出願人名を normalize_assignee で正規化した名前ごとにまとめる
+        parents, entries = _flatten(table.column("assignee_harmonized"))
+        names = pc.struct_field(entries, "name")
+        present = pc.is_valid(names)
+        encoded = names.filter(present).dictionary_encode()
+        normalized = [normalize_assignee(name) for name in encoded.dictionary.to_pylist()]
+        vocabulary = sorted(set(normalized))
+        vocabulary_ids = {name: i for i, name in enumerate(vocabulary)}
+        normalized_ids = np.array([vocabulary_ids[name] for name in normalized], dtype=np.int64)
+        keys, postings = _group_postings(
+            normalized_ids[encoded.indices.to_numpy()] if len(normalized_ids) else _EMPTY,
+            parents[present.to_numpy(zero_copy_only=False)], self.size,
+        )
+        self._assignee_postings = {vocabulary[key]: posting for key, posting in zip(keys, postings)}
+
+        # 結果の列は、ローカルの検索バックエンドと同じ形で文献IDの順に持っておく
+        self.results = pa.table({
+            "publication_number": table.column("publication_number").combine_chunks(),
+            "title": _localized_text_column(table.column("title_localized"), self.size),
+            "abstract": _localized_text_column(table.column("abstract_localized"), self.size),
+            "claims": _localized_text_column(table.column("claims_localized"), self.size),
+            "assignee_harmonized": pc.binary_join(_list_field(table.column("assignee_harmonized"), "name"), ","),
+            "publication_date": table.column("publication_date").combine_chunks(),
+            "ipc_codes": _list_field(table.column("ipc"), "code"),
+        })
+
+        tokens = sum(len(postings) for postings in self._text_postings.values())
+        print(
+            f"転置インデックスを作成しました: {self.size}件, トークン {tokens}種, IPCコード {len(self._ipc_codes)}種, "
+            f"ポスティング {self.nbytes / 1024:.0f} KiB（{time.perf_counter() - started:.2f}秒）"
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """ポスティングリストの合計バイト数"""
+        postings = [p for field in self._text_postings.values() for p in field.values()]
+        postings += self._ipc_postings + list(self._assignee_postings.values())
+        return sum(p.nbytes for p in postings)
+
+    def _keyword_mask(self, keyword: str, fields: List[str]) -> np.ndarray:
+        """いずれかのセクションに、キーワードの全トークンを含むテキストがある文献のマスク"""
+        mask = np.zeros(self.size, dtype=bool)
+        tokens = set(analyze_search_text(keyword))
+        if not tokens:
+            return mask
+        for field in fields:
+            postings = [self._text_postings[field].get(token) for token in tokens]
+            if any(p is None for p in postings):
+                continue
+            mask[self._unit_docs[field][_intersect_postings(postings)]] = True
+        return mask
+
+    def _ipc_mask(self, prefixes: List[str]) -> np.ndarray:
+        """いずれかのIPCコードがいずれかの接頭辞で始まる文献のマスク（コード表の二分探索で該当範囲を求める）"""
+        mask = np.zeros(self.size, dtype=bool)
+        for prefix in prefixes:
+            start = bisect.bisect_left(self._ipc_codes, prefix)
+            end = start
+            while end < len(self._ipc_codes) and self._ipc_codes[end].startswith(prefix):
+                mask[self._ipc_postings[end].decode()] = True
+                end += 1
+        return mask
+
+    def _assignee_mask(self, assignees: List[str]) -> np.ndarray:
+        """正規化した出願人名に、語の区切りを保っていずれかの名前を含む出願人がいる文献のマスク"""
+        mask = np.zeros(self.size, dtype=bool)
+        for name, posting in self._assignee_postings.items():
+            if any(f" {query} " in f" {name} " for query in assignees):
+                mask[posting.decode()] = True
+        return mask
+
+    def search_ids(self, _query: SearchQuery) -> np.ndarray:
+        """
+        検索条件に一致する文献IDを、公開日・公開番号の降順に、国ごとの上位N件・LIMIT件まで返す。
+        条件の意味は build_patent_query と同じ（公開日 AND 国 AND 出願人 AND (IPC OR キーワードグループのAND)）。
+        """
+        query = canonicalize_search_query(_query)
+
+        match_conditions = []
+        if query.ipc_codes:
+            match_conditions.append(self._ipc_mask(query.ipc_codes))
+        fields = [field for field in query.keyword_fields if field in KEYWORD_SEARCH_COLUMNS]
+        if query.keyword_groups and fields:
+            groups = [
+                reduce(np.logical_or, [self._keyword_mask(kw, fields) for kw in group])
+                for group in query.keyword_groups
+            ]
+            match_conditions.append(reduce(np.logical_and, groups))
+        mask = reduce(np.logical_or, match_conditions) if match_conditions else np.ones(self.size, dtype=bool)
+
+        if query.country_codes:
+            allowed = np.isin(np.array(self.countries, dtype=object), query.country_codes)
+            mask &= allowed[self.country_ids]
+        if query.assignees:
+            mask &= self._assignee_mask(query.assignees)
+
+        # 公開日の範囲は、公開日の降順に並んだIDの連続した範囲になる
+        start = int(np.searchsorted(-self.dates, -int(query.publication_date_to), side="left"))
+        end = int(np.searchsorted(-self.dates, -int(query.publication_date_from), side="right"))
+        ids = np.flatnonzero(mask[start:end]) + start
+
+        # 国ごとの上位N件: 国ごとに、IDの昇順（公開日の新しい順）での順位を求める
+        country_ids = self.country_ids[ids]
+        by_country = np.argsort(country_ids, kind="stable")
+        sorted_countries = country_ids[by_country]
+        group_starts = np.flatnonzero(np.r_[True, sorted_countries[1:] != sorted_countries[:-1]]) if len(ids) else _EMPTY
+        group_sizes = np.diff(np.r_[group_starts, len(ids)])
+        ranks = np.empty(len(ids), dtype=np.int64)
+        ranks[by_country] = np.arange(len(ids)) - np.repeat(group_starts, group_sizes)
+        return ids[ranks < query.max_results_per_country][:query.limit]
+
+    def search(self, _query: SearchQuery, include_claims: bool = True) -> pa.Table:
+        """search_patents_locally と同じ列・同じ順序の結果を返す"""
+        table = self.results.take(pa.array(self.search_ids(_query), type=pa.int64()))
+        return table if include_claims else table.drop_columns(["claims"])
+
+    def fetch_claims(self, publication_numbers: List[str]) -> Dict[str, Optional[str]]:
+        """公開番号ごとの請求項（スナップショットにない公開番号は None）"""
+        numbers = pa.array(list(publication_numbers), type=pa.string())
+        positions = pc.index_in(numbers, value_set=self.results.column("publication_number"))
+        return dict(zip(numbers.to_pylist(), self.results.column("claims").take(positions).to_pylist()))
+
+
+_indexes: Dict[Tuple[str, int, int], InvertedIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_inverted_index(snapshot_path: Optional[Path] = None) -> InvertedIndex:
+    """
+    スナップショットの転置インデックスを返す。プロセス内で1回だけ作成し、ファイルが更新されたら作り直す。
+    """
+    from patents_core.core.local_backend import get_local_snapshot_path
+
+    snapshot_path = Path(snapshot_path or get_local_snapshot_path())
+    if not snapshot_path.exists():
+        raise FileNotFoundError(f"ローカル検索用のスナップショットが見つかりません: {snapshot_path}")
+    stat = snapshot_path.stat()
+    key = (str(snapshot_path.resolve()), stat.st_mtime_ns, stat.st_size)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            for stale in [k for k in _indexes if k[0] == key[0]]:
+                del _indexes[stale]
+            index = _indexes[key] = InvertedIndex(pq.read_table(snapshot_path))
+        return index
+
+
+def search_patents_with_index(_query: SearchQuery, include_claims: bool = True, snapshot_path: Optional[Path] = None) -> pd.DataFrame:
+    """
+    search_patents_locally と同じ条件・同じ列で、ローカルのスナップショットを転置インデックスで検索する。
+    エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    index = get_inverted_index(snapshot_path)
+    started = time.perf_counter()
+    table = index.search(_query, include_claims)
+    print(f"{table.num_rows}件の特許が見つかりました（転置インデックス: {(time.perf_counter() - started) * 1000:.1f} ms）。")
+    return arrow_table_to_dataframe(table)
+
+
+def fetch_claims_with_index(publication_numbers: List[str], snapshot_path: Optional[Path] = None) -> Dict[str, Optional[str]]:
+    """fetch_claims のローカル版。転置インデックスに保持した請求項を返す"""
+    return get_inverted_index(snapshot_path).fetch_claims(publication_numbers)
@@ -0,0 +1,162 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from patents_core.core.search_analyzer import SEARCH_DELIMITER_PATTERN
+from patents_core.core.search_cache import canonicalize_search_query, normalize_assignee
+from patents_core.core.state import SearchQuery
+from patents_core.core.tools import DEFAULT_SEARCH_BACKEND_CONFIG, KEYWORD_SEARCH_COLUMNS, LOCALIZED_LANGUAGES, arrow_table_to_dataframe
+from patents_core.utils.config import load_config_section
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+_LANGUAGES_SQL = ", ".join(f"'{language}'" for language in LOCALIZED_LANGUAGES)
+
+# BigQuery の SEARCH() と、日本語を優先した多言語テキストの選択に相当するマクロ
+_MACROS = [
+    f"CREATE MACRO bq_tokens(s) AS list_filter(string_split_regex(lower(s), '{SEARCH_DELIMITER_PATTERN.replace(chr(39), chr(39) * 2)}'), t -> t <> '')",
+    # トークンのないキーワード（区切り文字だけ）は、search_analyzer.search_matches と同じく一致なしとする
+    "CREATE MACRO bq_search(s, q) AS len(bq_tokens(q)) > 0 AND list_has_all(bq_tokens(s), bq_tokens(q))",
+    "CREATE MACRO localized_text(x) AS coalesce(list_filter(x, l -> l.language = 'ja')[1].text, list_filter(x, l -> l.language = 'en')[1].text)",
+]
+
+
+def get_local_snapshot_path() -> Path:
+    """ローカル検索に使うParquetスナップショットのパスを返す（環境変数 PATENTS_LOCAL_SNAPSHOT を優先する）"""
+    config = load_config_section("search_backend", DEFAULT_SEARCH_BACKEND_CONFIG)
+    path = Path(os.environ.get("PATENTS_LOCAL_SNAPSHOT") or config["local_snapshot"])
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+class _DuckDBParams:
+    """名前付きパラメータ（$name）を登録する"""
+
+    def __init__(self):
+        self.values: Dict[str, object] = {}
+        self._counters: Dict[str, int] = {}
+
+    def set(self, name: str, value) -> str:
+        self.values[name] = value
+        return f"${name}"
+
+    def add(self, prefix: str, value) -> str:
+        index = self._counters.get(prefix, 0)
+        self._counters[prefix] = index + 1
+        return self.set(f"{prefix}_{index}", value)
+
+
+def build_duckdb_query(query: SearchQuery, include_claims: bool = True) -> Tuple[str, Dict[str, object]]:
+    """
+    build_patent_query と同じ検索条件の意味を、DuckDB用のSQL文とパラメータで組み立てる。
+    対象は publications と同じスキーマのテーブル（ビュー）publications。
+    同じ公開日の行の順序が実行ごとに変わらないよう、国ごとの上位N件とLIMITでは公開番号の降順を第2キーにする。
+    """
+    query = canonicalize_search_query(query)
+    params = _DuckDBParams()
+
+    where_conditions = [
+        f"p.publication_date BETWEEN {params.set('pub_from', int(query.publication_date_from))} "
+        f"AND {params.set('pub_to', int(query.publication_date_to))}"
+    ]
+    if query.country_codes:
+        where_conditions.append(f"substr(p.publication_number, 1, 2) IN (SELECT unnest({params.set('country_codes', query.country_codes)}))")
+    if query.assignees:
+        matches = " OR ".join(
+            f"contains(' ' || normalize_assignee(a.name) || ' ', {params.add('assignee', f' {name} ')})"
+            for name in query.assignees
+        )
+        where_conditions.append(f"len(list_filter(p.assignee_harmonized, a -> {matches})) > 0")
+
+    match_conditions = []
+    if query.ipc_codes:
+        likes = " OR ".join(f"c.code LIKE {params.add('ipc', f'{code}%')}" for code in query.ipc_codes)
+        match_conditions.append(f"len(list_filter(p.ipc, c -> {likes})) > 0")
+    columns = [KEYWORD_SEARCH_COLUMNS[f] for f in query.keyword_fields if f in KEYWORD_SEARCH_COLUMNS]
+    if query.keyword_groups and columns:
+        group_predicates = []
+        for group in query.keyword_groups:
+            keyword_predicates = []
+            for kw in group:
+                param = params.add("kw", kw)
+                keyword_predicates.extend(
+                    f"len(list_filter(p.{column}, l -> l.language IN ({_LANGUAGES_SQL}) AND bq_search(l.text, {param}))) > 0"
+                    for column in columns
+                )
+            group_predicates.append(f"({' OR '.join(keyword_predicates)})")
+        match_conditions.append(f"({' AND '.join(group_predicates)})")
+    if match_conditions:
+        where_conditions.append(f"({' OR '.join(match_conditions)})")
+    where_clause = "\n    AND ".join(where_conditions)
+
+    max_per_country = params.set("max_per_country", query.max_results_per_country)
+    limit = params.set("limit", query.limit)
+    claims_select = "\n  localized_text(f.claims_localized) AS claims," if include_claims else ""
+    sql = f"""
+WITH filtered_patents AS (
+  SELECT *
+  FROM publications AS p
+  WHERE {where_clause}
+  QUALIFY row_number() OVER (PARTITION BY substr(p.publication_number, 1, 2) ORDER BY p.publication_date DESC, p.publication_number DESC) <= {max_per_country}
+  ORDER BY p.publication_date DESC, p.publication_number DESC
+  LIMIT {limit}
+)
+SELECT
+  f.publication_number,
+  localized_text(f.title_localized) AS title,
+  localized_text(f.abstract_localized) AS abstract,{claims_select}
+  array_to_string(list_transform(f.assignee_harmonized, a -> a.name), ',') AS assignee_harmonized,
+  f.publication_date,
+  list_transform(f.ipc, c -> c.code) AS ipc_codes
+FROM filtered_patents AS f
+ORDER BY f.publication_date DESC, f.publication_number DESC
+"""
+    return sql, params.values
+
+
+def _connect(snapshot_path: Path):
+    """スナップショットを publications ビューとして参照するDuckDBの接続を作る"""
+    import duckdb
+
+    if not snapshot_path.exists():
+        raise FileNotFoundError(f"ローカル検索用のスナップショットが見つかりません: {snapshot_path}")
+    con = duckdb.connect()
+    con.create_function("normalize_assignee", normalize_assignee, ["VARCHAR"], "VARCHAR", side_effects=False)
+    for macro in _MACROS:
+        con.execute(macro)
+    con.read_parquet(str(snapshot_path)).create_view("publications")
+    return con
+
+
+def search_patents_locally(_query: SearchQuery, include_claims: bool = True, snapshot_path: Optional[Path] = None) -> pd.DataFrame:
+    """
+    search_patents_in_bigquery と同じ条件・同じ列で、ローカルのParquetスナップショットをDuckDBで検索する。
+    エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    snapshot_path = snapshot_path or get_local_snapshot_path()
+    sql, params = build_duckdb_query(_query, include_claims)
+    con = _connect(snapshot_path)
+    try:
+        table = con.execute(sql, params).to_arrow_table()
+    finally:
+        con.close()
+    print(f"{table.num_rows}件の特許が見つかりました（ローカル: {snapshot_path.name}）。")
+    return arrow_table_to_dataframe(table)
+
+
+def fetch_claims_locally(publication_numbers: List[str], snapshot_path: Optional[Path] = None) -> Dict[str, Optional[str]]:
+    """fetch_claims のローカル版。スナップショットから公開番号ごとの請求項を取得する"""
+    snapshot_path = snapshot_path or get_local_snapshot_path()
+    con = _connect(snapshot_path)
+    try:
+        rows = con.execute(
+            "SELECT publication_number, localized_text(claims_localized) FROM publications "
+            "WHERE publication_number IN (SELECT unnest($numbers))",
+            {"numbers": list(publication_numbers)},
+        ).fetchall()
+    finally:
+        con.close()
+    claims = dict.fromkeys(publication_numbers)
+    claims.update(rows)
+    return claims
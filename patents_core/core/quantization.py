@@ -0,0 +1,87 @@
+from typing import Optional
+
+import numpy as np
+
+# 保持形式: "float32"（量子化なし）/ "float16" / "int8"（ベクトルごとのスケール付き）
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+# 量子化された行列との積を計算するときに、一度にfloat32へ戻す行数
+_BLOCK_ROWS = 8192
+
+
+class QuantizedMatrix:
+    """
+    埋め込み行列を float16 または int8（行ごとのスケール付き）で保持する。
+    類似度計算は量子化した形のまま、ブロック単位で復元しながら行う（全体のfloat32コピーは作らない）。
+    """
+
+    def __init__(self, data: np.ndarray, scale: Optional[np.ndarray], storage_dtype: str):
+        self.data = data
+        self.scale = scale
+        self.storage_dtype = storage_dtype
+
+    @classmethod
+    def from_float(cls, matrix: np.ndarray, storage_dtype: str = "float32") -> "QuantizedMatrix":
+        """float行列を指定の形式に量子化する"""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if storage_dtype == "float32":
+            return cls(matrix, None, storage_dtype)
+        if storage_dtype == "float16":
+            return cls(matrix.astype(np.float16), None, storage_dtype)
+        if storage_dtype == "int8":
+            scale = np.abs(matrix).max(axis=-1) / 127.0
+            safe_scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+            data = np.rint(matrix / safe_scale[..., None]).astype(np.int8)
+            return cls(data, scale.astype(np.float32), storage_dtype)
+        raise ValueError(f"未知の保持形式です: {storage_dtype}")
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def _dequantize_block(self, start: int, stop: int) -> np.ndarray:
+        block = self.data[start:stop].astype(np.float32)
+        if self.scale is not None:
+            block *= self.scale[start:stop, None]
+        return block
+
+    def to_float(self) -> np.ndarray:
+        """float32に復元した行列を返す"""
+        if self.storage_dtype == "float32":
+            return self.data
+        return self._dequantize_block(0, self.data.shape[0])
+
+    def dot(self, vector: np.ndarray) -> np.ndarray:
+        """各行とベクトルの内積を float32 で返す"""
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.storage_dtype == "float32":
+            return self.data @ vector
+        n = self.data.shape[0]
+        out = np.empty(n, dtype=np.float32)
+        for start in range(0, n, _BLOCK_ROWS):
+            stop = min(start + _BLOCK_ROWS, n)
+            if self.storage_dtype == "int8":
+                # 量子化値のまま内積を取り、最後に行ごとのスケールを掛ける
+                out[start:stop] = (self.data[start:stop].astype(np.float32) @ vector) * self.scale[start:stop]
+            else:
+                out[start:stop] = self.data[start:stop].astype(np.float32) @ vector
+        return out
+
+
+def quantize_vector(vector: np.ndarray, storage_dtype: str):
+    """1本のベクトルを量子化し、(バイト列, スケール) を返す（キャッシュ保存用）"""
+    q = QuantizedMatrix.from_float(np.asarray(vector, dtype=np.float32)[None, :], storage_dtype)
+    scale = float(q.scale[0]) if q.scale is not None else None
+    return q.data[0].tobytes(), scale
+
+
+def dequantize_vector(blob: bytes, storage_dtype: str, scale: Optional[float]) -> np.ndarray:
+    """キャッシュから読み出したバイト列をfloat32ベクトルに復元する"""
+    vector = np.frombuffer(blob, dtype=np.dtype(storage_dtype)).astype(np.float32)
+    if storage_dtype == "int8" and scale is not None:
+        vector *= scale
+    return vector
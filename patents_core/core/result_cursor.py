@@ -0,0 +1,145 @@
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from patents_core.core.bigquery_client import get_bigquery_client
+from patents_core.core.search_cache import canonicalize_search_query
+from patents_core.core.state import ResultCursor, SearchQuery
+from patents_core.core.tools import (
+    arrow_table_to_dataframe,
+    get_search_backend,
+    lazy_claims_enabled,
+    local_search_backend_enabled,
+    search_local_snapshot,
+    submit_search_job,
+)
+from patents_core.utils.config import load_config_section
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# max_per_country: カーソルに保存する候補の、国ごとの最大件数（検索条件の max_results_per_country より大きければこちらを使う）
+# max_rows: カーソルに保存する候補の最大行数
+# path: ローカルの検索バックエンドで候補を保存するディレクトリ
+# ttl_hours: 読み終えずに残ったカーソルのファイルを削除するまでの時間（BigQueryの一時テーブルはBigQuery側で約24時間後に削除される）
+DEFAULT_RESULT_CURSOR_CONFIG = {
+    "max_per_country": 50,
+    "max_rows": 5000,
+    "path": ".cache/cursors",
+    "ttl_hours": 24,
+}
+
+# 1回の読み込みで取得する行数の下限（取得済みの行を読み飛ばすことがあるため、要求件数より多めに読む）
+_MIN_READ_ROWS = 100
+
+
+def _cursor_query(_query: SearchQuery) -> SearchQuery:
+    """カーソルに保存する候補の検索条件（国ごとの件数と全体の件数の上限だけを広げる）"""
+    config = load_config_section("result_cursor", DEFAULT_RESULT_CURSOR_CONFIG)
+    query = canonicalize_search_query(_query)
+    return query.model_copy(update={
+        "max_results_per_country": max(query.max_results_per_country, int(config["max_per_country"])),
+        "limit": max(query.limit, int(config["max_rows"])),
+    })
+
+
+def _evict_expired_cursors(directory: Path, ttl_seconds: float) -> None:
+    """作成から ttl_seconds を過ぎたカーソルのファイルを削除する（閉じられずに残ったセッションのカーソルなど）"""
+    now = time.time()
+    for f in directory.glob("cursor_*.parquet"):
+        try:
+            if now - f.stat().st_mtime > ttl_seconds:
+                f.unlink(missing_ok=True)
+        except FileNotFoundError:
+            continue
+
+
+def open_result_cursor(_query: SearchQuery, seen: Optional[List[str]] = None) -> ResultCursor:
+    """
+    検索条件を広げた候補を公開日・公開番号の降順で1回だけ検索して保存し、続きを読むためのカーソルを返す。
+    BigQueryではジョブの結果の一時テーブルを、ローカルの検索バックエンドではParquetファイルを保存先にする。
+    以降の fetch_more は保存先だけを読むため、公開データセットを再び走査しない。
+    seen には取得済み（表示済み）の公開番号を渡す。エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    query = _cursor_query(_query)
+    if local_search_backend_enabled():
+        config = load_config_section("result_cursor", DEFAULT_RESULT_CURSOR_CONFIG)
+        directory = Path(config["path"])
+        directory = directory if directory.is_absolute() else PROJECT_ROOT / directory
+        directory.mkdir(parents=True, exist_ok=True)
+        _evict_expired_cursors(directory, float(config["ttl_hours"]) * 3600)
+        path = directory / f"cursor_{uuid.uuid4().hex}.parquet"
+        results_df = search_local_snapshot(query, include_claims=not lazy_claims_enabled())
+        results_df.to_parquet(path, index=False)
+        cursor = ResultCursor(backend=get_search_backend(), location=str(path), total_rows=len(results_df))
+    else:
+        client = get_bigquery_client()
+        query_job = submit_search_job(query, client, ordered=True)
+        total_rows = query_job.result().total_rows
+        table = query_job.destination
+        cursor = ResultCursor(
+            backend="bigquery",
+            location=f"{table.project}.{table.dataset_id}.{table.table_id}",
+            total_rows=int(total_rows or 0),
+            job_id=query_job.job_id,
+            job_location=query_job.location,
+        )
+    cursor.seen = list(dict.fromkeys(seen or []))
+    print(f"カーソルを作成しました: {cursor.total_rows}行の候補（取得済み: {len(cursor.seen)}件）")
+    return cursor
+
+
+def _read_rows(cursor: ResultCursor, start: int, count: int) -> pd.DataFrame:
+    """保存先の start 行目から count 行を読む（BigQueryの一時テーブルの読み取りはクエリの課金対象にならない）"""
+    if cursor.backend != "bigquery":
+        return arrow_table_to_dataframe(pq.read_table(cursor.location).slice(start, count))
+    # 一時テーブルを list_rows（tabledata.list）で読むと、行の順序はクエリの ORDER BY どおりになるとは限らない。
+    # ジョブの結果として読む（jobs.getQueryResults）と ORDER BY の順序で返るため、ジョブから行の位置を指定して読む。
+    # Storage Read API も順序を保証しないため使わない
+    client = get_bigquery_client()
+    query_job = client.get_job(cursor.job_id, location=cursor.job_location)
+    rows = query_job.result(start_index=start, max_results=count)
+    return arrow_table_to_dataframe(rows.to_arrow(create_bqstorage_client=False))
+
+
+def close_result_cursor(cursor: Optional[ResultCursor]) -> None:
+    """
+    カーソルの保存先を削除する（ローカルの検索バックエンドのParquetファイル）。
+    BigQueryの一時テーブルはBigQuery側で自動的に削除されるため、何もしない。
+    """
+    if cursor is not None and cursor.backend != "bigquery":
+        Path(cursor.location).unlink(missing_ok=True)
+
+
+def fetch_more(cursor: ResultCursor, n: int) -> pd.DataFrame:
+    """
+    カーソルの位置から、取得済みでない行を公開日の新しい順に最大 n 件読み、カーソルを進めて返す。
+    候補を読み終えていれば空のDataFrameを返す（読み終えた時点で保存先を削除する）。エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    seen = set(cursor.seen)
+    pages = []
+    collected = 0
+    while collected < n and cursor.position < cursor.total_rows:
+        chunk = _read_rows(cursor, cursor.position, max(n - collected, _MIN_READ_ROWS))
+        if chunk.empty:
+            cursor.position = cursor.total_rows
+            break
+        fresh = [i for i, number in enumerate(chunk["publication_number"].tolist()) if number not in seen]
+        taken = fresh[:n - collected]
+        # 読んだ行のうち、最後に取得した行までを読み終えたことにする（残りは次回に読む）
+        cursor.position += taken[-1] + 1 if len(taken) == n - collected else len(chunk)
+        if taken:
+            page = chunk.iloc[taken]
+            pages.append(page)
+            collected += len(page)
+            numbers = page["publication_number"].tolist()
+            seen.update(numbers)
+            cursor.seen.extend(numbers)
+    if cursor.position >= cursor.total_rows:
+        close_result_cursor(cursor)
+    if not pages:
+        return pd.DataFrame()
+    return pd.concat(pages, ignore_index=True)
@@ -0,0 +1,175 @@
+import datetime
+import os
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from patents_core.core.search_cache import canonicalize_search_query, default_publication_date_to
+from patents_core.core.state import SavedSearch, SearchQuery
+from patents_core.core.tools import search_patents_with_cache
+from patents_core.utils.config import load_config_section
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# max_new_per_country: 再実行で取得する新しい公開の、国ごとの最大件数（検索条件の max_results_per_country より大きければこちらを使う）
+# max_new_rows: 再実行で取得する新しい公開の最大件数
+# path: 保存済みの検索のディレクトリ（保存名ごとに search.json と results.parquet を置く）
+DEFAULT_SAVED_SEARCH_CONFIG = {
+    "max_new_per_country": 1000,
+    "max_new_rows": 5000,
+    "path": "saved_searches",
+}
+
+# 保存する結果のうち、スコア付けで加わる列（残りの列が検索結果の列）
+SCORE_COLUMNS = ["sim_title", "sim_abstract", "sim_claims", "score", "partially_scored"]
+
+
+def _saved_searches_dir() -> Path:
+    config = load_config_section("saved_search", DEFAULT_SAVED_SEARCH_CONFIG)
+    directory = Path(config["path"])
+    return directory if directory.is_absolute() else PROJECT_ROOT / directory
+
+
+def _search_dir(name: str) -> Path:
+    if not name or name != Path(name).name or name.startswith("."):
+        raise ValueError(f"保存名にはディレクトリ名として使える名前を指定してください: {name!r}")
+    return _saved_searches_dir() / name
+
+
+def _write(saved: SavedSearch, results: pd.DataFrame) -> None:
+    """検索条件と結果を書き出す（書きかけのファイルを読まないよう、一時ファイルに書いてから置き換える）"""
+    directory = _search_dir(saved.name)
+    directory.mkdir(parents=True, exist_ok=True)
+    results_file = directory / "results.parquet"
+    tmp_file = results_file.with_suffix(".tmp")
+    results.to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, results_file)
+    search_file = directory / "search.json"
+    tmp_file = search_file.with_suffix(".tmp")
+    tmp_file.write_text(saved.model_dump_json(indent=2), encoding="utf-8")
+    os.replace(tmp_file, search_file)
+
+
+def _latest_publication_date(df: pd.DataFrame) -> Optional[int]:
+    if df is None or df.empty:
+        return None
+    return int(df["publication_date"].max())
+
+
+def save_search(
+    name: str,
+    query: SearchQuery,
+    plan_text: str,
+    results: Optional[pd.DataFrame] = None,
+    similarity_weights: Optional[dict] = None,
+) -> SavedSearch:
+    """
+    検索条件と調査方針を保存名 name で保存する（同じ名前があれば上書きする）。
+    results にはスコア付けした検索結果の全行（agent.scored_results。scoring.top_k で絞った analyzed_results ではなく）を渡す。
+    その最新の公開日がウォーターマークになり、
+    次の refresh ではその日以降の公開だけを検索する。結果がなければ、次の refresh で検索条件の範囲全体を検索する。
+    """
+    results = results if results is not None else pd.DataFrame()
+    if not results.empty and not {"sim_title", "sim_abstract", "sim_claims"} <= set(results.columns):
+        raise ValueError("類似度の列（sim_title, sim_abstract, sim_claims）を含む、スコア付けした検索結果を渡してください。")
+    saved = SavedSearch(
+        name=name,
+        search_query=query,
+        plan_text=plan_text,
+        watermark=_latest_publication_date(results),
+        seen=list(dict.fromkeys(results["publication_number"].tolist())) if not results.empty else [],
+        last_run_at=datetime.datetime.now().isoformat(timespec="seconds"),
+        last_run_new_rows=len(results),
+    )
+    if similarity_weights:
+        saved.similarity_weights = dict(similarity_weights)
+    _write(saved, results)
+    print(f"検索を保存しました: {name}（{len(results)}件、ウォーターマーク: {saved.watermark}）")
+    return saved
+
+
+def load_saved_search(name: str) -> Tuple[SavedSearch, pd.DataFrame]:
+    """保存済みの検索と、スコア付けした結果を読み込む。保存されていなければ FileNotFoundError を送出する"""
+    directory = _search_dir(name)
+    saved = SavedSearch.model_validate_json((directory / "search.json").read_text(encoding="utf-8"))
+    results_file = directory / "results.parquet"
+    results = pd.read_parquet(results_file, dtype_backend="pyarrow") if results_file.exists() else pd.DataFrame()
+    return saved, results
+
+
+def list_saved_searches() -> List[SavedSearch]:
+    """保存済みの検索を保存名の順に返す"""
+    directory = _saved_searches_dir()
+    if not directory.exists():
+        return []
+    return [
+        SavedSearch.model_validate_json(path.read_text(encoding="utf-8"))
+        for path in sorted(directory.glob("*/search.json"))
+    ]
+
+
+def watch_query(saved: SavedSearch, today: Optional[datetime.date] = None) -> SearchQuery:
+    """
+    再実行で使う検索条件。公開日の範囲をウォーターマークの日（同じ日に後から追加される公開があるため、その日を含む）から
+    終了日（未指定なら当日）までに狭め、国ごとの件数と全体の件数の上限を新しい公開をすべて取れるように広げる。
+    """
+    config = load_config_section("saved_search", DEFAULT_SAVED_SEARCH_CONFIG)
+    query = canonicalize_search_query(saved.search_query)
+    date_from = query.publication_date_from
+    if saved.watermark is not None:
+        date_from = max(date_from, str(saved.watermark))
+    date_to = query.publication_date_to if saved.search_query.publication_date_to else default_publication_date_to(today)
+    return query.model_copy(update={
+        "publication_date_from": date_from,
+        "publication_date_to": date_to,
+        "max_results_per_country": max(query.max_results_per_country, int(config["max_new_per_country"])),
+        "limit": max(query.limit, int(config["max_new_rows"])),
+    })
+
+
+def search_new_publications(
+    saved: SavedSearch,
+    search: Optional[Callable[[SearchQuery], pd.DataFrame]] = None,
+    today: Optional[datetime.date] = None,
+) -> pd.DataFrame:
+    """
+    ウォーターマーク以降の公開だけを検索し、取得済みの公開番号を除いて返す。
+    search には検索を実行する関数（既定は search_patents_with_cache）を渡せる。エラーはそのまま送出する。
+    """
+    query = watch_query(saved, today)
+    if query.publication_date_from > query.publication_date_to:
+        print(f"保存済みの検索「{saved.name}」は公開日の範囲の終わりまで検索済みです。")
+        return pd.DataFrame()
+    search = search or (lambda q: search_patents_with_cache(q)[0])
+    print(f"--- Watch search: {saved.name}（{query.publication_date_from}〜{query.publication_date_to}） ---")
+    results_df = search(query)
+    if results_df.empty:
+        return results_df
+
+    per_country = results_df["publication_number"].str[:2].value_counts()
+    if len(results_df) >= query.limit or per_country.max() >= query.max_results_per_country:
+        print(
+            "警告: 新しい公開が取得件数の上限に達したため、古い側の一部を取得できていない可能性があります。"
+            "saved_search の max_new_per_country / max_new_rows を増やしてください。"
+        )
+    seen = set(saved.seen)
+    new_df = results_df[~results_df["publication_number"].isin(seen)].reset_index(drop=True)
+    print(f"新しい公開: {len(new_df)}件（検索結果 {len(results_df)}件のうち、取得済み {len(results_df) - len(new_df)}件を除外）")
+    return new_df
+
+
+def record_run(saved: SavedSearch, results: pd.DataFrame, new_df: pd.DataFrame) -> SavedSearch:
+    """
+    再実行の結果を保存する。results には新しい行を加えてスコア順に並べ直した全行、new_df には新しく取得した行を渡す。
+    ウォーターマークを新しい行の最新の公開日まで進め、新しい公開番号を取得済みに加える。
+    """
+    latest = _latest_publication_date(new_df)
+    if latest is not None:
+        saved.watermark = max(saved.watermark or latest, latest)
+    if not new_df.empty:
+        saved.seen = list(dict.fromkeys(saved.seen + new_df["publication_number"].tolist()))
+    saved.last_run_at = datetime.datetime.now().isoformat(timespec="seconds")
+    saved.last_run_new_rows = len(new_df)
+    _write(saved, results)
+    return saved
@@ -0,0 +1,109 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from patents_core.core.quantization import QuantizedMatrix
+from patents_core.core.state import DEFAULT_SIMILARITY_WEIGHTS, SECTIONS
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """各行をL2正規化したfloat32行列を返す（ノルム0の行はゼロのまま）"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    np.maximum(norms, np.finfo(np.float32).tiny, out=norms)
+    return matrix / norms
+
+
+def weight_vector(weights: Dict[str, float], sections: Sequence[str] = SECTIONS) -> np.ndarray:
+    """セクション名→重みの辞書を、セクション順の重みベクトルに変換する"""
+    return np.array([weights.get(name, DEFAULT_SIMILARITY_WEIGHTS.get(name, 0.0)) for name in sections], dtype=np.float32)
+
+
+def top_k_indices(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    スコアの降順に上位k件のインデックスを返す（同じスコアはインデックスの小さい順）。
+    全件のソートは行わず、partition で k 番目のスコアを求めて上位k件を選んでからその中だけを並べ替える。
+    """
+    n = scores.shape[0]
+    if k is None or k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    # argpartition は k 番目と同じスコアの行のどれを選ぶかが不定なため、同点の行はインデックスの小さい順に選ぶ
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth)
+    tied = np.flatnonzero(scores == kth)[:k - above.size]
+    candidates = np.sort(np.concatenate([above, tied]))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class ScoringEngine:
+    """
+    調査方針ベクトルと各セクションの埋め込み行列から、類似度とスコアを計算するエンジン。
+    行列は事前に正規化し、storage_dtype（float32 / float16 / int8）で保持したまま、
+    全セクションの類似度を1回の行列積で求める。
+    """
+
+    def __init__(
+        self,
+        plan_vector: np.ndarray,
+        section_matrices: Dict[str, np.ndarray],
+        sections: Sequence[str] = SECTIONS,
+        storage_dtype: str = "float32",
+    ):
+        self.sections = tuple(sections)
+        self.plan_vector = normalize_rows(plan_vector)
+        # (セクション数 × 行数, 次元) の1つの行列として保持する
+        stacked = np.stack([section_matrices[name] for name in self.sections])
+        self.n_rows = stacked.shape[1]
+        self.matrix = QuantizedMatrix.from_float(normalize_rows(stacked.reshape(-1, stacked.shape[-1])), storage_dtype)
+
+    def similarities(self) -> np.ndarray:
+        """各行・各セクションのコサイン類似度を (行数, セクション数) の配列で返す"""
+        return self.matrix.dot(self.plan_vector).reshape(len(self.sections), self.n_rows).T
+
+    def score(self, weights: Dict[str, float], similarities: Optional[np.ndarray] = None) -> np.ndarray:
+        """重み付き和でスコアを計算する"""
+        if similarities is None:
+            similarities = self.similarities()
+        return similarities @ weight_vector(weights, self.sections)
+
+
+def rank(similarities: np.ndarray, weights: Dict[str, float], top_k: Optional[int] = None, sections: Sequence[str] = SECTIONS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    保持済みのセクション別類似度 (行数, セクション数) からスコアと並び順を計算する。
+    埋め込みの再計算やネットワーク通信は行わないため、重みの変更に即座に追従できる。
+    戻り値は (上位k件のインデックス, 全行のスコア)。
+    """
+    score = similarities @ weight_vector(weights, sections)
+    return top_k_indices(score, top_k), score
+
+
+def select_cascade_rows(first_stage_score: np.ndarray, top_n: Optional[int], score_threshold: Optional[float]) -> np.ndarray:
+    """
+    カスケード評価で第2段（請求項）の計算対象とする行を選ぶ。
+    第1段スコアの上位 top_n 件と、score_threshold 以上の行の和集合をインデックス順で返す。
+    """
+    selected = np.zeros(first_stage_score.shape[0], dtype=bool)
+    if top_n:
+        selected[top_k_indices(first_stage_score, top_n)] = True
+    if score_threshold is not None:
+        selected |= first_stage_score >= score_threshold
+    return np.flatnonzero(selected)
+
+
+def impute_similarity(first_stage_similarities: np.ndarray, scored_rows: np.ndarray, scored_values: np.ndarray) -> np.ndarray:
+    """
+    第2段を計算しなかった行の類似度を補完する。
+    各行の第1段類似度の平均に、計算済みの行における「第2段 / 第1段」の平均比率を掛けた値を用いる。
+    計算済みの行は実際の値で埋める。
+    """
+    first_mean = first_stage_similarities.mean(axis=1)
+    ratio = 1.0
+    if scored_rows.size:
+        denominator = float(first_mean[scored_rows].mean())
+        if denominator > 0:
+            ratio = float(scored_values.mean()) / denominator
+    imputed = (first_mean * ratio).astype(np.float32)
+    imputed[scored_rows] = scored_values
+    return imputed
@@ -0,0 +1,21 @@
+import re
+from typing import List
+
+# BigQuery の SEARCH()（既定の LOG_ANALYZER）に合わせた区切り文字。テキストとキーワードを同じ規則でトークン化する
+# ローカルの検索バックエンド（DuckDB・転置インデックス）で、BigQuery と同じ一致判定を行うために使う
+SEARCH_DELIMITER_PATTERN = r"""[\[\]<>(){}|!;,'"*&?+/:=@.\-$%\\_\s]+"""
+
+_DELIMITER_RE = re.compile(SEARCH_DELIMITER_PATTERN)
+
+
+def analyze_search_text(text: str) -> List[str]:
+    """テキストを小文字化し、区切り文字で分割したトークンのリストを返す"""
+    if not text:
+        return []
+    return [token for token in _DELIMITER_RE.split(text.lower()) if token]
+
+
+def search_matches(text: str, keyword: str) -> bool:
+    """SEARCH(text, keyword) と同じく、キーワードのトークンがすべてテキストのトークンに含まれるかを返す"""
+    keyword_tokens = analyze_search_text(keyword)
+    return bool(keyword_tokens) and set(keyword_tokens) <= set(analyze_search_text(text))
@@ -0,0 +1,281 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from patents_core.core.state import SearchQuery
+from patents_core.utils.config import load_config_section
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+DEFAULT_SEARCH_CACHE_CONFIG = {
+    "enabled": True,
+    "path": ".cache/search",
+    "ttl_hours": 24,
+    "max_megabytes": 1024,
+    # 二段階取得で後から取得した請求項のキャッシュ（公開番号ごと）
+    "claims_path": ".cache/claims.sqlite3",
+    "claims_max_megabytes": 512,
+}
+
+# 公開日の既定範囲の開始日（build_patent_query と共通。終了日の既定は default_publication_date_to）
+DEFAULT_PUBLICATION_DATE_FROM = "20100101"
+
+
+def default_publication_date_to(today: Optional[datetime.date] = None) -> str:
+    """公開日の既定範囲の終了日（当日, YYYYMMDD）。日付が変わると、終了日を指定しない検索のキャッシュキーも変わる"""
+    return (today or datetime.date.today()).strftime("%Y%m%d")
+
+
+def normalize_ipc_code(code: str) -> str:
+    """IPCコードを正規化する（全角→半角、大文字化、空白除去。例: 'g06f 17/00' → 'G06F17/00'）"""
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", code)).upper()
+
+
+def _normalize_keyword(keyword: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", keyword)).strip()
+
+
+def normalize_assignee(name: str) -> str:
+    """
+    出願人名を照合用に正規化する（NFKC・大文字化・記号を空白に置換・空白の圧縮）。
+    build_patent_query で名寄せ済み出願人名に同じ正規化を行ってから照合する。
+    """
+    return re.sub(r"[\W_]+", " ", unicodedata.normalize("NFKC", name).upper()).strip()
+
+
+def _normalize_date(value: Optional[str], default: str) -> str:
+    digits = re.sub(r"\D", "", value or "")
+    return digits if len(digits) == 8 else default
+
+
+def canonicalize_search_query(query: SearchQuery) -> SearchQuery:
+    """
+    検索結果に影響しない表記の揺れを取り除いた、正規形の SearchQuery を返す。
+    - IPCコード: 正規化・重複除去・ソート
+    - キーワードグループ: 各グループ内を正規化・重複除去・ソートし、空グループを除いてグループ自体もソート
+    - キーワード検索の対象セクション: 小文字化・重複除去・ソート
+    - 国コード: 大文字化・重複除去・ソート / 出願人: normalize_assignee で正規化・重複除去・ソート
+    - 公開日: YYYYMMDD 形式に揃え、未指定なら既定の範囲（DEFAULT_PUBLICATION_DATE_FROM から当日まで）で埋める
+    """
+    ipc_codes = sorted({normalize_ipc_code(c) for c in (query.ipc_codes or []) if c and c.strip()})
+    groups = {
+        tuple(sorted({_normalize_keyword(kw) for kw in group if kw and kw.strip()}))
+        for group in (query.keyword_groups or [])
+    }
+    keyword_groups = sorted(list(g) for g in groups if g)
+    keywords = sorted({_normalize_keyword(kw) for kw in (query.keywords or []) if kw and kw.strip()})
+    keyword_fields = sorted({field.strip().lower() for field in query.keyword_fields if field and field.strip()})
+    country_codes = sorted({unicodedata.normalize("NFKC", c).strip().upper() for c in (query.country_codes or []) if c and c.strip()})
+    assignees = sorted({normalize_assignee(a) for a in (query.assignees or []) if a and normalize_assignee(a)})
+    return query.model_copy(update={
+        "ipc_codes": ipc_codes or None,
+        "keyword_groups": keyword_groups or None,
+        "keywords": keywords or None,
+        "keyword_fields": keyword_fields,
+        "country_codes": country_codes or None,
+        "assignees": assignees or None,
+        "publication_date_from": _normalize_date(query.publication_date_from, DEFAULT_PUBLICATION_DATE_FROM),
+        "publication_date_to": _normalize_date(query.publication_date_to, default_publication_date_to()),
+    })
+
+
+def search_query_hash(query: SearchQuery, template_version: str) -> str:
+    """
+    正規形の検索条件とSQLテンプレートのバージョンからキャッシュキーを作る。
+    SQLに使われない keywords（表示用の全キーワード）はキーに含めない。
+    """
+    canonical = canonicalize_search_query(query).model_dump(exclude={"keywords"})
+    payload = json.dumps({"query": canonical, "template_version": template_version}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+    """
+    検索結果をParquetファイルとして保存するキャッシュ。
+    有効期限（TTL）を過ぎたものは使わず、合計サイズが上限を超えたら古いものから削除する。
+    """
+
+    def __init__(self, path: Path, ttl_seconds: float, max_bytes: int):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.parquet"
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, float]]:
+        """キーに対応する結果と経過秒数を返す。ない場合・期限切れの場合は None"""
+        file = self._file(key)
+        with self._lock:
+            try:
+                age = time.time() - file.stat().st_mtime
+            except FileNotFoundError:
+                return None
+            if age > self.ttl_seconds:
+                file.unlink(missing_ok=True)
+                return None
+            return pd.read_parquet(file, dtype_backend="pyarrow"), age
+
+    def contains(self, key: str) -> bool:
+        """キーに対応する有効期限内の結果があるか（結果は読み込まない）"""
+        try:
+            age = time.time() - self._file(key).stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return age <= self.ttl_seconds
+
+    def put(self, key: str, df: pd.DataFrame) -> None:
+        """結果を保存し、必要に応じて古いファイルから削除する"""
+        file = self._file(key)
+        tmp_file = file.with_suffix(".tmp")
+        with self._lock:
+            df.to_parquet(tmp_file, index=False)
+            os.replace(tmp_file, file)
+            self._evict_if_needed()
+
+    def _evict_if_needed(self) -> None:
+        """合計サイズが上限を超えていれば、更新の古いファイルから削除する（ロック取得済みで呼ぶ）"""
+        files = sorted(self.path.glob("*.parquet"), key=lambda f: f.stat().st_mtime)
+        total = sum(f.stat().st_size for f in files)
+        for f in files:
+            if total <= self.max_bytes:
+                break
+            total -= f.stat().st_size
+            f.unlink(missing_ok=True)
+
+
+class ClaimsCache:
+    """
+    公開番号をキーとする請求項テキストの永続キャッシュ（公開済みの請求項は変わらないため有効期限は設けない）。
+    請求項が存在しない公開番号も None として保存し、再取得しない。
+    SQLiteに保存し、合計サイズが上限を超えたら最終アクセスの古いものから削除する（LRU）。
+    """
+
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS claims (
+                publication_number TEXT PRIMARY KEY,
+                claims TEXT,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_claims_last_access ON claims(last_access)")
+        self._conn.commit()
+
+    def get_many(self, publication_numbers: List[str]) -> Dict[str, Optional[str]]:
+        """公開番号のリストに対応する請求項を取得する。キャッシュにないものは結果に含まれない"""
+        found: Dict[str, Optional[str]] = {}
+        unique_numbers = list(dict.fromkeys(publication_numbers))
+        with self._lock:
+            # SQLiteの変数上限を超えないよう分割して問い合わせる
+            for i in range(0, len(unique_numbers), 500):
+                chunk = unique_numbers[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT publication_number, claims FROM claims WHERE publication_number IN ({placeholders})", chunk,
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE claims SET last_access = ? WHERE publication_number = ?", [(now, n) for n in found],
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, claims: Dict[str, Optional[str]]) -> None:
+        """公開番号と請求項の組を保存し、必要に応じてLRU削除を行う"""
+        if not claims:
+            return
+        now = time.time()
+        rows = [(n, text, len(text.encode("utf-8")) if text else 0, now) for n, text in claims.items()]
+        with self._lock:
+            self._conn.executemany(
+                """
+                INSERT INTO claims (publication_number, claims, nbytes, last_access) VALUES (?, ?, ?, ?)
+                ON CONFLICT (publication_number) DO UPDATE SET
+                    claims = excluded.claims, nbytes = excluded.nbytes, last_access = excluded.last_access
+                """,
+                rows,
+            )
+            self._conn.commit()
+            self._evict_if_needed()
+
+    def _evict_if_needed(self) -> None:
+        """合計サイズが上限を超えていれば、上限の9割に収まるまで古いエントリを削除する（ロック取得済みで呼ぶ）"""
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM claims").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT publication_number, nbytes FROM claims ORDER BY last_access ASC").fetchall()
+        to_delete = []
+        for n, nbytes in rows:
+            if total <= target:
+                break
+            to_delete.append((n,))
+            total -= nbytes
+        self._conn.executemany("DELETE FROM claims WHERE publication_number = ?", to_delete)
+        self._conn.commit()
+        print(f"請求項キャッシュから{len(to_delete)}件を削除しました（LRU）。")
+
+
+def _resolve_path(path: str) -> Path:
+    path = Path(path)
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+_default_cache: Optional[SearchResultCache] = None
+_default_claims_cache: Optional[ClaimsCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """プロセス内で共有される既定の検索結果キャッシュを返す（無効化されている場合は None）"""
+    global _default_cache
+    config = load_config_section("search_cache", DEFAULT_SEARCH_CACHE_CONFIG)
+    if not config["enabled"]:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SearchResultCache(
+                _resolve_path(os.environ.get("PATENTS_SEARCH_CACHE") or config["path"]),
+                float(config["ttl_hours"]) * 3600,
+                int(float(config["max_megabytes"]) * 1024 * 1024),
+            )
+        return _default_cache
+
+
+def get_claims_cache() -> Optional[ClaimsCache]:
+    """プロセス内で共有される既定の請求項キャッシュを返す（検索結果キャッシュが無効化されている場合は None）"""
+    global _default_claims_cache
+    config = load_config_section("search_cache", DEFAULT_SEARCH_CACHE_CONFIG)
+    if not config["enabled"]:
+        return None
+    with _default_cache_lock:
+        if _default_claims_cache is None:
+            _default_claims_cache = ClaimsCache(
+                _resolve_path(config["claims_path"]),
+                int(float(config["claims_max_megabytes"]) * 1024 * 1024),
+            )
+        return _default_claims_cache
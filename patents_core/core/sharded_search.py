@@ -0,0 +1,142 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from patents_core.core.search_cache import SearchResultCache, canonicalize_search_query, get_search_cache, search_query_hash
+from patents_core.core.state import QueryCostEstimate, SearchQuery
+from patents_core.core.tools import (
+    DEFAULT_BIGQUERY_CONFIG,
+    SQL_TEMPLATE_VERSION,
+    arrow_table_to_dataframe,
+    check_query_cost_limit,
+    fetch_search_results_arrow,
+    lazy_claims_enabled,
+)
+from patents_core.core.bigquery_client import get_bigquery_client
+from patents_core.utils.config import load_config_section
+
+
+def split_date_range(date_from: str, date_to: str) -> List[Tuple[str, str]]:
+    """YYYYMMDD の公開日の範囲を、暦年ごとの (From, To) のリストに分ける（範囲の両端の年は範囲内だけ）"""
+    shards = []
+    for year in range(int(date_from[:4]), int(date_to[:4]) + 1):
+        shard_from = max(date_from, f"{year}0101")
+        shard_to = min(date_to, f"{year}1231")
+        if shard_from <= shard_to:
+            shards.append((shard_from, shard_to))
+    return shards
+
+
+def shard_queries(_query: SearchQuery) -> List[SearchQuery]:
+    """検索条件を、公開日の範囲だけが異なる年ごとの検索条件に分ける"""
+    query = canonicalize_search_query(_query)
+    return [
+        query.model_copy(update={"publication_date_from": shard_from, "publication_date_to": shard_to})
+        for shard_from, shard_to in split_date_range(query.publication_date_from, query.publication_date_to)
+    ]
+
+
+def _shard_cache_key(shard_query: SearchQuery) -> str:
+    # 年ごとの結果は公開日・公開番号の降順で選んだもの（ordered=True）なので、1つのジョブの結果とはキーを分ける
+    claims_mode = "lazy" if lazy_claims_enabled() else "eager"
+    return search_query_hash(shard_query, f"{SQL_TEMPLATE_VERSION}-{claims_mode}-shard")
+
+
+def count_uncached_shards(_query: SearchQuery) -> int:
+    """年ごとの検索のうち、検索結果キャッシュになく実行が必要なものの数"""
+    cache = get_search_cache()
+    queries = shard_queries(_query)
+    if cache is None:
+        return len(queries)
+    return sum(1 for shard_query in queries if not cache.contains(_shard_cache_key(shard_query)))
+
+
+def _iter_ranked_rows(df: pd.DataFrame, frame_index: int) -> Iterator[Tuple[int, str, int, int]]:
+    """公開日・公開番号の降順に並んだDataFrameの行を、ヒープでマージするためのキーとして返す"""
+    for position, (date, number) in enumerate(zip(df["publication_date"].tolist(), df["publication_number"].tolist())):
+        yield int(date), number, frame_index, position
+
+
+def merge_top_per_country(frames: List[pd.DataFrame], max_per_country: int, limit: int) -> pd.DataFrame:
+    """
+    年ごとの検索結果を公開日・公開番号の降順にヒープでマージし、国ごとに上位 max_per_country 件、全体で limit 件を選ぶ。
+    各年の結果がその年の国ごとの上位N件（LIMIT件以内）を含んでいれば、全期間を1つのクエリで検索した結果と一致する。
+    """
+    frames = [
+        df.sort_values(["publication_date", "publication_number"], ascending=False, ignore_index=True)
+        for df in frames
+    ]
+    non_empty = [(i, df) for i, df in enumerate(frames) if not df.empty]
+    if not non_empty:
+        return frames[0] if frames else pd.DataFrame()
+
+    offsets = {}
+    total = 0
+    for i, df in non_empty:
+        offsets[i] = total
+        total += len(df)
+    per_country = {}
+    selected = []
+    for _, number, frame_index, position in heapq.merge(*(_iter_ranked_rows(df, i) for i, df in non_empty), reverse=True):
+        if len(selected) >= limit:
+            break
+        country = number[:2]
+        if per_country.get(country, 0) >= max_per_country:
+            continue
+        per_country[country] = per_country.get(country, 0) + 1
+        selected.append(offsets[frame_index] + position)
+
+    combined = pd.concat([df for _, df in non_empty], ignore_index=True)
+    return combined.iloc[selected].reset_index(drop=True)
+
+
+def _run_bigquery_shard(shard_query: SearchQuery) -> pd.DataFrame:
+    """1年分の検索を、国ごとの上位N件とLIMITを決定的に選ぶSQLで実行する（ワーカースレッドで呼ばれる）"""
+    return arrow_table_to_dataframe(fetch_search_results_arrow(shard_query, get_bigquery_client(), ordered=True))
+
+
+def search_patents_sharded(
+    _query: SearchQuery,
+    cost_estimate: Optional[QueryCostEstimate] = None,
+    run_shard: Optional[Callable[[SearchQuery], pd.DataFrame]] = None,
+    cache: Optional[SearchResultCache] = None,
+) -> Tuple[pd.DataFrame, Optional[float]]:
+    """
+    公開日の範囲を年ごとに分け、キャッシュにない年だけを上限つきのスレッドプールで並列に検索して、結果をマージする。
+    年ごとの結果はそれぞれ検索結果キャッシュに保存するため、公開日の範囲を広げても新しい年だけが検索される。
+    キャッシュにない年があり、見積もり（cost_estimate）が上限を超えている場合は QueryCostLimitExceeded を送出する。
+    run_shard には1年分の検索を実行する関数（既定はBigQuery）、cache には検索結果キャッシュ（既定は get_search_cache()）を渡せる。
+    エラーはそのまま送出する。
+    戻り値は search_patents_with_cache と同じく (検索結果, すべての年がキャッシュにあった場合の最も古い結果の経過秒数)。
+    """
+    query = canonicalize_search_query(_query)
+    config = load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)
+    cache = cache or get_search_cache()
+    run_shard = run_shard or _run_bigquery_shard
+
+    queries = shard_queries(query)
+    results: List[Optional[pd.DataFrame]] = [None] * len(queries)
+    cache_ages = []
+    for i, shard_query in enumerate(queries):
+        cached = cache.get(_shard_cache_key(shard_query)) if cache is not None else None
+        if cached is not None:
+            results[i], age_seconds = cached
+            cache_ages.append(age_seconds)
+
+    missing = [i for i, df in enumerate(results) if df is None]
+    print(f"--- Sharded search: {len(queries)}年分（キャッシュ: {len(queries) - len(missing)}年分） ---")
+    if missing:
+        check_query_cost_limit(cost_estimate)
+        with ThreadPoolExecutor(max_workers=max(1, int(config["shard_max_workers"]))) as executor:
+            fetched = list(executor.map(run_shard, [queries[i] for i in missing]))
+        for i, df in zip(missing, fetched):
+            results[i] = df
+            # 年ごとの検索は失敗すると例外になるため、結果が空でもキャッシュしてよい（その年には該当がない）
+            if cache is not None:
+                cache.put(_shard_cache_key(queries[i]), df)
+
+    merged = merge_top_per_country(results, query.max_results_per_country, query.limit)
+    print(f"{len(merged)}件の特許が見つかりました（{len(queries)}年分をマージ）。")
+    return merged, (max(cache_ages) if not missing and cache_ages else None)
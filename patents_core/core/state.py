@@ -1,17 +1,54 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
 from pydantic import BaseModel, Field
+from patents_core.utils.config import load_config_section
+
+# 類似度を計算するセクション（セクション別類似度の列の順序）と、その既定の重み
+SECTIONS = ("title", "abstract", "claims")
+DEFAULT_SIMILARITY_WEIGHTS = {"title": 0.4, "abstract": 0.4, "claims": 0.2}
 
 class SearchQuery(BaseModel):
     """特許検索の検索条件を定義するモデル"""
     ipc_codes: Optional[List[str]] = Field(default=None, description="IPCコードのリスト")
     keywords: Optional[List[str]] = Field(default=None, description="検索キーワードの全リスト")
     keyword_groups: Optional[List[List[str]]] = Field(default=None, description="グループ化された検索キーワードのリスト（AND/OR検索用）")
+    keyword_fields: List[str] = Field(default_factory=lambda: list(SECTIONS), description="キーワード検索の対象とするセクション（title, abstract, claims）。各セクションの日本語・英語のいずれかのテキストに一致すれば一致とする（出願人・公開番号は対象外）")
     publication_date_from: Optional[str] = Field(default=None, description="公開日の開始日 (YYYYMMDD)")
     publication_date_to: Optional[str] = Field(default=None, description="公開日の終了日 (YYYYMMDD)")
-    country_codes: Optional[List[str]] = Field(default=None, description="国コードのリスト")
-    assignees: Optional[List[str]] = Field(default=None, description="出願人のリスト")
+    country_codes: Optional[List[str]] = Field(default=None, description="国コードのリスト（公開番号の先頭2文字。例: JP, US）")
+    assignees: Optional[List[str]] = Field(default=None, description="出願人のリスト（正規化した名寄せ済み出願人名との部分一致）")
+    max_results_per_country: int = Field(default=3, description="国ごとの最大取得件数（公開日の新しい順）")
     limit: int = Field(default=100, description="最大取得件数")
 
+class QueryCostEstimate(BaseModel):
+    """検索クエリのドライランによる処理バイト数と料金の見積もり"""
+    total_bytes_processed: int = Field(description="ドライランで見積もられた処理バイト数")
+    estimated_cost_usd: float = Field(description="オンデマンド料金での見積もり額（USD）")
+    maximum_bytes_billed: Optional[int] = Field(default=None, description="設定されている課金バイト数の上限（None は上限なし）")
+    exceeds_limit: bool = Field(default=False, description="見積もりが上限を超えているかどうか")
+
+class ResultCursor(BaseModel):
+    """検索結果の続きを公開日の新しい順に読み進めるカーソル（result_cursor.fetch_more で使う）"""
+    backend: str = Field(description="結果の保存先の種類（bigquery: BigQueryの一時テーブル / duckdb, index: ローカルのParquetファイル）")
+    location: str = Field(description="BigQueryの一時テーブルのID、またはParquetファイルのパス")
+    job_id: Optional[str] = Field(default=None, description="BigQueryで候補を検索したジョブのID（ジョブの結果として順序どおりに読む）")
+    job_location: Optional[str] = Field(default=None, description="BigQueryのジョブのロケーション")
+    total_rows: int = Field(description="保存された候補の行数")
+    position: int = Field(default=0, description="次に読む行の位置")
+    seen: List[str] = Field(default_factory=list, description="取得済み（表示済み）の公開番号")
+
+class SavedSearch(BaseModel):
+    """定期的に再実行する保存済みの検索（saved_search.refresh で、前回より新しい公開だけを検索する）"""
+    name: str = Field(description="保存名（保存先のディレクトリ名）")
+    search_query: SearchQuery = Field(description="保存した検索条件（公開日の終了日が未指定なら、再実行のたびに当日まで検索する）")
+    plan_text: str = Field(description="スコア計算の基準となる調査方針")
+    similarity_weights: Dict[str, float] = Field(default_factory=lambda: load_config_section("similarity_weights", DEFAULT_SIMILARITY_WEIGHTS), description="スコア計算に用いるセクション別の重み")
+    watermark: Optional[int] = Field(default=None, description="取得済みの結果の最新の公開日（YYYYMMDD）。再実行ではこの日以降だけを検索する")
+    seen: List[str] = Field(default_factory=list, description="取得・スコア付け済みの公開番号")
+    last_run_at: Optional[str] = Field(default=None, description="最後に実行した日時（ISO 8601）")
+    last_run_new_rows: int = Field(default=0, description="最後の実行で追加した件数")
+
 class AppState(BaseModel):
     """アプリケーション全体のセッション状態を管理するモデル"""
     chat_history: List[Tuple[str, str]] = Field(default_factory=list, description="ユーザーとAIの対話履歴")
@@ -20,11 +57,21 @@ class AppState(BaseModel):
     search_query_explanation: Optional[str] = Field(default=None, description="検索クエリの自然言語による解説")
     generated_sql: Optional[str] = Field(default=None, description="生成されたBigQueryのSQL文")
     sql_explanation: Optional[str] = Field(default=None, description="SQL文の自然言語による解説")
+    query_cost_estimate: Optional[QueryCostEstimate] = Field(default=None, description="生成されたSQL文のドライランによる処理量・料金の見積もり")
+    search_handle: Optional[Any] = Field(default=None, exclude=True, description="実行中の検索のハンドル（async_search.SearchHandle）。SQL生成時に投入し、execute_search で結果を受け取る")
     search_results: Optional[pd.DataFrame] = Field(default=None, description="BigQueryからの検索結果")
     analyzed_results: Optional[pd.DataFrame] = Field(default=None, description="類似度計算などで分析された検索結果")
+    section_similarities: Optional[np.ndarray] = Field(default=None, description="search_resultsの各行に対応するセクション別類似度 (行数, [title, abstract, claims])")
+    partially_scored: Optional[np.ndarray] = Field(default=None, description="カスケード評価で請求項類似度を補完した行のフラグ（search_resultsの各行に対応）")
+    result_cursor: Optional[ResultCursor] = Field(default=None, description="検索結果の続きを取得するためのカーソル（最初の「さらに取得」で作成する）")
+    spilled_results_path: Optional[str] = Field(default=None, description="ストリーミング検索で全行をスコア付きで書き出したParquetファイルのパス")
+    similarity_weights: Dict[str, float] = Field(default_factory=lambda: load_config_section("similarity_weights", DEFAULT_SIMILARITY_WEIGHTS), description="スコア計算に用いるセクション別の重み")
     selected_patents_for_summary: List[str] = Field(default_factory=list, description="ユーザーが要約対象として選択した特許の公開番号リスト")
     summary_result: Optional[str] = Field(default=None, description="選択された特許の要約結果")
     error: Optional[str] = Field(default=None, description="処理中に発生したエラーメッセージ")
+    search_cache_hit: bool = Field(default=False, description="直近の検索結果が検索結果キャッシュから返されたかどうか")
+    search_cache_age_seconds: Optional[float] = Field(default=None, description="キャッシュから返された検索結果の経過秒数（キャッシュミス時は None）")
+    embedding_stats: Dict[str, int] = Field(default_factory=dict, description="直近の分析における埋め込み処理の統計（キャッシュのヒット数・ミス数、削減トークン数など）")
     
     # LangGraphの可視化用
     current_agent_node: Optional[str] = Field(default=None, description="現在実行中のエージェントノード名")
@@ -0,0 +1,112 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from patents_core.utils.config import load_config_section
+
+# セクションごとのトークン予算と、請求項の扱い方の既定値
+# claims_mode: "first_claim"（第1請求項のみ）/ "chunk"（分割して各チャンクをベクトル化し、プーリング）/ "truncate"（先頭のみ）
+DEFAULT_BUDGET_CONFIG = {
+    "title_tokens": 128,
+    "abstract_tokens": 512,
+    "claims_tokens": 1024,
+    "claims_mode": "first_claim",
+    "chunk_tokens": 512,
+    "max_chunks": 8,
+    "pooling": "mean",
+}
+
+# 請求項の区切り（日本語の【請求項１】形式と、英語の "1. " / "2. " 形式）
+_JA_CLAIM_PATTERN = re.compile(r"【請求項\s*[0-9０-９]+】")
+_EN_CLAIM_PATTERN = re.compile(r"(?:^|\s)(\d{1,3})\s*[\.\)]\s+(?=\S)")
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """tiktokenのエンコーディングを取得する。利用できない場合はNoneを返す"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktokenを利用できないため、文字数でトークン数を概算します: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """テキストのトークン数をローカルで数える（tiktokenがなければ文字数で上限側に概算）"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """テキストを先頭から max_tokens トークンまでに切り詰める"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def split_tokens(text: str, chunk_tokens: int, max_chunks: int) -> List[str]:
+    """テキストを chunk_tokens トークンごとのチャンクに分割する（最大 max_chunks 個）"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return [text[i:i + chunk_tokens] for i in range(0, len(text), chunk_tokens)][:max_chunks]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [
+        encoding.decode(tokens[i:i + chunk_tokens])
+        for i in range(0, len(tokens), chunk_tokens)
+    ][:max_chunks]
+
+
+def extract_first_claim(claims_text: str) -> str:
+    """
+    請求項テキストから第1請求項（独立請求項）を取り出す。
+    区切りが見つからない場合はテキスト全体を返す。
+    """
+    ja_matches = list(_JA_CLAIM_PATTERN.finditer(claims_text))
+    if ja_matches:
+        end = ja_matches[1].start() if len(ja_matches) > 1 else len(claims_text)
+        return claims_text[ja_matches[0].end():end].strip()
+
+    en_matches = [m for m in _EN_CLAIM_PATTERN.finditer(claims_text)]
+    if en_matches and en_matches[0].group(1) == "1":
+        # 番号が2の区切りを第1請求項の終わりとみなす
+        second = next((m for m in en_matches[1:] if m.group(1) == "2"), None)
+        end = second.start() if second else len(claims_text)
+        return claims_text[en_matches[0].end():end].strip()
+    return claims_text.strip()
+
+
+def apply_text_budget(section: str, text: str, config: Optional[dict] = None, stats: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    セクションのテキストをトークン予算内に収め、ベクトル化するテキストのリストを返す。
+    通常は1要素で、請求項を chunk モードで扱う場合のみ複数のチャンクになる（空文字は空リスト）。
+    stats を渡すと、元のトークン数・予算適用後のトークン数・削減トークン数を加算する。
+    """
+    config = config or load_config_section("text_budget", DEFAULT_BUDGET_CONFIG)
+    if not text or not text.strip():
+        return []
+
+    budget = int(config[f"{section}_tokens"])
+    if section == "claims" and config["claims_mode"] == "first_claim":
+        pieces = [truncate_tokens(extract_first_claim(text), budget)]
+    elif section == "claims" and config["claims_mode"] == "chunk":
+        chunk_tokens = int(config["chunk_tokens"])
+        max_chunks = max(1, min(int(config["max_chunks"]), budget // max(1, chunk_tokens)))
+        pieces = split_tokens(text, chunk_tokens, max_chunks)
+    else:
+        pieces = [truncate_tokens(text, budget)]
+    pieces = [p for p in pieces if p.strip()]
+
+    if stats is not None:
+        original = count_tokens(text)
+        budgeted = sum(count_tokens(p) for p in pieces)
+        stats["tokens_original"] = stats.get("tokens_original", 0) + original
+        stats["tokens_budgeted"] = stats.get("tokens_budgeted", 0) + budgeted
+        stats["tokens_saved"] = stats.get("tokens_saved", 0) + max(0, original - budgeted)
+    return pieces
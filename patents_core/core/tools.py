@@ -1,103 +1,404 @@
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import bigquery
-from google.cloud.bigquery import Client, QueryJobConfig, ScalarQueryParameter
+from google.cloud.bigquery import ArrayQueryParameter, Client, QueryJobConfig, ScalarQueryParameter
+import os
 import pandas as pd
-from patents_core.core.state import SearchQuery
+import pyarrow as pa
+from patents_core.core.state import QueryCostEstimate, SearchQuery
+from patents_core.core.bigquery_client import get_bigquery_client, get_bqstorage_client
+from patents_core.core.search_cache import canonicalize_search_query, get_claims_cache, get_search_cache, search_query_hash
+from patents_core.utils.config import load_config_section
 import streamlit as st
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
-def build_patent_query(query: SearchQuery, max_results_per_country: int = 3) -> Tuple[str, List[ScalarQueryParameter]]:
+# SQLテンプレートのバージョン。build_patent_query の生成するSQLの意味が変わったら上げる（検索結果キャッシュのキーに含まれる）
+SQL_TEMPLATE_VERSION = "3"
+
+# use_storage_api: 結果の取得に BigQuery Storage Read API を使う（使えない場合は REST API に切り替える）
+# maximum_bytes_billed: 1回の検索で課金される処理バイト数の上限（None なら上限なし）。超える検索は実行しない
+# price_per_tib_usd: 見積もりに使うオンデマンド料金（USD / TiB）
+# claims_fetch: "eager"（検索時に請求項も取得）/ "lazy"（検索時は請求項を取得せず、必要な行だけ fetch_claims で後から取得）
+# date_shards: "none"（1つのジョブで検索）/ "year"（公開日の範囲を年ごとに分けて並列に検索し、結果をマージする。sharded_search.py）
+# shard_max_workers: 年ごとの検索を同時に実行するジョブ数の上限
+# batch_queries_per_job: search_patents_batch で1つのジョブ（UNION ALL）にまとめる検索条件の数
+# batch_max_workers: search_patents_batch で同時に実行するジョブ数の上限
+# search_timeout_seconds: execute_search で検索の完了を待つ秒数（None なら無制限）。超えた検索は中止する
+DEFAULT_BIGQUERY_CONFIG = {
+    "use_storage_api": True,
+    "maximum_bytes_billed": None,
+    "price_per_tib_usd": 6.25,
+    "claims_fetch": "eager",
+    "date_shards": "none",
+    "shard_max_workers": 4,
+    "batch_queries_per_job": 10,
+    "batch_max_workers": 4,
+    "search_timeout_seconds": None,
+    # claims_fetch が lazy の場合に、カスケード評価が無効でも類似度計算のために請求項を取得する上位件数
+    # （タイトル・要約の類似度の順。カスケード評価が有効なら cascade の top_n / score_threshold を使う）
+    "lazy_claims_top_n": 50,
+}
+
+
+class QueryCostLimitExceeded(Exception):
+    """ドライランの見積もりが課金バイト数の上限を超えたため、検索を実行しなかったことを表す"""
+
+
+# backend: "bigquery"（既定）/ "duckdb"（publications と同じスキーマのParquetスナップショットをDuckDBで検索する。local_backend.py）
+#          / "index"（同じスナップショットをメモリ上の転置インデックスで検索する。inverted_index.py）
+DEFAULT_SEARCH_BACKEND_CONFIG = {
+    "backend": "bigquery",
+    "local_snapshot": "test/fixtures/publications_fixture.parquet",
+}
+
+# ローカルのParquetスナップショットを検索するバックエンド
+LOCAL_SEARCH_BACKENDS = ("duckdb", "index")
+
+PUBLICATIONS_TABLE = "patents-public-data.patents.publications"
+
+# キーワード検索の対象にできるセクションと、対応する多言語テキストの列
+KEYWORD_SEARCH_COLUMNS = {
+    "title": "title_localized",
+    "abstract": "abstract_localized",
+    "claims": "claims_localized",
+}
+
+# 取得するテキストの言語（先頭の言語を優先する）
+LOCALIZED_LANGUAGES = ("ja", "en")
+
+
+class _QueryParams:
     """
-    検索条件オブジェクトからBigQueryのSQL文とクエリパラメータを構築する。
-    最終FIX版：(IPC OR (キーワードグループAND検索))
+    クエリパラメータを登録し、SQL中で参照する名前（@name）を返す。add は用途ごとに連番の名前を付ける。
+    type_ に "ARRAY" を指定すると、値（文字列のリスト）を STRING の配列パラメータとして登録する。
+    prefix を指定すると、すべての名前の先頭に付ける（複数の検索条件を1つのSQLにまとめる場合に名前が衝突しないようにする）。
+    """
+
+    def __init__(self, prefix: str = ""):
+        self.params: list = []
+        self._counters = {}
+        self._prefix = prefix
+
+    def set(self, name: str, type_: str, value) -> str:
+        name = f"{self._prefix}{name}"
+        if type_ == "ARRAY":
+            self.params.append(ArrayQueryParameter(name, "STRING", list(value)))
+        else:
+            self.params.append(ScalarQueryParameter(name, type_, value))
+        return f"@{name}"
+
+    def add(self, prefix: str, type_: str, value) -> str:
+        index = self._counters.get(prefix, 0)
+        self._counters[prefix] = index + 1
+        return self.set(f"{prefix}_{index}", type_, value)
+
+
+def _languages_sql() -> str:
+    return ", ".join(f"'{lang}'" for lang in LOCALIZED_LANGUAGES)
+
+
+def _localized_text_sql(column: str) -> str:
+    """多言語テキストの配列から、優先する言語のテキストを1つ取り出す式"""
+    return (
+        f"(SELECT text FROM UNNEST(f.{column}) WHERE language IN ({_languages_sql()}) "
+        f"ORDER BY (language = '{LOCALIZED_LANGUAGES[0]}') DESC LIMIT 1)"
+    )
+
+
+def _country_predicate(country_codes: List[str], params: _QueryParams) -> Optional[str]:
+    """国コード（公開番号の先頭2文字）の絞り込み。国ごとの上位N件の区分と同じ式を使う"""
+    if not country_codes:
+        return None
+    return f"SUBSTR(p.publication_number, 1, 2) IN UNNEST({params.set('country_codes', 'ARRAY', country_codes)})"
+
+
+def _assignee_predicate(assignees: List[str], params: _QueryParams) -> Optional[str]:
     """
-    query_params = []
-    where_conditions = []
-    param_counter = 0
+    出願人の絞り込み（いずれか）。名寄せ済み出願人名を normalize_assignee と同じ規則で正規化し、
+    語の区切りを保った部分一致で照合する（例: 'TOYOTA' は 'TOYOTA MOTOR CORP' に一致する）。
+    """
+    if not assignees:
+        return None
+    normalized_name = r"TRIM(REGEXP_REPLACE(UPPER(NORMALIZE(a.name, NFKC)), r'[^\p{L}\p{N}]+', ' '))"
+    matches = [
+        f"STRPOS(CONCAT(' ', {normalized_name}, ' '), {params.add('assignee', 'STRING', f' {name} ')}) > 0"
+        for name in assignees
+    ]
+    return f"EXISTS (SELECT 1 FROM UNNEST(p.assignee_harmonized) AS a WHERE {' OR '.join(matches)})"
+
+
+def _ipc_predicate(ipc_codes: List[str], params: _QueryParams) -> Optional[str]:
+    """IPCコードの前方一致（いずれか）。ipc列だけを読むため、基底テーブルの走査時に評価できる"""
+    if not ipc_codes:
+        return None
+    likes = [f"c.code LIKE {params.add('ipc', 'STRING', f'{code}%')}" for code in ipc_codes]
+    return f"EXISTS (SELECT 1 FROM UNNEST(p.ipc) AS c WHERE {' OR '.join(likes)})"
+
+
+def _keyword_predicate(keyword_groups: List[List[str]], keyword_fields: List[str], params: _QueryParams) -> Optional[str]:
+    """
+    キーワード条件（グループ間はAND, グループ内はOR）。
+    SEARCH は指定されたセクションの列の、取得対象の言語（ja, en）のテキストそれぞれに対して行い、いずれかに一致すれば一致とする。
+    以前の版は行全体（優先する言語を1つ選んだタイトル・要約・請求項と、出願人・公開番号など）を SEARCH していたため、
+    次の点で一致する行が変わっている。
+    - 優先しない言語のテキスト（日本語のタイトルがある文献の英語のタイトルなど）にだけ含まれるキーワードでも一致する
+    - 出願人・公開番号・IPCコードは対象外。出願人での絞り込みは SearchQuery.assignees、IPCコードは SearchQuery.ipc_codes で指定する
+    """
+    columns = [KEYWORD_SEARCH_COLUMNS[field] for field in keyword_fields if field in KEYWORD_SEARCH_COLUMNS]
+    if not keyword_groups or not columns:
+        return None
+    group_predicates = []
+    for group in keyword_groups:
+        keyword_predicates = []
+        for kw in group:
+            param = params.add("kw", "STRING", kw)
+            keyword_predicates.extend(
+                f"EXISTS (SELECT 1 FROM UNNEST(p.{column}) AS l WHERE l.language IN ({_languages_sql()}) AND SEARCH(l.text, {param}))"
+                for column in columns
+            )
+        group_predicates.append(f"({' OR '.join(keyword_predicates)})")
+    return f"({' AND '.join(group_predicates)})"
+
 
-    with_clause = f"""
-WITH localized_patents AS (
+def _filtered_patents_sql(query: SearchQuery, params: _QueryParams, include_claims: bool, ordered: bool) -> str:
+    """
+    正規形の検索条件から、条件を満たす行を国ごとの上位N件・LIMIT件まで絞り込むSELECT文（WITH句の中身）を組み立てる。
+    1. 公開日の範囲・国・出願人・IPCコード・キーワードの条件を、基底テーブルの走査時に評価する
+    2. 条件を満たした行から、国ごとに公開日の新しい順で上位N件（query.max_results_per_country）を QUALIFY で選ぶ
+    """
+    # --- 1. 基底テーブルの走査時に評価する条件 ---
+    where_conditions = [
+        f"p.publication_date BETWEEN {params.set('pub_from', 'INT64', int(query.publication_date_from))} "
+        f"AND {params.set('pub_to', 'INT64', int(query.publication_date_to))}"
+    ]
+    # 国・出願人は検索範囲そのものの絞り込みなので、IPC/キーワードとはANDで結合する
+    where_conditions.extend(
+        predicate for predicate in (
+            _country_predicate(query.country_codes, params),
+            _assignee_predicate(query.assignees, params),
+        ) if predicate
+    )
+    match_conditions = [
+        predicate for predicate in (
+            _ipc_predicate(query.ipc_codes, params),
+            _keyword_predicate(query.keyword_groups, query.keyword_fields, params),
+        ) if predicate
+    ]
+    if match_conditions:
+        where_conditions.append(f"({' OR '.join(match_conditions)})")
+    where_clause = "\n    AND ".join(where_conditions)
+
+    # --- 2. 国ごとの上位N件 ---
+    max_per_country = params.set("max_per_country", "INT64", query.max_results_per_country)
+    limit = params.set("limit", "INT64", query.limit)
+
+    row_order = "p.publication_date DESC, p.publication_number DESC" if ordered else "p.publication_date DESC"
+    limit_clause = f"ORDER BY {row_order}\n  LIMIT {limit}" if ordered else f"LIMIT {limit}"
+    claims_column = "\n    p.claims_localized," if include_claims else ""
+    return f"""
   SELECT
     p.publication_number,
-    SUBSTR(p.publication_number, 1, 2) as country_code,
-    (SELECT text FROM UNNEST(p.title_localized)    WHERE language IN ('ja', 'en') ORDER BY (language = 'ja') DESC LIMIT 1) AS title,
-    (SELECT text FROM UNNEST(p.abstract_localized) WHERE language IN ('ja', 'en') ORDER BY (language = 'ja') DESC LIMIT 1) AS abstract,
-    (SELECT text FROM UNNEST(p.claims_localized)   WHERE language IN ('ja', 'en') ORDER BY (language = 'ja') DESC LIMIT 1) AS claims,
-    (SELECT STRING_AGG(name) FROM UNNEST(p.assignee_harmonized)) as assignee_harmonized,
     p.publication_date,
-    p.ipc
-  FROM `patents-public-data.patents.publications` AS p
-),
-ranked_patents AS (
-  SELECT 
-    *,
-    ROW_NUMBER() OVER(PARTITION BY country_code ORDER BY publication_date DESC) as rn
-  FROM localized_patents
+    p.ipc,
+    p.title_localized,
+    p.abstract_localized,{claims_column}
+    p.assignee_harmonized
+  FROM `{PUBLICATIONS_TABLE}` AS p
+  WHERE {where_clause}
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY SUBSTR(p.publication_number, 1, 2) ORDER BY {row_order}) <= {max_per_country}
+  {limit_clause}
+"""
+
+
+def _result_columns_sql(include_claims: bool) -> str:
+    """絞り込んだ行（別名 f）から、言語を選んだテキストと結合した出願人などの結果の列を取り出すSELECT句の中身"""
+    claims_select = f"\n  {_localized_text_sql('claims_localized')} AS claims," if include_claims else ""
+    return f"""
+  f.publication_number,
+  {_localized_text_sql("title_localized")} AS title,
+  {_localized_text_sql("abstract_localized")} AS abstract,{claims_select}
+  (SELECT STRING_AGG(name) FROM UNNEST(f.assignee_harmonized)) AS assignee_harmonized,
+  f.publication_date,
+  (SELECT ARRAY_AGG(c.code) FROM UNNEST(f.ipc) AS c) AS ipc_codes
+"""
+
+
+def build_patent_query(query: SearchQuery, include_claims: bool = True, ordered: bool = False) -> Tuple[str, list]:
+    """
+    検索条件オブジェクトからBigQueryのSQL文とクエリパラメータを構築する。
+    条件は 公開日 AND 国 AND 出願人 AND (IPC OR (キーワードグループAND検索)) で、検索条件は正規形にしてから使う。
+    キーワードの検索対象は keyword_fields のセクションの ja/en のテキストだけ（詳細は _keyword_predicate）。
+    include_claims=False の場合は請求項を取得しない（二段階取得の1段目。請求項は fetch_claims で後から取得する）。
+    ordered=True の場合は、国ごとの上位N件とLIMITを公開日・公開番号の降順で決定的に選び、結果もその順に並べる
+    （公開日で分割した検索の結果のマージや、結果を順に読み進めるカーソルで使う）。
+
+    フィルタは次の順で適用されるように組み立てる。
+    1. 公開日の範囲・国・出願人・IPCコード・キーワードの条件を、基底テーブルの走査時に評価する
+    2. 条件を満たした行から、国ごとに公開日の新しい順で上位N件（query.max_results_per_country）を QUALIFY で選ぶ
+    3. 残った行（LIMIT件以下）についてのみ、タイトル・要約・請求項の言語を選び、出願人を結合する
+    """
+    query = canonicalize_search_query(query)
+    params = _QueryParams()
+    order_clause = "ORDER BY f.publication_date DESC, f.publication_number DESC\n" if ordered else ""
+    sql = f"""
+WITH filtered_patents AS ({_filtered_patents_sql(query, params, include_claims, ordered)})
+SELECT{_result_columns_sql(include_claims)}FROM filtered_patents AS f
+{order_clause}"""
+    return sql, params.params
+
+
+def build_batch_patent_query(queries: Dict[str, SearchQuery], include_claims: bool = True) -> Tuple[str, list]:
+    """
+    複数の検索条件を、1つのジョブで実行できるSQL文とクエリパラメータにまとめる（{query_id: 検索条件}）。
+    検索条件ごとの絞り込みを build_patent_query と同じWITH句にし、結果に query_id の列を付けて UNION ALL で結合する。
+    パラメータ名は検索条件ごとに q0_, q1_, ... を先頭に付けて区別する。
+    """
+    ctes, selects, all_params = [], [], []
+    for i, (query_id, query) in enumerate(queries.items()):
+        params = _QueryParams(prefix=f"q{i}_")
+        ctes.append(f"q{i}_patents AS ({_filtered_patents_sql(canonicalize_search_query(query), params, include_claims, ordered=False)})")
+        tag = params.set("query_id", "STRING", query_id)
+        selects.append(f"SELECT\n  {tag} AS query_id,{_result_columns_sql(include_claims)}FROM q{i}_patents AS f")
+        all_params.extend(params.params)
+    union_all = "\nUNION ALL\n".join(selects)
+    sql = f"""
+WITH {", ".join(ctes)}
+{union_all}
 """
+    return sql, all_params
+
 
-    # --- 日付条件 (必須) ---
-    pub_from_str = getattr(query, 'publication_date_from', None) or "20100101"
-    pub_to_str = getattr(query, 'publication_date_to', None) or "20250721" # 最新の日付に更新
-    where_conditions.append("publication_date BETWEEN @pub_from AND @pub_to")
-    query_params.extend([
-        ScalarQueryParameter("pub_from", "INT64", int(pub_from_str.replace('-', ''))),
-        ScalarQueryParameter("pub_to", "INT64", int(pub_to_str.replace('-', '')))
-    ])
-
-    # --- IPCとキーワードの複合条件 ---
-    sub_where_parts = []
-
-    # IPC条件 (OR)
-    if query.ipc_codes:
-        ipc_wheres = []
-        for code in query.ipc_codes:
-            param_name = f"param_{param_counter}"
-            param_counter += 1
-            ipc_wheres.append(f"EXISTS (SELECT 1 FROM UNNEST(ipc) c WHERE c.code LIKE @{param_name})")
-            query_params.append(ScalarQueryParameter(param_name, "STRING", f"{code}%"))
-        if ipc_wheres:
-            sub_where_parts.append(f"({' OR '.join(ipc_wheres)})")
-
-    # キーワード条件 (グループ間はAND, グループ内はOR)
-    if query.keyword_groups:
-        keyword_group_wheres = []
-        for group in query.keyword_groups:
-            if not group: continue
-            keyword_or_wheres = []
-            for kw in group:
-                param_name = f"param_{param_counter}"
-                param_counter += 1
-                keyword_or_wheres.append(f"SEARCH(localized_patents, @{param_name})")
-                query_params.append(ScalarQueryParameter(param_name, "STRING", kw))
-            if keyword_or_wheres:
-                keyword_group_wheres.append(f"({' OR '.join(keyword_or_wheres)})")
-        if keyword_group_wheres:
-            sub_where_parts.append(f"({' AND '.join(keyword_group_wheres)})")
-
-    # IPCとキーワードの条件全体をORで結合
-    if sub_where_parts:
-        where_conditions.append(f"({' OR '.join(sub_where_parts)})")
-
-    # --- 最終的なSQLの組み立て ---
-    final_where_clause = " AND ".join(where_conditions)
-
-    sql = f"""{with_clause}
-WHERE {final_where_clause}
-)
+def build_claims_query(publication_numbers: List[str]) -> Tuple[str, list]:
+    """公開番号のリストに対応する請求項（日本語を優先し、なければ英語）を取得するSQL文とクエリパラメータを構築する"""
+    sql = f"""
 SELECT
-    publication_number,
-    title,
-    abstract,
-    claims,
-    assignee_harmonized,
-    publication_date,
-    (SELECT ARRAY_AGG(c.code) FROM UNNEST(ipc) AS c) AS ipc_codes
-FROM ranked_patents
-WHERE rn <= {max_results_per_country}
-LIMIT @limit
+  f.publication_number,
+  {_localized_text_sql("claims_localized")} AS claims
+FROM `{PUBLICATIONS_TABLE}` AS f
+WHERE f.publication_number IN UNNEST(@publication_numbers)
 """
-    query_params.append(ScalarQueryParameter("limit", "INT64", query.limit))
+    return sql, [ArrayQueryParameter("publication_numbers", "STRING", list(publication_numbers))]
+
+
+def lazy_claims_enabled() -> bool:
+    """請求項を検索時ではなく、必要になった行だけ後から取得する設定かどうか"""
+    return load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)["claims_fetch"] == "lazy"
+
+
+def get_search_backend() -> str:
+    """検索バックエンドを返す（環境変数 PATENTS_SEARCH_BACKEND、なければ config/weights.yaml の search_backend.backend）"""
+    config = load_config_section("search_backend", DEFAULT_SEARCH_BACKEND_CONFIG)
+    return os.environ.get("PATENTS_SEARCH_BACKEND") or config["backend"]
+
+
+def local_search_backend_enabled() -> bool:
+    """ローカルのParquetスナップショットを検索するバックエンド（duckdb / index）かどうか"""
+    return get_search_backend() in LOCAL_SEARCH_BACKENDS
+
+
+def date_sharding_enabled() -> bool:
+    """公開日の範囲を年ごとに分けて検索する設定かどうか"""
+    return load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)["date_shards"] == "year"
+
+
+def build_configured_patent_query(_query: SearchQuery, ordered: bool = False) -> Tuple[str, list]:
+    """設定された請求項の取得モードに従って build_patent_query を呼ぶ（検索・見積もり・SQL表示で共通）"""
+    return build_patent_query(_query, include_claims=not lazy_claims_enabled(), ordered=ordered)
+
+
+def _search_job_config(query_params: list, dry_run: bool = False) -> QueryJobConfig:
+    """検索用のジョブ設定を作る。課金バイト数の上限が設定されていれば、BigQuery側でも上限を超えるジョブを拒否させる"""
+    config = load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)
+    job_config = QueryJobConfig(query_parameters=query_params)
+    if config["maximum_bytes_billed"]:
+        job_config.maximum_bytes_billed = int(config["maximum_bytes_billed"])
+    if dry_run:
+        job_config.dry_run = True
+        job_config.use_query_cache = False
+    return job_config
+
+
+def _dry_run_cost(sql: str, query_params: list, client: Client, job_count: int = 1) -> QueryCostEstimate:
+    """SQLをドライランし、処理バイト数（同じ処理量のジョブを job_count 個実行する場合はその合計）と料金を見積もる"""
+    config = load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)
+    query_job = client.query(sql, job_config=_search_job_config(query_params, dry_run=True))
+    total_bytes = int(query_job.total_bytes_processed or 0) * job_count
+    limit = int(config["maximum_bytes_billed"]) if config["maximum_bytes_billed"] else None
+    return QueryCostEstimate(
+        total_bytes_processed=total_bytes,
+        estimated_cost_usd=total_bytes / 1024 ** 4 * float(config["price_per_tib_usd"]),
+        maximum_bytes_billed=limit,
+        exceeds_limit=limit is not None and total_bytes > limit,
+    )
+
+
+def estimate_query_cost(_query: SearchQuery, client: Optional[Client] = None) -> QueryCostEstimate:
+    """
+    build_patent_queryで生成したSQLをドライランし、処理バイト数と料金を見積もる（ドライランは課金されない）。
+    エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    client = client or get_bigquery_client()
+    sql, query_params = build_configured_patent_query(_query)
+    job_count = 1
+    if date_sharding_enabled():
+        # publications は公開日で分割されていないため、年ごとのジョブもそれぞれ同じ列を全件走査する。
+        # キャッシュにない年の数だけ、1つのジョブの処理量がかかる
+        from patents_core.core.sharded_search import count_uncached_shards
+
+        job_count = count_uncached_shards(_query)
+    estimate = _dry_run_cost(sql, query_params, client, job_count)
+    print(f"ドライランの見積もり: {estimate.total_bytes_processed / 1024 ** 3:.2f} GiB（約 ${estimate.estimated_cost_usd:.2f}）")
+    return estimate
+
+
+def arrow_table_to_dataframe(table: pa.Table) -> pd.DataFrame:
+    """
+    Arrowのテーブルを、Arrowを裏付けとするdtype（pd.ArrowDtype）のDataFrameに変換する。
+    claims などの長いテキストや ipc_codes の配列をPythonオブジェクトに展開しないため、コピーが最小限で済む。
+    """
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _query_job_to_arrow(query_job, client: Client) -> pa.Table:
+    """クエリジョブの結果をArrowのテーブルで受け取る（Storage Read APIが使えなければREST APIで取得する）"""
+    config = load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)
+    if config["use_storage_api"]:
+        try:
+            bqstorage_client = get_bqstorage_client(client)
+            if bqstorage_client is not None:
+                return query_job.result().to_arrow(bqstorage_client=bqstorage_client)
+        except Exception as e:
+            print(f"BigQuery Storage Read APIでの取得に失敗したため、REST APIで取得します: {e}")
+    return query_job.result().to_arrow(create_bqstorage_client=False)
+
+
+def submit_search_job(_query: SearchQuery, client: Client, ordered: bool = False) -> bigquery.QueryJob:
+    """
+    build_patent_queryで生成したSQLのジョブを投入し、完了を待たずにジョブを返す。
+    結果は fetch_search_job_results で取得する。エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    sql, query_params = build_configured_patent_query(_query, ordered=ordered)
+    job_config = _search_job_config(query_params)
+
+    print("--- BigQuery実行クエリ ---")
+    print(sql)
+    print("--- クエリパラメータ ---")
+    print([f"name: {p.name}, value: {p.values if isinstance(p, ArrayQueryParameter) else p.value}" for p in query_params])
+
+    return client.query(sql, job_config=job_config)
+
 
-    return sql, query_params
+def fetch_search_job_results(query_job: bigquery.QueryJob, client: Client) -> pd.DataFrame:
+    """投入済みの検索ジョブの完了を待ち、結果をDataFrameとして返す"""
+    return arrow_table_to_dataframe(_query_job_to_arrow(query_job, client))
+
+
+def fetch_search_results_arrow(_query: SearchQuery, client: Optional[Client] = None, ordered: bool = False) -> pa.Table:
+    """
+    build_patent_queryで生成したSQLを実行し、検索結果をArrowのテーブルとして返す。
+    エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    client = client or get_bigquery_client()
+    return _query_job_to_arrow(submit_search_job(_query, client, ordered), client)
 
 
 def search_patents_in_bigquery(_query: SearchQuery) -> pd.DataFrame:
@@ -106,24 +407,13 @@ def search_patents_in_bigquery(_query: SearchQuery) -> pd.DataFrame:
     """
     print("--- Executing BigQuery Search ---")
     try:
-        client = Client()
+        client = get_bigquery_client()
     except Exception as e:
         st.error(f"BigQueryクライアントの初期化に失敗しました。GCP認証情報を確認してください。: {e}")
         return pd.DataFrame()
 
-    # SQLとパラメータを生成
-    sql, query_params = build_patent_query(_query)
-
-    job_config = QueryJobConfig(query_parameters=query_params)
-
-    print("--- BigQuery実行クエリ ---")
-    print(sql)
-    print("--- クエリパラメータ ---")
-    print([f"name: {p.name}, type: {p.type_}, value: {p.value}" for p in query_params])
-
     try:
-        query_job = client.query(sql, job_config=job_config)
-        results_df = query_job.result().to_dataframe()
+        results_df = arrow_table_to_dataframe(fetch_search_results_arrow(_query, client))
         print(f"{len(results_df)}件の特許が見つかりました。")
         return results_df
     except Exception as e:
@@ -133,3 +423,256 @@ def search_patents_in_bigquery(_query: SearchQuery) -> pd.DataFrame:
             'assignee_harmonized', 'publication_date', 'ipc_codes'
         ]
         return pd.DataFrame(columns=expected_columns)
+
+
+def search_local_snapshot(_query: SearchQuery, include_claims: bool = True) -> pd.DataFrame:
+    """
+    設定されたローカルの検索バックエンドでスナップショットを検索する。
+    index は転置インデックス（inverted_index.py）、duckdb はDuckDB（local_backend.py）で、結果は同じになる。
+    エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    if get_search_backend() == "index":
+        from patents_core.core.inverted_index import search_patents_with_index
+
+        return search_patents_with_index(_query, include_claims)
+    from patents_core.core.local_backend import search_patents_locally
+
+    return search_patents_locally(_query, include_claims)
+
+
+def search_patents_in_local_snapshot(_query: SearchQuery) -> pd.DataFrame:
+    """
+    search_patents_in_bigquery と同じ列で、ローカルのParquetスナップショットを検索する（search_local_snapshot）
+    """
+    print(f"--- Executing Local Search ({get_search_backend()}) ---")
+    try:
+        return search_local_snapshot(_query, include_claims=not lazy_claims_enabled())
+    except Exception as e:
+        st.error(f"ローカルスナップショットでの検索中にエラーが発生しました: {e}")
+        expected_columns = [
+            'publication_number', 'title', 'abstract', 'claims',
+            'assignee_harmonized', 'publication_date', 'ipc_codes'
+        ]
+        return pd.DataFrame(columns=expected_columns)
+
+
+def check_query_cost_limit(cost_estimate: Optional[QueryCostEstimate]) -> None:
+    """見積もりが課金バイト数の上限を超えている場合は QueryCostLimitExceeded を送出する"""
+    if cost_estimate is not None and cost_estimate.exceeds_limit:
+        raise QueryCostLimitExceeded(
+            f"処理量の見積もり {cost_estimate.total_bytes_processed / 1024 ** 3:.1f} GiB が"
+            f"上限 {cost_estimate.maximum_bytes_billed / 1024 ** 3:.1f} GiB を超えるため、検索を実行しませんでした。"
+            "IPCコードやキーワード、公開日の範囲で検索条件を絞り込んでください。"
+        )
+
+
+def search_cache_key(_query: SearchQuery) -> str:
+    """1つのジョブで検索した結果の、検索結果キャッシュのキー"""
+    # 請求項を含むかどうかで結果の列が変わるため、取得モードもキーに含める
+    claims_mode = "lazy" if lazy_claims_enabled() else "eager"
+    return search_query_hash(_query, f"{SQL_TEMPLATE_VERSION}-{claims_mode}")
+
+
+def is_search_cached(_query: SearchQuery) -> bool:
+    """
+    search_patents_with_cache がBigQueryを実行せずに検索結果キャッシュから返せるか
+    （年ごとの分割検索では、すべての年がキャッシュにあるか）。ローカルの検索バックエンドでは常に False。
+    """
+    if local_search_backend_enabled():
+        return False
+    if date_sharding_enabled():
+        from patents_core.core.sharded_search import count_uncached_shards
+
+        return count_uncached_shards(_query) == 0
+    cache = get_search_cache()
+    return cache is not None and cache.contains(search_cache_key(_query))
+
+
+def search_patents_with_cache(_query: SearchQuery, cost_estimate: Optional[QueryCostEstimate] = None) -> Tuple[pd.DataFrame, Optional[float]]:
+    """
+    検索結果キャッシュを確認し、正規形の検索条件とSQLテンプレートのバージョンが一致する
+    有効期限内の結果があればBigQueryを実行せずに返す。なければ検索して結果を保存する。
+    キャッシュになく、見積もり（cost_estimate）が課金バイト数の上限を超えている場合は QueryCostLimitExceeded を送出する。
+    戻り値は (検索結果, キャッシュヒット時の経過秒数。ミスなら None)。
+    ローカルの検索バックエンドでは、検索自体が十分に速いためキャッシュを使わない。
+    date_shards が "year" の場合は年ごとに分けて検索し、年ごとにキャッシュする（sharded_search.py）。
+    ワーカースレッド（async_search や評価スクリプトの並列実行）から呼ばれるため、st.error は使わず、
+    エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    if local_search_backend_enabled():
+        print(f"--- Executing Local Search ({get_search_backend()}) ---")
+        return search_local_snapshot(_query, include_claims=not lazy_claims_enabled()), None
+
+    if date_sharding_enabled():
+        from patents_core.core.sharded_search import search_patents_sharded
+
+        return search_patents_sharded(_query, cost_estimate)
+
+    cache = get_search_cache()
+    key = search_cache_key(_query)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        results_df, age_seconds = cached
+        print(f"--- Search cache hit ({len(results_df)}件, {age_seconds:.0f}秒前の結果) ---")
+        return results_df, age_seconds
+
+    check_query_cost_limit(cost_estimate)
+    print("--- Executing BigQuery Search ---")
+    results_df = arrow_table_to_dataframe(fetch_search_results_arrow(_query))
+    print(f"{len(results_df)}件の特許が見つかりました。")
+    # 空の結果は、条件を直して再検索されることが多いためキャッシュしない
+    if cache is not None and not results_df.empty:
+        cache.put(key, results_df)
+    return results_df, None
+
+
+def search_patents_batch(
+    queries: Dict[str, SearchQuery],
+    client: Optional[Client] = None,
+    cost_estimates: Optional[Dict[str, QueryCostEstimate]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    複数の検索条件（{query_id: 検索条件}）をまとめて検索し、{query_id: 検索結果} を返す。
+    検索結果キャッシュにある条件は実行せず、正規形が同じ条件は1回だけ検索する。残りの条件は batch_queries_per_job 件ずつ
+    1つのジョブ（build_batch_patent_query の UNION ALL）にまとめ、最大 batch_max_workers 個のジョブを並列に実行する。
+    ジョブの投入前にすべてのジョブをドライランし、上限を超えるジョブがあれば1つも投入せずに QueryCostLimitExceeded を送出する。
+    cost_estimates に辞書を渡すと、実行した条件の query_id ごとに、その条件を含むジョブの見積もりを入れる。
+    結果は search_patents_with_cache と同じキーでキャッシュする（date_shards の設定は使わない）。
+    ローカルの検索バックエンドでは、条件ごとに順に検索する。エラーはそのまま送出する（呼び出し側で処理する）。
+    """
+    include_claims = not lazy_claims_enabled()
+    if local_search_backend_enabled():
+        return {query_id: search_local_snapshot(query, include_claims) for query_id, query in queries.items()}
+
+    config = load_config_section("bigquery", DEFAULT_BIGQUERY_CONFIG)
+    cache = get_search_cache()
+    keys = {query_id: search_cache_key(query) for query_id, query in queries.items()}
+    results_by_key: Dict[str, pd.DataFrame] = {}
+    if cache is not None:
+        for key in set(keys.values()):
+            cached = cache.get(key)
+            if cached is not None:
+                results_by_key[key] = cached[0]
+
+    # 結果の query_id 列にはキャッシュのキーを使い、同じ正規形の条件をまとめる
+    pending = list({key: queries[query_id] for query_id, key in keys.items() if key not in results_by_key}.items())
+    cached_count = sum(1 for key in keys.values() if key in results_by_key)
+    print(f"--- Batch search: {len(queries)}件（キャッシュ: {cached_count}件, 実行する検索条件: {len(pending)}件） ---")
+    if pending:
+        client = client or get_bigquery_client()
+        size = max(1, int(config["batch_queries_per_job"]))
+        chunks = [dict(pending[i:i + size]) for i in range(0, len(pending), size)]
+        statements = [build_batch_patent_query(chunk, include_claims) for chunk in chunks]
+
+        # UNION ALL の各条件がそれぞれ publications を走査するため、ジョブごとにドライランして上限と照らし合わせる
+        estimates = [_dry_run_cost(sql, query_params, client) for sql, query_params in statements]
+        for number, (chunk, estimate) in enumerate(zip(chunks, estimates), start=1):
+            print(
+                f"ドライランの見積もり（ジョブ {number}/{len(chunks)}, 検索条件 {len(chunk)}件）: "
+                f"{estimate.total_bytes_processed / 1024 ** 3:.2f} GiB（約 ${estimate.estimated_cost_usd:.2f}）"
+            )
+        for estimate in estimates:
+            check_query_cost_limit(estimate)
+        if cost_estimates is not None:
+            for chunk, estimate in zip(chunks, estimates):
+                cost_estimates.update({query_id: estimate for query_id, key in keys.items() if key in chunk})
+
+        def run_chunk(statement: Tuple[str, list]) -> pd.DataFrame:
+            sql, query_params = statement
+            # 課金バイト数の上限はジョブ設定にも入れ、見積もりを超えた場合もBigQuery側で拒否させる
+            query_job = client.query(sql, job_config=_search_job_config(query_params))
+            return arrow_table_to_dataframe(_query_job_to_arrow(query_job, client))
+
+        with ThreadPoolExecutor(max_workers=max(1, int(config["batch_max_workers"]))) as executor:
+            for chunk, chunk_df in zip(chunks, executor.map(run_chunk, statements)):
+                parts = dict(tuple(chunk_df.groupby("query_id", sort=False)))
+                for key in chunk:
+                    part = parts.get(key, chunk_df.iloc[:0]).drop(columns="query_id").reset_index(drop=True)
+                    results_by_key[key] = part
+                    if cache is not None and not part.empty:
+                        cache.put(key, part)
+    return {query_id: results_by_key[key] for query_id, key in keys.items()}
+
+
+def fetch_claims(publication_numbers: List[str]) -> Dict[str, Optional[str]]:
+    """
+    公開番号のリストに対応する請求項を {公開番号: 請求項} で返す（二段階取得の2段目）。
+    請求項キャッシュにあるものはBigQueryに問い合わせない。請求項がない公開番号の値は None。
+    """
+    numbers = list(dict.fromkeys(n for n in publication_numbers if n))
+    cache = get_claims_cache()
+    claims = cache.get_many(numbers) if cache is not None else {}
+    missing = [n for n in numbers if n not in claims]
+    if not missing:
+        return claims
+
+    print(f"--- Fetching claims for {len(missing)} patents (cached: {len(claims)}) ---")
+    if get_search_backend() == "index":
+        from patents_core.core.inverted_index import fetch_claims_with_index
+
+        fetched = fetch_claims_with_index(missing)
+    elif get_search_backend() == "duckdb":
+        from patents_core.core.local_backend import fetch_claims_locally
+
+        fetched = fetch_claims_locally(missing)
+    else:
+        sql, query_params = build_claims_query(missing)
+        client = get_bigquery_client()
+        query_job = client.query(sql, job_config=_search_job_config(query_params))
+        table = _query_job_to_arrow(query_job, client)
+        fetched = dict.fromkeys(missing)
+        fetched.update(zip(table.column("publication_number").to_pylist(), table.column("claims").to_pylist()))
+    if cache is not None:
+        cache.put_many(fetched)
+    claims.update(fetched)
+    return claims
+
+
+def hydrate_claims(df: pd.DataFrame, rows: Optional[List[int]] = None) -> pd.DataFrame:
+    """
+    claims 列がない、または請求項が未取得の行について fetch_claims で請求項を取得し、claims 列を埋めたDataFrameを返す。
+    rows（行位置のリスト）を指定すると、その行だけ取得する（上位の行・要約対象の行など、請求項が必要な行だけを取得する）。
+    """
+    target = df if rows is None else df.iloc[list(rows)]
+    has_claims = "claims" in df.columns
+    missing = target.loc[target["claims"].isna(), "publication_number"] if has_claims else target["publication_number"]
+    if missing.empty:
+        return df
+    claims = fetch_claims(missing.tolist())
+    fetched = df["publication_number"].map(claims).astype(object)
+    if has_claims:
+        fetched = df["claims"].astype(object).where(df["claims"].notna(), fetched)
+    return df.assign(claims=fetched.astype(df["claims"].dtype if has_claims else pd.ArrowDtype(pa.string())))
+
+
+def iter_search_result_pages(_query: SearchQuery, page_size: int = 500) -> Iterator[pd.DataFrame]:
+    """
+    build_patent_queryで生成したSQLを実行し、結果をページ単位のDataFrameとして順次返す。
+    全件をメモリに読み込まずに、到着したページから後段の処理を始められる。
+    """
+    if local_search_backend_enabled():
+        results_df = search_patents_in_local_snapshot(_query)
+        for start in range(0, len(results_df), page_size):
+            yield results_df.iloc[start:start + page_size].reset_index(drop=True)
+        return
+
+    print("--- Executing BigQuery Search (streaming) ---")
+    try:
+        client = get_bigquery_client()
+    except Exception as e:
+        st.error(f"BigQueryクライアントの初期化に失敗しました。GCP認証情報を確認してください。: {e}")
+        return
+
+    sql, query_params = build_configured_patent_query(_query)
+    job_config = _search_job_config(query_params)
+
+    try:
+        query_job = client.query(sql, job_config=job_config)
+        total_rows = 0
+        for page_table in query_job.result(page_size=page_size).to_arrow_iterable():
+            page_df = arrow_table_to_dataframe(page_table)
+            total_rows += len(page_df)
+            print(f"{total_rows}件目までのページを受信しました。")
+            yield page_df
+    except Exception as e:
+        st.error(f"BigQueryでの検索中にエラーが発生しました: {e}")
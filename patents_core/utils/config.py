@@ -1,6 +1,8 @@
 import os
 import json
 import tempfile
+from pathlib import Path
+import yaml
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -69,3 +71,30 @@ def get_gcp_credentials_info() -> dict:
         st.error(f"GCP認証情報の読み込み中にエラーが発生しました: {e}")
         st.stop()
         return {} # st.stop() will exit, but return for completeness
+
+
+# --- 設定ファイル（config/weights.yaml）の読み込み ---
+CONFIG_PATH = Path(__file__).resolve().parents[2] / "config" / "weights.yaml"
+
+_config_cache = {"mtime": None, "config": {}}
+
+def _load_config_file() -> dict:
+    """config/weights.yaml を読み込む。更新時刻が変わらない限り前回の内容を再利用する"""
+    try:
+        mtime = os.path.getmtime(CONFIG_PATH)
+    except OSError:
+        return {}
+    if _config_cache["mtime"] != mtime:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            _config_cache["config"] = yaml.safe_load(f) or {}
+        _config_cache["mtime"] = mtime
+    return _config_cache["config"]
+
+def load_config_section(section: str, defaults: dict) -> dict:
+    """
+    config/weights.yaml から指定セクションを読み込み、既定値とマージして返す。
+    ファイルやセクションが存在しない場合は既定値をそのまま返す。
+    """
+    merged = dict(defaults)
+    merged.update(_load_config_file().get(section) or {})
+    return merged
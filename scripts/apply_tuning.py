@@ -17,9 +17,16 @@ def apply_new_weights(suggestion_path: Path, target_path: Path):
         with open(suggestion_path, 'r', encoding='utf-8') as f:
             suggested_weights = yaml.safe_load(f)
         
-        # 2. ターゲットファイルに書き込む
+        # 2. 既存の設定（キャッシュ設定など）を残したまま、提案された項目だけを上書きする
+        current_config = {}
+        if target_path.exists():
+            with open(target_path, 'r', encoding='utf-8') as f:
+                current_config = yaml.safe_load(f) or {}
+        current_config.update(suggested_weights)
+
+        # 3. ターゲットファイルに書き込む
         with open(target_path, 'w', encoding='utf-8') as f:
-            yaml.dump(suggested_weights, f, allow_unicode=True)
+            yaml.dump(current_config, f, allow_unicode=True)
             
         print(f"Successfully applied new weights to: {target_path}")
         print("New weights:")
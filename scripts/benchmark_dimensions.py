@@ -0,0 +1,125 @@
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# このスクリプト自身の場所を基準にプロジェクトルートを特定
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from patents_core.core.embedding_backends import create_embeddings_backend
+from patents_core.core.embedding_cache import get_embedding_cache
+from patents_core.core.embedding_pipeline import embed_sections
+from patents_core.core.scoring import ScoringEngine, rank
+from patents_core.core.state import DEFAULT_SIMILARITY_WEIGHTS, SECTIONS, SearchQuery
+from patents_core.utils.config import load_config_section
+
+DEFAULT_DIMENSIONS = [256, 512, 1024, 1536]
+
+
+def load_gold_standard(path: Path) -> list:
+    """評価用の正解データを読み込む（1行1件のJSONLと、整形された複数行のJSONの連続の両方に対応）"""
+    text = path.read_text(encoding="utf-8")
+    decoder = json.JSONDecoder()
+    items, pos = [], 0
+    while pos < len(text):
+        if text[pos].isspace():
+            pos += 1
+            continue
+        item, pos = decoder.raw_decode(text, pos)
+        items.append(item)
+    return items
+
+
+def load_offline_corpus() -> pd.DataFrame:
+    """investigations/ 配下の保存済み検索結果を重複なく結合し、オフライン評価用のコーパスにする"""
+    frames = [
+        pd.read_csv(csv_path)[["publication_number", "title", "abstract", "claims"]]
+        for csv_path in sorted((project_root / "investigations").glob("inv_*/patent_search_results.csv"))
+    ]
+    return pd.concat(frames).drop_duplicates("publication_number").reset_index(drop=True)
+
+
+def truncate(plan_vector: np.ndarray, matrices: dict, dim: int):
+    """先頭 dim 次元に切り詰める（再正規化は ScoringEngine が行う）"""
+    return plan_vector[:dim], {name: m[:, :dim] for name, m in matrices.items()}
+
+
+def main(args):
+    weights = load_config_section("similarity_weights", DEFAULT_SIMILARITY_WEIGHTS)
+    embeddings_model, model_name = create_embeddings_backend()
+    cache = get_embedding_cache()
+    gold_standard = load_gold_standard(project_root / args.gold_standard)
+    print(f"Embedding backend: {model_name} / {len(gold_standard)} gold-standard queries")
+
+    if args.live:
+        from patents_core.core.tools import search_patents_in_bigquery
+    else:
+        corpus = load_offline_corpus()
+        print(f"Offline corpus: {len(corpus)} patents from saved investigations")
+
+    rows = []
+    full_dim = None
+    for item in gold_standard:
+        df = search_patents_in_bigquery(SearchQuery(**item["search_query"])) if args.live else corpus
+        if df is None or df.empty:
+            continue
+        plan_vector, matrices = embed_sections(df, item["question"], embeddings_model, model_name, cache)
+        full_dim = plan_vector.shape[0]
+        _, reference = rank(ScoringEngine(plan_vector, matrices).similarities(), weights)
+        top_ref = set(np.argsort(-reference)[:args.top_k])
+        expected = set(item.get("expected_ids", []))
+        ids = df["publication_number"].to_numpy()
+
+        for dim in args.dimensions:
+            if dim > full_dim:
+                continue
+            _, score = rank(ScoringEngine(*truncate(plan_vector, matrices, dim)).similarities(), weights)
+            top = np.argsort(-score)[:args.top_k]
+            ref_rank = np.argsort(np.argsort(-reference))
+            cand_rank = np.argsort(np.argsort(-score))
+            row = {
+                "query_id": item["query_id"],
+                "dimensions": dim,
+                f"top{args.top_k}_overlap": len(top_ref & set(top)) / min(args.top_k, len(score)),
+                "spearman": float(np.corrcoef(ref_rank, cand_rank)[0, 1]) if len(score) > 1 else 1.0,
+            }
+            if expected:
+                row[f"recall@{args.top_k}"] = len(expected & set(ids[top])) / len(expected)
+            rows.append(row)
+
+    if not rows:
+        print("No results to evaluate.")
+        return
+
+    print(f"\n== Ranking agreement against full {full_dim} dimensions ==")
+    print(pd.DataFrame(rows).drop(columns="query_id").groupby("dimensions").mean().round(4).to_string())
+
+    # メモリ使用量とスコア計算時間は合成データで測る
+    rng = np.random.default_rng(0)
+    synthetic = {name: rng.standard_normal((args.rows, full_dim)).astype(np.float32) for name in SECTIONS}
+    plan_vector = rng.standard_normal(full_dim).astype(np.float32)
+    print(f"\n== Memory and scoring time for {args.rows} rows x 3 sections ==")
+    for dim in args.dimensions:
+        if dim > full_dim:
+            continue
+        engine = ScoringEngine(*truncate(plan_vector, synthetic, dim))
+        start = time.perf_counter()
+        engine.similarities()
+        elapsed = time.perf_counter() - start
+        print(f"{dim:>5} dims: {engine.matrix.nbytes / 1024 / 1024:8.1f} MiB, {elapsed * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ranking quality, memory and scoring time by embedding dimensionality.")
+    parser.add_argument("--gold_standard", type=str, default="evaluation/gold_standard.jsonl")
+    parser.add_argument("--dimensions", type=int, nargs="+", default=DEFAULT_DIMENSIONS)
+    parser.add_argument("--top_k", type=int, default=10)
+    parser.add_argument("--rows", type=int, default=10000, help="Number of synthetic rows for the memory/time benchmark.")
+    parser.add_argument("--live", action="store_true", help="Search BigQuery for each gold-standard query instead of using saved investigations.")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,193 @@
+import sys
+import json
+import time
+import tracemalloc
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+# このスクリプト自身の場所を基準にプロジェクトルートを特定
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from patents_core.core.bigquery_client import get_bigquery_client, get_bqstorage_client
+from patents_core.core.state import SearchQuery
+from patents_core.core.tools import arrow_table_to_dataframe, submit_search_job
+
+DEFAULT_SIZES = [1000, 10000, 50000]
+SOURCE_COLUMNS = ["publication_number", "title", "abstract", "claims", "assignee_harmonized", "publication_date", "ipc_codes"]
+
+
+def load_sample_rows() -> pd.DataFrame:
+    """investigations/ 配下の保存済み検索結果を、BigQueryの結果と同じ列・型の見本として読み込む"""
+    frames = [
+        pd.read_csv(csv_path)[SOURCE_COLUMNS]
+        for csv_path in sorted((project_root / "investigations").glob("inv_*/patent_search_results.csv"))
+    ]
+    df = pd.concat(frames).drop_duplicates("publication_number").reset_index(drop=True)
+    # CSVでは配列が "['G06F21/55' 'G06N3/04']" の形の文字列になっているため、リストに戻す
+    df["ipc_codes"] = df["ipc_codes"].fillna("").str.findall(r"'([^']+)'")
+    return df
+
+
+def build_result_table(sample: pd.DataFrame, rows: int) -> pa.Table:
+    """見本の行を繰り返して、指定行数の検索結果相当のArrowテーブルを作る"""
+    repeated = sample.iloc[[i % len(sample) for i in range(rows)]].reset_index(drop=True)
+    repeated["publication_number"] = [f"{p}-{i}" for i, p in enumerate(repeated["publication_number"])]
+    schema = pa.schema([
+        ("publication_number", pa.string()),
+        ("title", pa.string()),
+        ("abstract", pa.string()),
+        ("claims", pa.string()),
+        ("assignee_harmonized", pa.string()),
+        ("publication_date", pa.int64()),
+        ("ipc_codes", pa.list_(pa.string())),
+    ])
+    return pa.Table.from_pandas(repeated, schema=schema, preserve_index=False)
+
+
+def convert_rest_rows(payload: bytes) -> pd.DataFrame:
+    """REST APIの行イテレータ相当: JSONの行をPythonオブジェクトに展開し、object dtypeのDataFrameを作る"""
+    return pd.DataFrame(json.loads(payload))
+
+
+def convert_arrow_object(payload: bytes) -> pd.DataFrame:
+    """Arrowで受け取り、従来どおり object dtype のDataFrameに変換する"""
+    return pa.ipc.open_stream(payload).read_all().to_pandas()
+
+
+def convert_arrow_dtype(payload: bytes) -> pd.DataFrame:
+    """Arrowで受け取り、Arrowを裏付けとするdtypeのDataFrameに変換する（検索で使う経路）"""
+    return arrow_table_to_dataframe(pa.ipc.open_stream(payload).read_all())
+
+
+METHODS = {
+    "rest_json_object": (convert_rest_rows, "json"),
+    "arrow_object": (convert_arrow_object, "arrow"),
+    "arrow_dtype": (convert_arrow_dtype, "arrow"),
+}
+
+
+def _measure(method: str, payload_path: str, queue) -> None:
+    """
+    別プロセスで変換を1回実行し、経過時間とピークメモリを返す。
+    ピークメモリは Python側の確保量（tracemalloc）と Arrowのメモリプールの最大使用量の合計とする。
+    """
+    convert, _ = METHODS[method]
+    payload = Path(payload_path).read_bytes()
+    arrow_pool = pa.default_memory_pool()
+    arrow_baseline = arrow_pool.bytes_allocated()
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = convert(payload)
+    elapsed = time.perf_counter() - start
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queue.put((elapsed, python_peak + arrow_pool.max_memory() - arrow_baseline, len(df)))
+
+
+def measure(method: str, payload_path: Path):
+    """ピークメモリを他の計測と混ぜないよう、計測ごとに新しいプロセスで実行する"""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(method, str(payload_path), queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def fetch_live(args) -> pd.DataFrame:
+    """
+    BigQueryで検索ジョブを1回実行し、同じジョブの結果を REST API と Storage Read API でそれぞれ取得して時間を測る。
+    取得はジョブの結果テーブルを読み直すだけなので、検索の処理量がかかるのは最初のジョブ1回だけ。
+    """
+    query = SearchQuery(ipc_codes=args.ipc_codes, max_results_per_country=args.max_results_per_country, limit=args.limit)
+    client = get_bigquery_client()
+    query_job = submit_search_job(query, client)
+    query_job.result()
+    print(f"Live search job {query_job.job_id}: {query_job.total_bytes_processed / 1024 ** 3:.2f} GiB processed")
+
+    bqstorage_client = get_bqstorage_client(client)
+    paths = {"rest_api": {"create_bqstorage_client": False}}
+    if bqstorage_client is None:
+        print("google-cloud-bigquery-storage is not installed; skipping the Storage Read API path.")
+    else:
+        paths["storage_read_api"] = {"bqstorage_client": bqstorage_client}
+
+    rows = []
+    for path, to_arrow_kwargs in paths.items():
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            table = query_job.result().to_arrow(**to_arrow_kwargs)
+            downloaded = time.perf_counter()
+            df = arrow_table_to_dataframe(table)
+            timings.append((downloaded - start, time.perf_counter() - downloaded))
+        download, decode = min(timings, key=sum)
+        rows.append({
+            "rows": len(df),
+            "path": path,
+            "rows_per_sec": len(df) / (download + decode),
+            "download_seconds": download,
+            "decode_seconds": decode,
+            "arrow_mib": table.nbytes / 1024 / 1024,
+        })
+    return pd.DataFrame(rows)
+
+
+def main(args):
+    if args.live:
+        print("\n== Live fetch from BigQuery: REST API vs Storage Read API ==")
+        print(fetch_live(args).round(3).to_string(index=False))
+        return
+
+    sample = load_sample_rows()
+    print(f"Sample rows from saved investigations: {len(sample)}")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            table = build_result_table(sample, size)
+            paths = {"arrow": Path(tmp) / f"{size}.arrows", "json": Path(tmp) / f"{size}.json"}
+            with pa.OSFile(str(paths["arrow"]), "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            paths["json"].write_text(json.dumps(table.to_pylist(), ensure_ascii=False), encoding="utf-8")
+
+            for method, (_, payload_kind) in METHODS.items():
+                elapsed, peak_bytes, n = min(
+                    (measure(method, paths[payload_kind]) for _ in range(args.repeat)), key=lambda r: r[0]
+                )
+                rows.append({
+                    "rows": n,
+                    "method": method,
+                    "rows_per_sec": n / elapsed,
+                    "seconds": elapsed,
+                    "peak_mib": peak_bytes / 1024 / 1024,
+                    "payload_mib": paths[payload_kind].stat().st_size / 1024 / 1024,
+                })
+
+    print("\n== Local result decoding (no network): rows/sec and peak memory ==")
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark search result fetching. By default only the local decoding step is measured "
+                    "(JSON rows as the REST API returns them, Arrow to object dtypes and Arrow to Arrow-backed dtypes) "
+                    "on synthetic tables built from saved investigations; no network is involved. "
+                    "With --live, one BigQuery search job is run and its results are downloaded through the REST API "
+                    "and the Storage Read API."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Result sizes (rows) to benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the fastest is reported.")
+    parser.add_argument("--live", action="store_true", help="Fetch the results of a real BigQuery search job through both APIs.")
+    parser.add_argument("--ipc_codes", type=str, nargs="+", default=["G06N"], help="IPC prefixes of the live search (--live only).")
+    parser.add_argument("--max_results_per_country", type=int, default=5000, help="Per-country cap of the live search (--live only).")
+    parser.add_argument("--limit", type=int, default=50000, help="Row limit of the live search (--live only).")
+    args = parser.parse_args()
+    main(args)
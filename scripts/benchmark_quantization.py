@@ -0,0 +1,96 @@
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# このスクリプト自身の場所を基準にプロジェクトルートを特定
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from patents_core.core.embedding_backends import create_embeddings_backend
+from patents_core.core.embedding_cache import EmbeddingCache
+from patents_core.core.embedding_pipeline import embed_sections
+from patents_core.core.quantization import STORAGE_DTYPES
+from patents_core.core.scoring import ScoringEngine, rank
+from patents_core.core.state import DEFAULT_SIMILARITY_WEIGHTS, SECTIONS
+from patents_core.utils.config import load_config_section
+
+
+def load_investigations() -> list:
+    """investigations/ 配下の保存済み調査から (調査方針, 検索結果) の組を読み込む"""
+    cases = []
+    for inv_dir in sorted((project_root / "investigations").glob("inv_*")):
+        csv_path = inv_dir / "patent_search_results.csv"
+        plan_path = inv_dir / "plan.txt"
+        if not csv_path.exists() or not plan_path.exists():
+            continue
+        plan = plan_path.read_text(encoding="utf-8").split("Generated Plan:")[-1].strip()
+        df = pd.read_csv(csv_path)[["publication_number", "title", "abstract", "claims"]]
+        cases.append((plan, df))
+    return cases
+
+
+def ranking_agreement(reference: np.ndarray, candidate: np.ndarray, k: int) -> dict:
+    """全精度スコアとの順位の一致度（上位k件の重なり・スピアマン順位相関・最大誤差）を返す"""
+    ref_rank = np.argsort(np.argsort(-reference))
+    cand_rank = np.argsort(np.argsort(-candidate))
+    k = min(k, len(reference))
+    top_ref = set(np.argsort(-reference)[:k])
+    top_cand = set(np.argsort(-candidate)[:k])
+    spearman = np.corrcoef(ref_rank, cand_rank)[0, 1] if len(reference) > 1 else 1.0
+    return {
+        f"top{k}_overlap": len(top_ref & top_cand) / k,
+        "spearman": float(spearman),
+        "max_abs_error": float(np.abs(reference - candidate).max()),
+    }
+
+
+def main(args):
+    weights = load_config_section("similarity_weights", DEFAULT_SIMILARITY_WEIGHTS)
+    embeddings_model, model_name = create_embeddings_backend()
+    print(f"Embedding backend: {model_name}")
+
+    # 全精度の基準ベクトルを得るため、float32で保存する一時キャッシュを使う
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(Path(tmp) / "bench.sqlite3", 1 << 30, "float32")
+        cases = [(plan, df, *embed_sections(df, plan, embeddings_model, model_name, cache)) for plan, df in load_investigations()]
+    if not cases:
+        print("No saved investigations found.")
+        return
+
+    print(f"\n== Ranking agreement on {len(cases)} saved investigations ==")
+    for storage_dtype in STORAGE_DTYPES:
+        rows = []
+        for plan, df, plan_vector, matrices in cases:
+            reference = ScoringEngine(plan_vector, matrices).similarities()
+            candidate = ScoringEngine(plan_vector, matrices, storage_dtype=storage_dtype).similarities()
+            _, ref_score = rank(reference, weights)
+            _, cand_score = rank(candidate, weights)
+            rows.append(ranking_agreement(ref_score, cand_score, args.top_k))
+        summary = pd.DataFrame(rows).mean().to_dict()
+        print(f"{storage_dtype:>8}: " + ", ".join(f"{k}={v:.4f}" for k, v in summary.items()))
+
+    # メモリ使用量と計算時間は、実際の次元数のまま行数を増やした合成データで測る
+    dim = cases[0][2].shape[0]
+    rng = np.random.default_rng(0)
+    synthetic = {name: rng.standard_normal((args.rows, dim)).astype(np.float32) for name in SECTIONS}
+    plan_vector = rng.standard_normal(dim).astype(np.float32)
+    print(f"\n== Memory and scoring time for {args.rows} rows x 3 sections x {dim} dims ==")
+    for storage_dtype in STORAGE_DTYPES:
+        engine = ScoringEngine(plan_vector, synthetic, storage_dtype=storage_dtype)
+        start = time.perf_counter()
+        engine.similarities()
+        elapsed = time.perf_counter() - start
+        print(f"{storage_dtype:>8}: {engine.matrix.nbytes / 1024 / 1024:8.1f} MiB, {elapsed * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark quantized embedding storage against full-precision ranking.")
+    parser.add_argument("--rows", type=int, default=10000, help="Number of synthetic rows for the memory/time benchmark.")
+    parser.add_argument("--top_k", type=int, default=5, help="k for the top-k overlap metric.")
+    args = parser.parse_args()
+    main(args)
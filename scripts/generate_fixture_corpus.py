@@ -0,0 +1,103 @@
+import random
+import argparse
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# このスクリプト自身の場所を基準にプロジェクトルートを特定
+project_root = Path(__file__).resolve().parent.parent
+
+DEFAULT_OUTPUT = "test/fixtures/publications_fixture.parquet"
+
+COUNTRIES = ["JP", "US", "EP", "CN", "WO", "KR"]
+IPC_CODES = [
+    "G06N3/08", "G06N3/04", "G06N20/00", "G06F21/55", "G06F16/35", "G06T7/00",
+    "H04L9/32", "H04L63/14", "H01M10/0525", "H01M4/58", "B60W30/09", "B60W60/00",
+    "G01S17/931", "G05D1/02", "A61B5/00", "G16H50/20",
+]
+ASSIGNEES = [
+    "TOYOTA MOTOR CORP", "Toyota Jidosha K.K.", "SONY GROUP CORP", "Panasonic IP Management Co., Ltd.",
+    "NEC CORP", "FUJITSU LTD", "HITACHI LTD", "GOOGLE LLC", "INTERNATIONAL BUSINESS MACHINES CORP",
+    "SAMSUNG ELECTRONICS CO LTD", "ＬＧ　ＥＬＥＣＴＲＯＮＩＣＳ ＩＮＣ", "HUAWEI TECH CO LTD",
+]
+# (日本語, 英語) の語彙。日本語は SEARCH() のトークン境界になるよう空白・記号で区切って並べる
+TERMS = [
+    ("自動運転", "autonomous driving"), ("ニューラルネットワーク", "neural network"), ("機械学習", "machine learning"),
+    ("LiDAR", "LiDAR"), ("電池", "battery"), ("リチウムイオン", "lithium-ion"), ("暗号", "encryption"),
+    ("認証", "authentication"), ("画像認識", "image recognition"), ("異常検知", "anomaly detection"),
+    ("診断支援", "diagnosis support"), ("ロボット", "robot"), ("センサ", "sensor"), ("通信", "communication"),
+]
+LANGUAGE_PATTERNS = [("ja", "en"), ("ja",), ("en",), ("en", "ja")]
+
+
+def localized(terms, languages, template_ja: str, template_en: str) -> list:
+    """指定した言語の順に、語彙を埋め込んだ {text, language, truncated} の配列を作る"""
+    texts = {
+        "ja": template_ja.format(" / ".join(ja for ja, _ in terms)),
+        "en": template_en.format(", ".join(en for _, en in terms)),
+    }
+    return [{"text": texts[language], "language": language, "truncated": False} for language in languages]
+
+
+def generate_rows(count: int, seed: int) -> list:
+    """publications と同じスキーマ（検索で使う列のみ）の行を、乱数の種から決定的に生成する"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        country = rng.choice(COUNTRIES)
+        year = rng.randint(2008, 2025)
+        terms = rng.sample(TERMS, rng.randint(1, 4))
+        languages = rng.choice(LANGUAGE_PATTERNS)
+        ipc_codes = rng.sample(IPC_CODES, rng.randint(0, 3))
+        rows.append({
+            "publication_number": f"{country}-{2000000 + i * 7919 % 1000000}-A1",
+            "country_code": country,
+            "publication_date": year * 10000 + rng.randint(1, 12) * 100 + rng.randint(1, 28),
+            "title_localized": localized(terms[:2], languages, "{}を用いた装置", "Apparatus using {}"),
+            "abstract_localized": localized(terms, languages, "本発明は {} に関する。", "The invention relates to {}."),
+            "claims_localized": localized(terms[::-1], languages, "1. {} を備えるシステム。", "1. A system comprising {}."),
+            "assignee_harmonized": [
+                {"name": name, "country_code": country}
+                for name in rng.sample(ASSIGNEES, rng.randint(0, 2))
+            ],
+            "ipc": [{"code": code, "inventive": j == 0, "first": j == 0, "tree": []} for j, code in enumerate(ipc_codes)],
+        })
+    # 国ごとの上位N件の選択に同じ公開日の行が含まれるよう、一部の行の公開日を揃える
+    for row in rows[::25]:
+        row["publication_date"] = 20230401
+    return rows
+
+
+def build_schema() -> pa.Schema:
+    localized_type = pa.list_(pa.struct([("text", pa.string()), ("language", pa.string()), ("truncated", pa.bool_())]))
+    return pa.schema([
+        ("publication_number", pa.string()),
+        ("country_code", pa.string()),
+        ("publication_date", pa.int64()),
+        ("title_localized", localized_type),
+        ("abstract_localized", localized_type),
+        ("claims_localized", localized_type),
+        ("assignee_harmonized", pa.list_(pa.struct([("name", pa.string()), ("country_code", pa.string())]))),
+        ("ipc", pa.list_(pa.struct([
+            ("code", pa.string()), ("inventive", pa.bool_()), ("first", pa.bool_()), ("tree", pa.list_(pa.string())),
+        ]))),
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカル検索バックエンド用の、publications と同じスキーマの小さなParquetコーパスを生成する")
+    parser.add_argument("--rows", type=int, default=300, help="生成する行数")
+    parser.add_argument("--seed", type=int, default=42, help="乱数の種（同じ値なら同じコーパスになる）")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="出力先のParquetファイル（プロジェクトルートからの相対パス）")
+    args = parser.parse_args()
+
+    output_path = project_root / args.output
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pylist(generate_rows(args.rows, args.seed), schema=build_schema())
+    pq.write_table(table, output_path)
+    print(f"{table.num_rows}行のコーパスを書き出しました: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,20 @@ import argparse
 import json
 import os
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from loguru import logger
 
 # このスクリプトの親ディレクトリをシステムパスに追加
 import sys
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from patents_core.core.agent import execute_patent_search_workflow
-from patents_core.core.state import AppState, SearchQuery
+from patents_core.core.agent import execute_patent_search_workflow, run_analysis_workflow
+from patents_core.core.state import AppState, QueryCostEstimate, SearchQuery
+from patents_core.core.tools import search_patents_batch
+from patents_core.core.embedding_cache import get_embedding_cache
+from patents_core.core.bigquery_client import get_client_stats
 from evaluation.metrics import evaluate_with_ragas
 
 # Loguruの設定
@@ -28,12 +32,43 @@ logger.add(
 )
 
 def load_gold_standard(path: Path) -> List[dict]:
-    """評価用の正解データを読み込む"""
-    with open(path, 'r', encoding='utf-8') as f:
-        return [json.loads(line) for line in f]
-
-def run_single_evaluation(query_item: dict) -> Dict:
-    """1つのクエリに対して検索を実行し、RAGAs評価に必要なデータを返す"""
+    """評価用の正解データを読み込む（1行1件のJSONLと、整形された複数行のJSONの連続の両方に対応）"""
+    text = path.read_text(encoding="utf-8")
+    decoder = json.JSONDecoder()
+    items, pos = [], 0
+    while pos < len(text):
+        if text[pos].isspace():
+            pos += 1
+            continue
+        item, pos = decoder.raw_decode(text, pos)
+        items.append(item)
+    return items
+
+def prefetch_search_results(gold_standard: List[dict]) -> Tuple[Dict[str, pd.DataFrame], Dict[str, QueryCostEstimate]]:
+    """
+    すべてのクエリの検索を search_patents_batch でまとめて実行し、({query_id: 検索結果}, {query_id: そのクエリを含むジョブの見積もり}) を返す
+    （失敗時は空の辞書の組）。
+    """
+    try:
+        queries = {item['query_id']: SearchQuery(**item['search_query']) for item in gold_standard}
+        cost_estimates: Dict[str, QueryCostEstimate] = {}
+        results = search_patents_batch(queries, cost_estimates=cost_estimates)
+        logger.info(f"Batch search finished for {len(results)} queries")
+        return results, cost_estimates
+    except Exception as e:
+        logger.exception(f"Batch search failed, falling back to per-query searches: {e}")
+        return {}, {}
+
+def run_single_evaluation(
+    query_item: dict,
+    search_results: Optional[pd.DataFrame] = None,
+    cost_estimate: Optional[QueryCostEstimate] = None,
+) -> Dict:
+    """
+    1つのクエリに対して検索を実行し、RAGAs評価に必要なデータを返す。
+    search_results（まとめて検索済みの結果）を渡した場合は、検索を実行せずに分析と要約だけを行う。
+    その場合の cost_estimate には、そのクエリを含むジョブの見積もりを渡す（同じジョブの他のクエリの分も含む）。
+    """
     query_id = query_item['query_id']
     logger.info(f"Running evaluation for query: {query_id}")
     
@@ -47,13 +82,27 @@ def run_single_evaluation(query_item: dict) -> Dict:
         search_query = SearchQuery(**query_item['search_query'])
         app_state = AppState(search_query=search_query, plan_text="This is a dummy plan text for evaluation.")
         
-        result_state = execute_patent_search_workflow(app_state)
+        if search_results is not None:
+            app_state.search_results = search_results
+            app_state.query_cost_estimate = cost_estimate
+            result_state = run_analysis_workflow(app_state)
+        else:
+            result_state = execute_patent_search_workflow(app_state)
+        estimate = result_state.query_cost_estimate
+        if estimate:
+            logger.info(
+                f"  Dry-run estimate for {query_id}: {estimate.total_bytes_processed} bytes "
+                f"(${estimate.estimated_cost_usd:.4f}, limit: {estimate.maximum_bytes_billed}, exceeds: {estimate.exceeds_limit})"
+            )
         
         if result_state.error:
             logger.error(f"  Error from workflow: {result_state.error}")
             return {"query_id": query_id, "error": result_state.error, "results": []}
             
         retrieved_ids = result_state.analyzed_results['publication_number'].tolist()
+        embedding_stats = result_state.embedding_stats
+        logger.info(f"  Embedding cache for {query_id}: {embedding_stats.get('hits', 0)} hits / {embedding_stats.get('misses', 0)} misses")
+        logger.info(f"  Embedding tokens saved by text budget for {query_id}: {embedding_stats.get('tokens_saved', 0)}")
         
         # コンテキストを上位5件に制限
         contexts = [doc for doc in result_state.analyzed_results['abstract'].tolist()[:5]]
@@ -83,7 +132,14 @@ def main(args):
         logger.info(f"Loading gold standard from: {gold_standard_path}")
         gold_standard = load_gold_standard(gold_standard_path)
         
-        evaluation_results = [run_single_evaluation(item) for item in gold_standard]
+        prefetched, cost_estimates = prefetch_search_results(gold_standard) if args.batch else ({}, {})
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            evaluation_results = list(executor.map(
+                lambda item: run_single_evaluation(item, prefetched.get(item['query_id']), cost_estimates.get(item['query_id'])),
+                gold_standard,
+            ))
+        logger.info(f"Embedding cache totals: {get_embedding_cache().stats()}")
+        logger.info(f"BigQuery client reuse: {get_client_stats()}")
         
         evaluation_results_for_ragas = []
         for result in evaluation_results:
@@ -142,6 +198,18 @@ if __name__ == "__main__":
         default="reports/metrics_report.json",
         help="Path to save the evaluation report (json format)."
     )
+    parser.add_argument(
+        "--batch",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Run all searches up front as batched BigQuery jobs (search_patents_batch)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of queries to analyze and summarize concurrently."
+    )
     args = parser.parse_args()
     main(args)
 
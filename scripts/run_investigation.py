@@ -15,9 +15,10 @@ sys.path.append(str(project_root))
 # 必要なコンポーネントをコアロジックからインポート
 from patents_core.core.agent import (
     GENERATE_QUERY_PROMPT, model, run_summary_workflow, 
-    generate_sql_and_explanation, execute_search, analyze_results,
+    generate_sql_and_explanation, execute_search, analyze_results, run_streaming_search,
     GENERATE_PLAN_PROMPT, PROMPT_CLARIFY_VIEWPOINTS, PROMPT_SELECT_MAIN_KEYWORDS
 )
+from patents_core.core.search_cache import DEFAULT_PUBLICATION_DATE_FROM
 from patents_core.core.state import AppState, SearchQuery
 import json
 import re
@@ -32,7 +33,7 @@ import time
 project_root = Path(__file__).resolve().parent.parent
 sys.path.append(str(project_root))
 
-def run_investigation(user_query: str, limit: int = 10, answer: str = None):
+def run_investigation(user_query: str, limit: int = 10, answer: str = None, stream: bool = False):
     """
     ユーザーのクエリに基づき、特許調査を体系的に実行する。
     結果はタイムスタンプ付きのディレクトリに保存される。
@@ -122,7 +123,7 @@ def run_investigation(user_query: str, limit: int = 10, answer: str = None):
 
     search_query.limit = limit
     if not search_query.publication_date_from:
-        search_query.publication_date_from = "20100101"
+        search_query.publication_date_from = DEFAULT_PUBLICATION_DATE_FROM
     if not search_query.publication_date_to:
         search_query.publication_date_to = datetime.datetime.now().strftime("%Y%m%d")
 
@@ -133,9 +134,14 @@ def run_investigation(user_query: str, limit: int = 10, answer: str = None):
     # 5. 検索と分析を実行
     print("--- Starting Patent Search and Analysis ---")
     initial_state = AppState(search_query=search_query, plan_text=plan_text)
-    state_after_sql = generate_sql_and_explanation(initial_state)
-    state_after_search = execute_search(state_after_sql)
-    state_after_analysis = analyze_results(state_after_search)
+    # ストリーミングではページ単位で検索し直すため、SQL生成時には検索を投入しない
+    state_after_sql = generate_sql_and_explanation(initial_state, submit=not stream)
+    if stream:
+        # 大量件数の場合は、ページ単位で評価して上位件数だけをメモリに残す
+        state_after_analysis = run_streaming_search(state_after_sql)
+    else:
+        state_after_search = execute_search(state_after_sql)
+        state_after_analysis = analyze_results(state_after_search)
     
     analyzed_df = state_after_analysis.analyzed_results
     if analyzed_df is None or analyzed_df.empty:
@@ -143,6 +149,10 @@ def run_investigation(user_query: str, limit: int = 10, answer: str = None):
         return
         
     print(f"Found and analyzed {len(analyzed_df)} patents.")
+    embedding_stats = state_after_analysis.embedding_stats
+    if embedding_stats:
+        print(f"Embedding cache: {embedding_stats.get('hits', 0)} hits / {embedding_stats.get('misses', 0)} misses")
+        print(f"Embedding tokens saved by text budget: {embedding_stats.get('tokens_saved', 0)}")
     csv_path = output_dir / "patent_search_results.csv"
     analyzed_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
     print(f"Search results saved to: {csv_path}")
@@ -190,6 +200,7 @@ if __name__ == "__main__":
     parser.add_argument("query", type=str, help="The user's query for the patent investigation.")
     parser.add_argument("--limit", type=int, default=10, help="The maximum number of patents to retrieve.")
     parser.add_argument("--answer", type=str, help="The user's answer to the clarification question.")
+    parser.add_argument("--stream", action="store_true", help="Fetch and score results page by page, keeping only the top-k in memory.")
     args = parser.parse_args()
     
-    run_investigation(args.query, args.limit, args.answer)
+    run_investigation(args.query, args.limit, args.answer, args.stream)
@@ -0,0 +1,59 @@
+import argparse
+import sys
+from pathlib import Path
+
+# このスクリプト自身の場所を基準にプロジェクトルートを特定
+project_root = Path(__file__).resolve().parent.parent
+sys.path.append(str(project_root))
+
+from patents_core.core.agent import refresh_saved_search
+from patents_core.core.saved_search import list_saved_searches
+
+
+def main(args):
+    saved_searches = list_saved_searches()
+    if args.list:
+        for saved in saved_searches:
+            print(f"{saved.name}\tウォーターマーク: {saved.watermark}\t取得済み: {len(saved.seen)}件\t最終実行: {saved.last_run_at}")
+        return
+
+    names = args.names or [saved.name for saved in saved_searches]
+    if not names:
+        print("保存済みの検索がありません。アプリの検索結果から「この検索を保存」で保存してください。")
+        return
+    failed = 0
+    for name in names:
+        state = refresh_saved_search(name)
+        if state.error:
+            failed += 1
+            print(f"[{name}] {state.error}")
+            continue
+        results = state.analyzed_results
+        stored_rows = len(state.search_results) if state.search_results is not None else 0
+        print(f"[{name}] 保存済みの結果: {stored_rows}件")
+        if args.top and not results.empty:
+            print(results[["publication_number", "publication_date", "title", "score"]].head(args.top).to_string(index=False))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-run saved searches, scoring only publications newer than each watermark.")
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help="Names of the saved searches to re-run (default: all saved searches)."
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List saved searches with their watermark and exit."
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        help="Number of top-ranked results to print for each saved search (0 to disable)."
+    )
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,96 @@
+import sys
+import os
+import unittest
+from unittest import mock
+
+import pandas as pd
+import pyarrow as pa
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core import bigquery_client, tools
+from patents_core.utils import config
+
+TABLE = pa.table({
+    "publication_number": ["JP-1-A", "US-2-B2"],
+    "title": ["電池", "Battery"],
+    "publication_date": pa.array([20240101, 20230101], type=pa.int64()),
+    "ipc_codes": pa.array([["H01M10/42"], ["H01M", "G01R"]], type=pa.list_(pa.string())),
+})
+
+
+class FakeRowIterator:
+
+    def __init__(self, calls, fail_storage=False):
+        self.calls = calls
+        self.fail_storage = fail_storage
+
+    def to_arrow(self, bqstorage_client=None, create_bqstorage_client=True):
+        self.calls.append({"bqstorage_client": bqstorage_client, "create_bqstorage_client": create_bqstorage_client})
+        if bqstorage_client is not None and self.fail_storage:
+            raise RuntimeError("storage read failed")
+        return TABLE
+
+
+class FakeQueryJob:
+
+    def __init__(self, fail_storage=False):
+        self.calls = []
+        self.fail_storage = fail_storage
+
+    def result(self):
+        return FakeRowIterator(self.calls, self.fail_storage)
+
+
+class TestArrowFetch(unittest.TestCase):
+
+    def fetch(self, use_storage_api=True, storage_client=None, fail_storage=False):
+        job = FakeQueryJob(fail_storage)
+        overrides = {"bigquery": {"use_storage_api": use_storage_api}}
+        with mock.patch.object(config, "_load_config_file", return_value=overrides), \
+                mock.patch.object(tools, "get_bqstorage_client", return_value=storage_client) as get_bqstorage_client:
+            df = tools.fetch_search_job_results(job, client=object())
+        return df, job.calls, get_bqstorage_client
+
+    def test_storage_read_api_is_used_when_available(self):
+        storage_client = object()
+        df, calls, _ = self.fetch(storage_client=storage_client)
+        self.assertEqual(len(calls), 1)
+        self.assertIs(calls[0]["bqstorage_client"], storage_client)
+        # 結果はArrowを裏付けとするdtypeのまま返る（配列やテキストをPythonオブジェクトに展開しない）
+        self.assertTrue(all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes))
+        self.assertEqual(df["publication_number"].tolist(), ["JP-1-A", "US-2-B2"])
+        self.assertEqual(list(df["ipc_codes"].iloc[1]), ["H01M", "G01R"])
+
+    def test_falls_back_to_rest_without_storage_client(self):
+        """google-cloud-bigquery-storage がない場合（クライアントが None）は、REST APIで取得する"""
+        df, calls, _ = self.fetch(storage_client=None)
+        self.assertEqual(calls, [{"bqstorage_client": None, "create_bqstorage_client": False}])
+        self.assertEqual(len(df), 2)
+
+    def test_missing_storage_package_returns_no_client(self):
+        """google-cloud-bigquery-storage をimportできなければ get_bqstorage_client は None を返し、REST APIで取得する"""
+        job = FakeQueryJob()
+        with mock.patch.dict(sys.modules, {"google.cloud.bigquery_storage": None}), \
+                mock.patch.object(config, "_load_config_file", return_value={}):
+            self.assertIsNone(bigquery_client.get_bqstorage_client(object()))
+            df = tools.fetch_search_job_results(job, client=object())
+        self.assertEqual(job.calls, [{"bqstorage_client": None, "create_bqstorage_client": False}])
+        self.assertEqual(len(df), 2)
+
+    def test_falls_back_to_rest_when_storage_read_fails(self):
+        df, calls, _ = self.fetch(storage_client=object(), fail_storage=True)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1], {"bqstorage_client": None, "create_bqstorage_client": False})
+        self.assertEqual(len(df), 2)
+
+    def test_storage_api_can_be_disabled(self):
+        df, calls, get_bqstorage_client = self.fetch(use_storage_api=False, storage_client=object())
+        get_bqstorage_client.assert_not_called()
+        self.assertEqual(calls, [{"bqstorage_client": None, "create_bqstorage_client": False}])
+        self.assertEqual(len(df), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
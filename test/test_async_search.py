@@ -0,0 +1,63 @@
+import sys
+import os
+import asyncio
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core.async_search import SearchHandle, submit_search
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.state import SearchQuery
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class FakeQueryJob:
+    job_id = "job_1"
+
+    def __init__(self):
+        self.cancel_requested = False
+
+    def done(self):
+        return False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+
+class TestSearchHandle(unittest.TestCase):
+
+    def test_timeout_cancels_the_job(self):
+        job = FakeQueryJob()
+        handle = SearchHandle(SearchQuery(ipc_codes=["H01M"]), Future(), job)
+        self.assertFalse(handle.done())
+        with self.assertRaises(TimeoutError):
+            handle.result(timeout=0.01)
+        self.assertTrue(job.cancel_requested)
+
+    def test_matches_compares_canonical_queries(self):
+        handle = SearchHandle(SearchQuery(ipc_codes=["H01M 10/05"], keyword_groups=[["b", "a"]]), Future())
+        self.assertTrue(handle.matches(SearchQuery(ipc_codes=["h01m10/05"], keyword_groups=[["a", "b"]])))
+        self.assertFalse(handle.matches(SearchQuery(ipc_codes=["H01M"])))
+
+    def test_submit_and_await_with_local_backend(self):
+        query = SearchQuery(ipc_codes=["G06N"], max_results_per_country=5)
+        env = {"PATENTS_SEARCH_BACKEND": "duckdb", "PATENTS_LOCAL_SNAPSHOT": str(FIXTURE_PATH)}
+        with mock.patch.dict(os.environ, env):
+            handle = submit_search(query)
+
+            async def wait():
+                return await handle
+
+            df, cache_age = asyncio.run(wait())
+        self.assertIsNone(cache_age)
+        expected = search_patents_locally(query, snapshot_path=FIXTURE_PATH)
+        self.assertEqual(df["publication_number"].tolist(), expected["publication_number"].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import sys
+import os
+import unittest
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pyarrow as pa
+
+from patents_core.core import tools
+from patents_core.core.state import SearchQuery
+from patents_core.core.tools import QueryCostLimitExceeded, search_patents_batch
+from patents_core.utils import config
+
+GIB = 1024 ** 3
+
+
+class FakeJob:
+
+    def __init__(self, total_bytes_processed):
+        self.total_bytes_processed = total_bytes_processed
+
+
+class FakeClient:
+    """ドライランでは検索条件の数に比例した処理量を返し、投入されたジョブの設定を記録するクライアント"""
+
+    def __init__(self):
+        self.dry_runs = []
+        self.submitted = []
+
+    def query(self, sql, job_config=None):
+        if job_config.dry_run:
+            self.dry_runs.append(sql)
+            return FakeJob(sql.count("UNION ALL") * GIB + GIB)
+        self.submitted.append(job_config)
+        return FakeJob(None)
+
+
+def empty_batch_result(query_job, client):
+    return pa.table({"query_id": pa.array([], pa.string()), "publication_number": pa.array([], pa.string())})
+
+
+class TestSearchPatentsBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = {f"q{i}": SearchQuery(ipc_codes=[f"H01M{i}"]) for i in range(5)}
+        self.client = FakeClient()
+
+    def run_batch(self, maximum_bytes_billed, cost_estimates=None):
+        overrides = {
+            "bigquery": {"batch_queries_per_job": 2, "claims_fetch": "eager", "maximum_bytes_billed": maximum_bytes_billed},
+            "search_cache": {"enabled": False},
+        }
+        with mock.patch.object(config, "_load_config_file", return_value=overrides), \
+                mock.patch.dict(os.environ, {"PATENTS_SEARCH_BACKEND": "bigquery"}), \
+                mock.patch.object(tools, "_query_job_to_arrow", empty_batch_result):
+            results = search_patents_batch(self.queries, client=self.client, cost_estimates=cost_estimates)
+        return results
+
+    def test_every_job_is_dry_run_and_estimated(self):
+        cost_estimates = {}
+        results = self.run_batch(10 * GIB, cost_estimates)
+        client = self.client
+        # 5件の条件を2件ずつ3つのジョブにまとめ、投入前にそれぞれドライランする
+        self.assertEqual(len(client.dry_runs), 3)
+        self.assertEqual(len(client.submitted), 3)
+        self.assertTrue(all(job_config.maximum_bytes_billed == 10 * GIB for job_config in client.submitted))
+        self.assertEqual(set(results), set(self.queries))
+        self.assertEqual(set(cost_estimates), set(self.queries))
+        self.assertEqual(cost_estimates["q0"].total_bytes_processed, 2 * GIB)
+        self.assertEqual(cost_estimates["q4"].total_bytes_processed, GIB)
+
+    def test_no_job_is_submitted_when_one_exceeds_the_limit(self):
+        with self.assertRaises(QueryCostLimitExceeded):
+            self.run_batch(int(1.5 * GIB))
+        self.assertEqual(len(self.client.dry_runs), 3)
+        self.assertEqual(self.client.submitted, [])
+
+
+class TestPerQuerySearchErrors(unittest.TestCase):
+    """バッチ検索に失敗した場合の、検索条件ごとの検索（ワーカースレッドで実行される）のエラーの扱い"""
+
+    def test_bigquery_errors_are_raised_without_streamlit(self):
+        overrides = {"search_backend": {"backend": "bigquery"}, "search_cache": {"enabled": False}}
+        with mock.patch.object(config, "_load_config_file", return_value=overrides), \
+                mock.patch.dict(os.environ, {"PATENTS_SEARCH_BACKEND": "bigquery"}), \
+                mock.patch.object(tools, "get_bigquery_client", return_value=FakeClient()), \
+                mock.patch.object(tools, "fetch_search_results_arrow", side_effect=RuntimeError("job failed")), \
+                mock.patch.object(tools.st, "error") as st_error:
+            with self.assertRaisesRegex(RuntimeError, "job failed"):
+                tools.search_patents_with_cache(SearchQuery(ipc_codes=["H01M"]))
+        st_error.assert_not_called()
+
+    def test_local_errors_are_raised_without_streamlit(self):
+        env = {"PATENTS_SEARCH_BACKEND": "duckdb", "PATENTS_LOCAL_SNAPSHOT": "/nonexistent/snapshot.parquet"}
+        with mock.patch.dict(os.environ, env), mock.patch.object(tools.st, "error") as st_error:
+            with self.assertRaises(FileNotFoundError):
+                tools.search_patents_with_cache(SearchQuery(ipc_codes=["H01M"]))
+        st_error.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
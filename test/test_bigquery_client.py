@@ -0,0 +1,75 @@
+import sys
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core import bigquery_client
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestBigQueryClient(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for patcher in (
+            mock.patch.object(bigquery_client, "Client", FakeClient),
+            mock.patch.object(bigquery_client, "_current", None),
+            mock.patch.dict(bigquery_client._stats, {key: 0 for key in bigquery_client._stats}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def credentials(self, name: str) -> str:
+        """setup_api_keys と同じく、入力のたびに新しい認証情報ファイルを作る"""
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("{}")
+        return path
+
+    def test_client_is_reused_until_credentials_change(self):
+        """同じ認証情報では使い回し、認証情報が変わったら古いクライアントを閉じて1つだけ保持する"""
+        with mock.patch.dict(os.environ, {"GOOGLE_APPLICATION_CREDENTIALS": self.credentials("first.json")}):
+            first = bigquery_client.get_bigquery_client()
+            self.assertIs(bigquery_client.get_bigquery_client(), first)
+            self.assertIs(bigquery_client.get_bigquery_client(), first)
+
+        for i in range(3):
+            with mock.patch.dict(os.environ, {"GOOGLE_APPLICATION_CREDENTIALS": self.credentials(f"key_{i}.json")}):
+                client = bigquery_client.get_bigquery_client()
+                self.assertIs(bigquery_client.get_bigquery_client(), client)
+
+        stats = bigquery_client.get_client_stats()
+        self.assertEqual(stats["clients_created"], 4)
+        self.assertEqual(stats["client_reuses"], 5)
+        self.assertEqual(stats["clients_closed"], 3)
+        self.assertTrue(first.closed)
+        self.assertFalse(client.closed)
+        self.assertIs(bigquery_client._current[2], client)
+
+    def test_updated_credentials_file_rebuilds_the_client(self):
+        path = self.credentials("key.json")
+        with mock.patch.dict(os.environ, {"GOOGLE_APPLICATION_CREDENTIALS": path}):
+            first = bigquery_client.get_bigquery_client()
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            second = bigquery_client.get_bigquery_client()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(bigquery_client.get_client_stats()["clients_created"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
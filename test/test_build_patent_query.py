@@ -0,0 +1,148 @@
+import sys
+import os
+import unittest
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core.search_cache import DEFAULT_PUBLICATION_DATE_FROM, default_publication_date_to
+from patents_core.core.state import SearchQuery
+from patents_core.core.tools import build_patent_query
+
+EXPECTED_SQL = """
+WITH filtered_patents AS (
+  SELECT
+    p.publication_number,
+    p.publication_date,
+    p.ipc,
+    p.title_localized,
+    p.abstract_localized,
+    p.claims_localized,
+    p.assignee_harmonized
+  FROM `patents-public-data.patents.publications` AS p
+  WHERE p.publication_date BETWEEN @pub_from AND @pub_to
+    AND (EXISTS (SELECT 1 FROM UNNEST(p.ipc) AS c WHERE c.code LIKE @ipc_0) OR ((EXISTS (SELECT 1 FROM UNNEST(p.title_localized) AS l WHERE l.language IN ('ja', 'en') AND SEARCH(l.text, @kw_0))) AND (EXISTS (SELECT 1 FROM UNNEST(p.title_localized) AS l WHERE l.language IN ('ja', 'en') AND SEARCH(l.text, @kw_1)) OR EXISTS (SELECT 1 FROM UNNEST(p.title_localized) AS l WHERE l.language IN ('ja', 'en') AND SEARCH(l.text, @kw_2)))))
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY SUBSTR(p.publication_number, 1, 2) ORDER BY p.publication_date DESC) <= @max_per_country
+  LIMIT @limit
+)
+SELECT
+  f.publication_number,
+  (SELECT text FROM UNNEST(f.title_localized) WHERE language IN ('ja', 'en') ORDER BY (language = 'ja') DESC LIMIT 1) AS title,
+  (SELECT text FROM UNNEST(f.abstract_localized) WHERE language IN ('ja', 'en') ORDER BY (language = 'ja') DESC LIMIT 1) AS abstract,
+  (SELECT text FROM UNNEST(f.claims_localized) WHERE language IN ('ja', 'en') ORDER BY (language = 'ja') DESC LIMIT 1) AS claims,
+  (SELECT STRING_AGG(name) FROM UNNEST(f.assignee_harmonized)) AS assignee_harmonized,
+  f.publication_date,
+  (SELECT ARRAY_AGG(c.code) FROM UNNEST(f.ipc) AS c) AS ipc_codes
+FROM filtered_patents AS f
+"""
+
+
+def params_as_tuples(params):
+    return [(p.name, p.type_, p.value) for p in params]
+
+
+class TestBuildPatentQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.query = SearchQuery(
+            ipc_codes=["G06N 3/08"],
+            keyword_groups=[["自動運転", "autonomous"], ["LiDAR"]],
+            keyword_fields=["title"],
+            publication_date_from="20200101",
+            publication_date_to="20231231",
+            max_results_per_country=5,
+            limit=50,
+        )
+
+    def test_generated_sql_text(self):
+        """生成されるSQL文とパラメータが変わっていないことを確認する"""
+        sql, params = build_patent_query(self.query)
+        self.assertEqual(sql, EXPECTED_SQL)
+        self.assertEqual(params_as_tuples(params), [
+            ("pub_from", "INT64", 20200101),
+            ("pub_to", "INT64", 20231231),
+            ("ipc_0", "STRING", "G06N3/08%"),
+            ("kw_0", "STRING", "LiDAR"),
+            ("kw_1", "STRING", "autonomous"),
+            ("kw_2", "STRING", "自動運転"),
+            ("max_per_country", "INT64", 5),
+            ("limit", "INT64", 50),
+        ])
+
+    def test_filters_run_before_localization(self):
+        """日付・IPC・キーワードの条件と国ごとの上位N件の選択が、テキストの言語選択より前に行われる"""
+        sql, _ = build_patent_query(SearchQuery(ipc_codes=["H04L"], keyword_groups=[["battery"]]))
+        base_scan, outer_select = sql.split("FROM filtered_patents AS f")[0].split(")\nSELECT")
+        self.assertIn("p.publication_date BETWEEN", base_scan)
+        self.assertIn("UNNEST(p.ipc)", base_scan)
+        self.assertIn("SEARCH(l.text, @kw_0)", base_scan)
+        self.assertIn("QUALIFY ROW_NUMBER()", base_scan)
+        self.assertNotIn("ORDER BY (language = 'ja')", base_scan)
+        self.assertNotIn("STRING_AGG", base_scan)
+        self.assertIn("ORDER BY (language = 'ja')", outer_select)
+        self.assertNotIn("SEARCH(", outer_select)
+
+    def test_keyword_search_is_limited_to_requested_fields(self):
+        sql, _ = build_patent_query(SearchQuery(keyword_groups=[["battery"]], keyword_fields=["abstract"]))
+        self.assertIn("UNNEST(p.abstract_localized) AS l", sql)
+        self.assertNotIn("UNNEST(p.title_localized) AS l", sql)
+        self.assertNotIn("UNNEST(p.claims_localized) AS l", sql)
+
+    def test_default_keyword_fields_search_all_text_sections(self):
+        sql, _ = build_patent_query(SearchQuery(keyword_groups=[["battery"]]))
+        for column in ("title_localized", "abstract_localized", "claims_localized"):
+            self.assertIn(f"UNNEST(p.{column}) AS l", sql)
+
+    def test_without_claims_does_not_select_claims(self):
+        """二段階取得の1段目では請求項を取り出さない（キーワード検索の対象としては使う）"""
+        sql, _ = build_patent_query(SearchQuery(keyword_groups=[["battery"]]), include_claims=False)
+        outer_select = sql.split(")\nSELECT")[1]
+        self.assertNotIn("p.claims_localized,", sql)
+        self.assertNotIn("AS claims", outer_select)
+        self.assertIn("UNNEST(p.claims_localized) AS l", sql)
+
+    def test_country_and_assignee_filters(self):
+        """国と出願人の条件は、IPC/キーワードの条件とANDで基底テーブルの走査時に評価される"""
+        sql, params = build_patent_query(SearchQuery(
+            ipc_codes=["H01M"],
+            country_codes=["us", "JP", "jp"],
+            assignees=["Toyota Motor Corp.", "ｔｏｙｏｔａ　motor corp"],
+        ))
+        base_scan = sql.split(")\nSELECT")[0]
+        self.assertIn("\n    AND SUBSTR(p.publication_number, 1, 2) IN UNNEST(@country_codes)\n", base_scan)
+        self.assertIn(
+            "\n    AND EXISTS (SELECT 1 FROM UNNEST(p.assignee_harmonized) AS a WHERE "
+            "STRPOS(CONCAT(' ', TRIM(REGEXP_REPLACE(UPPER(NORMALIZE(a.name, NFKC)), r'[^\\p{L}\\p{N}]+', ' ')), ' '), @assignee_0) > 0)\n",
+            base_scan,
+        )
+        by_name = {p.name: p for p in params}
+        self.assertEqual(by_name["country_codes"].values, ["JP", "US"])
+        self.assertEqual(by_name["assignee_0"].value, " TOYOTA MOTOR CORP ")
+        self.assertNotIn("assignee_1", by_name)
+
+    def test_date_only_query_has_no_match_condition(self):
+        sql, params = build_patent_query(SearchQuery())
+        self.assertIn("WHERE p.publication_date BETWEEN @pub_from AND @pub_to\n  QUALIFY", sql)
+        self.assertEqual(params_as_tuples(params)[:2], [
+            ("pub_from", "INT64", int(DEFAULT_PUBLICATION_DATE_FROM)), ("pub_to", "INT64", int(default_publication_date_to())),
+        ])
+
+    def test_cosmetic_differences_produce_identical_sql(self):
+        """キーワードの順序・重複やIPCコードの空白の違いは、同じSQLとパラメータになる"""
+        other = SearchQuery(
+            ipc_codes=["g06n3/08", "G06N 3/08"],
+            keyword_groups=[["LiDAR", "LiDAR"], ["autonomous", "自動運転"]],
+            keyword_fields=["Title"],
+            publication_date_from="2020-01-01",
+            publication_date_to="2023-12-31",
+            max_results_per_country=5,
+            limit=50,
+        )
+        sql_a, params_a = build_patent_query(self.query)
+        sql_b, params_b = build_patent_query(other)
+        self.assertEqual(sql_a, sql_b)
+        self.assertEqual(params_as_tuples(params_a), params_as_tuples(params_b))
+
+
+if __name__ == '__main__':
+    unittest.main()
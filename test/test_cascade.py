@@ -0,0 +1,75 @@
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# エージェントの読み込み時に埋め込みバックエンドが作られるため、外部APIを使わないバックエンドを先に指定する
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PATENTS_EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("PATENTS_EMBEDDING_CACHE", os.path.join(_TMP.name, "embeddings.sqlite3"))
+
+import numpy as np
+
+from patents_core.core.agent import compute_section_similarities
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.scoring import impute_similarity, select_cascade_rows
+from patents_core.core.state import SearchQuery
+from patents_core.utils import config
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class TestCascadeHelpers(unittest.TestCase):
+
+    def test_select_cascade_rows_unions_top_n_and_threshold(self):
+        score = np.array([0.1, 0.9, 0.5, 0.7, 0.3], dtype=np.float32)
+        np.testing.assert_array_equal(select_cascade_rows(score, 2, None), [1, 3])
+        np.testing.assert_array_equal(select_cascade_rows(score, None, 0.5), [1, 2, 3])
+        np.testing.assert_array_equal(select_cascade_rows(score, 1, 0.3), [1, 2, 3, 4])
+        np.testing.assert_array_equal(select_cascade_rows(score, 10, None), [0, 1, 2, 3, 4])
+        self.assertEqual(select_cascade_rows(score, None, None).size, 0)
+
+    def test_impute_similarity_scales_by_the_scored_ratio(self):
+        first = np.array([[0.2, 0.4], [0.6, 0.2], [0.1, 0.1]], dtype=np.float32)
+        imputed = impute_similarity(first, np.array([0, 1]), np.array([0.15, 0.2], dtype=np.float32))
+        # 計算済みの行は実際の値、残りの行は第1段の平均（0.1）に比率（0.175 / 0.35）を掛けた値
+        np.testing.assert_allclose(imputed, [0.15, 0.2, 0.05], rtol=1e-6)
+        self.assertEqual(imputed.dtype, np.float32)
+
+    def test_impute_similarity_without_scored_rows_uses_the_first_stage(self):
+        first = np.array([[0.2, 0.4], [0.6, 0.2]], dtype=np.float32)
+        imputed = impute_similarity(first, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        np.testing.assert_allclose(imputed, [0.3, 0.4], rtol=1e-6)
+
+
+class TestCascadeSimilarities(unittest.TestCase):
+
+    def test_sections_outside_the_first_stage_are_embedded_for_selected_rows(self):
+        """第1段に含めないセクションは、選ばれた行では実際に計算し、選ばれなかった行だけ補完して部分評価とする"""
+        query = SearchQuery(keyword_groups=[["sensor", "battery"]], max_results_per_country=5, limit=20)
+        df = search_patents_locally(query, snapshot_path=FIXTURE_PATH)
+        plan_text = "センサを用いた電池の異常検知"
+        full, partially_scored = compute_section_similarities(df.copy(), plan_text, {})
+        self.assertIsNone(partially_scored)
+
+        overrides = {"cascade": {"enabled": True, "first_stage_sections": ["title"], "score_threshold": None, "top_n": 5}}
+        with mock.patch.object(config, "_load_config_file", return_value=overrides):
+            cascaded, partially_scored = compute_section_similarities(df.copy(), plan_text, {})
+        # 2回目はキャッシュから読むため、埋め込みキャッシュの量子化誤差は許容する
+        rows = np.flatnonzero(~partially_scored)
+        self.assertEqual(rows.size, 5)
+        np.testing.assert_allclose(cascaded[rows], full[rows], atol=1e-3)
+        np.testing.assert_allclose(cascaded[:, 0], full[:, 0], atol=1e-3)
+        # 補完した要約・請求項の類似度はセクションごとに異なる比率で求める
+        others = np.flatnonzero(partially_scored)
+        self.assertFalse(np.allclose(cascaded[others, 1], cascaded[others, 2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
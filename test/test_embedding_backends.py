@@ -0,0 +1,76 @@
+import sys
+import os
+import importlib.util
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from patents_core.core.embedding_backends import HashingEmbeddings, create_embeddings_backend, native_dimensions
+from patents_core.utils import config
+
+
+class TestHashingEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.model = HashingEmbeddings(dimensions=256, batch_size=3, max_workers=2)
+
+    def test_vectors_are_deterministic_unit_vectors(self):
+        vector = np.array(self.model.embed_query("lithium-ion battery with a temperature sensor"))
+        self.assertEqual(vector.shape, (256,))
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1.0, places=5)
+        np.testing.assert_array_equal(vector, HashingEmbeddings(dimensions=256).embed_query("lithium-ion battery with a temperature sensor"))
+        # トークンのないテキストはゼロベクトル
+        self.assertFalse(np.any(self.model.embed_query("  --  ")))
+
+    def test_tokenization_normalizes_width_case_and_japanese(self):
+        np.testing.assert_allclose(self.model.embed_query("ＢＡＴＴＥＲＹ Sensor"), self.model.embed_query("battery sensor"))
+        related = np.dot(self.model.embed_query("電池の異常検知"), self.model.embed_query("電池の異常を検知する装置"))
+        unrelated = np.dot(self.model.embed_query("電池の異常検知"), self.model.embed_query("robot arm"))
+        self.assertGreater(related, 0.5)
+        self.assertLess(abs(unrelated), related)
+
+    def test_documents_in_parallel_batches_match_single_queries(self):
+        texts = [f"battery sensor {i} " + "異常検知" * (i % 3) for i in range(10)]
+        documents = self.model.embed_documents(texts)
+        self.assertEqual(len(documents), len(texts))
+        for text, vector in zip(texts, documents):
+            np.testing.assert_array_equal(vector, self.model.embed_query(text))
+
+
+class TestCreateEmbeddingsBackend(unittest.TestCase):
+
+    def create(self, backend, overrides=None):
+        with mock.patch.object(config, "_load_config_file", return_value={"embedding": overrides or {}}), \
+                mock.patch.dict(os.environ, {"PATENTS_EMBEDDING_BACKEND": backend}):
+            return create_embeddings_backend()
+
+    def test_hashing_backend_needs_no_network(self):
+        model, model_name = self.create("hashing", {"hashing_dimensions": 128})
+        self.assertIsInstance(model, HashingEmbeddings)
+        # 次元数が違うベクトルを同じキャッシュキーで混ぜないよう、モデル名に次元数を含める
+        self.assertEqual(model_name, "hashing-128")
+        self.assertEqual(native_dimensions(model), 128)
+        self.assertEqual(len(model.embed_query("battery")), 128)
+
+    @unittest.skipIf(importlib.util.find_spec("sentence_transformers") is not None, "sentence-transformers is installed")
+    def test_sentence_transformers_backend_reports_the_missing_package(self):
+        with self.assertRaisesRegex(ImportError, "pip install sentence-transformers"):
+            self.create("sentence_transformers")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            self.create("word2vec")
+
+    def test_native_dimensions_of_openai_models(self):
+        self.assertEqual(native_dimensions(SimpleNamespace(model="text-embedding-3-large", dimensions=None)), 3072)
+        self.assertEqual(native_dimensions(SimpleNamespace(model="text-embedding-3-small", dimensions=512)), 512)
+        self.assertIsNone(native_dimensions(SimpleNamespace(model="unknown-model", dimensions=None)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from patents_core.core.embedding_cache import EmbeddingCache, text_hash
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open_cache(self, storage_dtype="float32", max_bytes=1024 * 1024, name="embeddings.sqlite3"):
+        return EmbeddingCache(Path(self.tmp.name) / name, max_bytes, storage_dtype)
+
+    def test_text_hash_ignores_width_and_whitespace(self):
+        self.assertEqual(text_hash("リチウム  イオン電池\n"), text_hash("ﾘﾁｳﾑ イオン電池"))
+        self.assertEqual(text_hash("ＡＢＣ 123"), text_hash("ABC 123"))
+        self.assertNotEqual(text_hash("battery"), text_hash("Battery"))
+
+    def test_entries_are_keyed_by_model_and_text_hash(self):
+        cache = self.open_cache()
+        h = text_hash("battery")
+        small = self.rng.standard_normal(8).astype(np.float32)
+        large = self.rng.standard_normal(8).astype(np.float32)
+        cache.put_many("model-small", {h: small})
+        cache.put_many("model-large", {h: large})
+
+        np.testing.assert_array_equal(cache.get_many("model-small", [h])[h], small)
+        np.testing.assert_array_equal(cache.get_many("model-large", [h])[h], large)
+        self.assertEqual(cache.get_many("model-other", [h]), {})
+        self.assertEqual(cache.get_many("model-small", [text_hash("sensor")]), {})
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_shorter_vectors_do_not_overwrite_longer_ones(self):
+        cache = self.open_cache()
+        h = text_hash("battery")
+        full = self.rng.standard_normal(16).astype(np.float32)
+        cache.put_many("model", {h: full})
+        cache.put_many("model", {h: full[:8]})
+        np.testing.assert_array_equal(cache.get_many("model", [h])[h], full)
+        self.assertEqual(cache.get_many("model", [h], min_dim=32), {})
+
+    def test_quantized_round_trip(self):
+        """保存形式ごとに、復元したベクトルの誤差が量子化の刻み幅に収まり、スケールも保存される"""
+        vector = self.rng.standard_normal(256).astype(np.float32)
+        for storage_dtype, atol in (("float32", 0.0), ("float16", 2e-3), ("int8", np.abs(vector).max() / 127 / 2 + 1e-6)):
+            with self.subTest(storage_dtype=storage_dtype):
+                cache = self.open_cache(storage_dtype, name=f"{storage_dtype}.sqlite3")
+                cache.put_many("model", {"h": vector})
+                restored = cache.get_many("model", ["h"])["h"]
+                self.assertEqual(restored.dtype, np.float32)
+                np.testing.assert_allclose(restored, vector, atol=atol, rtol=0)
+                nbytes = cache.stats()["bytes"]
+                self.assertEqual(nbytes, vector.size * np.dtype(storage_dtype).itemsize)
+
+    def test_entries_written_in_another_dtype_are_still_readable(self):
+        """保存形式を変えても、以前の形式で保存したエントリは行ごとの dtype / scale で復元される"""
+        vector = self.rng.standard_normal(64).astype(np.float32)
+        self.open_cache("int8").put_many("model", {"h": vector})
+        restored = self.open_cache("float16").get_many("model", ["h"])["h"]
+        np.testing.assert_allclose(restored, vector, atol=np.abs(vector).max() / 127)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        # 1エントリ 64 バイト（float32 × 16次元）、上限は4エントリ分
+        cache = self.open_cache(max_bytes=4 * 64)
+        vectors = {f"h{i}": self.rng.standard_normal(16).astype(np.float32) for i in range(5)}
+        for i in range(4):
+            cache.put_many("model", {f"h{i}": vectors[f"h{i}"]})
+            time.sleep(0.01)
+        # h0 を読んで最終アクセスを新しくすると、次に古い h1 が削除される
+        cache.get_many("model", ["h0"])
+        time.sleep(0.01)
+        cache.put_many("model", {"h4": vectors["h4"]})
+
+        remaining = cache.get_many("model", list(vectors))
+        self.assertIn("h0", remaining)
+        self.assertIn("h4", remaining)
+        self.assertNotIn("h1", remaining)
+        self.assertLessEqual(cache.stats()["bytes"], int(4 * 64 * 0.9))
+
+    def test_hits_and_misses_are_counted_per_unique_hash(self):
+        cache = self.open_cache()
+        cache.put_many("model", {"h": np.ones(4, dtype=np.float32)})
+        cache.get_many("model", ["h", "h", "missing"])
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
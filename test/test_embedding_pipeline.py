@@ -0,0 +1,163 @@
+import sys
+import os
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from patents_core.core.embedding_backends import HashingEmbeddings
+from patents_core.core.embedding_cache import EmbeddingCache, text_hash
+from patents_core.core.embedding_pipeline import aembed_texts, embed_sections, pack_batches, run_coroutine
+from patents_core.core.text_budget import DEFAULT_BUDGET_CONFIG, apply_text_budget, count_tokens
+from patents_core.utils import config
+
+
+class FixedEmbeddings:
+    """次元数の分からない（native_dimensions が None になる）バックエンド。呼び出された件数を記録する"""
+
+    def __init__(self, dimensions: int):
+        self.dimensions_out = dimensions
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[1.0] * self.dimensions_out for _ in texts]
+
+
+class TestEmbedSections(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = EmbeddingCache(Path(self.tmp.name) / "embeddings.sqlite3", 64 * 1024 * 1024)
+        self.df = pd.DataFrame({"title": ["battery sensor"], "abstract": ["a battery"], "claims": ["a sensor"]})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_short_cached_vectors_are_embedded_again_at_full_dimension(self):
+        """以前に短い次元で保存したベクトルがあっても、全次元のベクトルを返す（次元数が切り詰められない）"""
+        model = HashingEmbeddings(dimensions=8)
+        self.cache.put_many("model", {text_hash("battery sensor"): np.ones(4, dtype=np.float32)})
+
+        plan_vector, matrices = embed_sections(self.df, "plan", model, "model", self.cache)
+        self.assertEqual(plan_vector.shape, (8,))
+        for name in ("title", "abstract", "claims"):
+            self.assertEqual(matrices[name].shape, (1, 8))
+        np.testing.assert_allclose(matrices["title"][0], model.embed_query("battery sensor"), atol=1e-6)
+        # キャッシュも全次元のベクトルで上書きされる
+        self.assertEqual(self.cache.get_many("model", [text_hash("battery sensor")])[text_hash("battery sensor")].shape, (8,))
+
+    def test_requested_dimensions_truncate_longer_vectors(self):
+        model = HashingEmbeddings(dimensions=8)
+        plan_vector, matrices = embed_sections(self.df, "plan", model, "model", self.cache, dimensions=4)
+        self.assertEqual(plan_vector.shape, (4,))
+        self.assertEqual(matrices["claims"].shape, (1, 4))
+
+    def test_claim_chunks_are_pooled(self):
+        """chunk モードの請求項は、チャンクごとのベクトルを pooling の方法（mean / max）でまとめる"""
+        claims = "a battery pack with a thermistor sensor and a cooling fan " * 40
+        budget = {"claims_mode": "chunk", "chunk_tokens": 32, "max_chunks": 4, "claims_tokens": 128}
+        df = self.df.assign(claims=[claims])
+        model = HashingEmbeddings(dimensions=16)
+        chunks = apply_text_budget("claims", claims, {**DEFAULT_BUDGET_CONFIG, **budget})
+        self.assertEqual(len(chunks), 4)
+        chunk_vectors = np.array(model.embed_documents(chunks), dtype=np.float32)
+        for pooling, expected in (("mean", chunk_vectors.mean(axis=0)), ("max", chunk_vectors.max(axis=0))):
+            with self.subTest(pooling=pooling), \
+                    mock.patch.object(config, "_load_config_file", return_value={"text_budget": {**budget, "pooling": pooling}}):
+                _, matrices = embed_sections(df, "plan", model, "model", self.cache)
+                # 埋め込みキャッシュの量子化誤差は許容する
+                np.testing.assert_allclose(matrices["claims"][0], expected, atol=1e-3)
+
+    def test_mixed_lengths_raise_when_the_dimension_is_unknown(self):
+        self.cache.put_many("model", {text_hash("battery sensor"): np.ones(4, dtype=np.float32)})
+        with self.assertRaises(ValueError):
+            embed_sections(self.df, "plan", FixedEmbeddings(8), "model", self.cache)
+
+
+class TestPackBatches(unittest.TestCase):
+
+    def test_batches_respect_token_and_input_limits(self):
+        token_counts = [5, 40, 7, 60, 1, 1, 1, 1, 30, 25, 100, 2]
+        batches = pack_batches([""] * len(token_counts), token_counts, max_tokens=64, max_inputs=3)
+        # 全テキストが元の順序で1回ずつ含まれる
+        self.assertEqual([i for batch in batches for i in batch], list(range(len(token_counts))))
+        for batch in batches:
+            self.assertLessEqual(len(batch), 3)
+            # 1件で上限を超えるテキスト（100トークン）だけは単独のバッチになる
+            if len(batch) > 1:
+                self.assertLessEqual(sum(token_counts[i] for i in batch), 64)
+        self.assertIn([10], batches)
+        # 上限に達するまで詰める（次のテキストを足すと上限を超える所でだけ区切る）
+        for batch, following in zip(batches, batches[1:]):
+            full = len(batch) == 3 or sum(token_counts[i] for i in batch) + token_counts[following[0]] > 64
+            self.assertTrue(full)
+
+    def test_embed_sections_sends_requests_within_the_limits(self):
+        """embedding_batch の上限（1リクエストのトークン数・件数）を超えるリクエストを送らない"""
+        texts = [f"battery sensor number {i} " * (i % 5 + 1) for i in range(40)]
+        df = pd.DataFrame({"title": texts, "abstract": [t.upper() for t in texts], "claims": [""] * len(texts)})
+        limits = {"max_tokens_per_request": 200, "max_inputs_per_request": 7, "min_inputs_per_request": 1, "max_concurrency": 2}
+        model = FixedEmbeddings(4)
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(config, "_load_config_file", return_value={"embedding_batch": limits}):
+            cache = EmbeddingCache(Path(tmp) / "embeddings.sqlite3", 64 * 1024 * 1024)
+            stats = {}
+            embed_sections(df, "plan", model, "model", cache, stats)
+        self.assertGreater(len(model.calls), 1)
+        self.assertEqual(stats["requests"], len(model.calls))
+        for call in model.calls:
+            self.assertLessEqual(len(call), 7)
+            self.assertLessEqual(sum(count_tokens(t) for t in call), 200)
+        # 調査方針と、重複のない全テキストがちょうど1回ずつ送られる
+        sent = [t for call in model.calls for t in call]
+        self.assertEqual(sorted(sent), sorted({"plan", *texts, *(t.upper() for t in texts)}))
+
+
+class ConcurrencyProbe:
+    """非同期APIを持つバックエンド。同時に実行中のリクエスト数の最大値を記録する"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def aembed_documents(self, texts):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return [[float(len(t))] for t in texts]
+
+
+class TestAsyncEmbedding(unittest.TestCase):
+
+    def test_concurrency_is_capped_and_results_keep_batch_order(self):
+        texts = [f"text {i}" + "x" * i for i in range(20)]
+        batches = [[i, i + 1] for i in range(0, 20, 2)]
+        for cap in (1, 3, 16):
+            with self.subTest(max_concurrency=cap):
+                model = ConcurrencyProbe()
+                results = asyncio.run(aembed_texts(model, texts, batches, cap))
+                self.assertEqual(model.max_in_flight, min(cap, len(batches)))
+                self.assertEqual(results, [[[float(len(texts[i]))] for i in batch] for batch in batches])
+
+    def test_run_coroutine_inside_a_running_loop(self):
+        """イベントループの中（Streamlitなど）から呼んでも、別スレッドのループで実行して結果を返す"""
+        model = ConcurrencyProbe()
+
+        async def caller():
+            return run_coroutine(aembed_texts(model, ["a", "bb"], [[0], [1]], 2))
+
+        self.assertEqual(asyncio.run(caller()), [[[1.0]], [[2.0]]])
+        self.assertEqual(model.max_in_flight, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+import pandas as pd
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# エージェントの読み込み時に埋め込みバックエンドが作られるため、外部APIを使わないバックエンドを先に指定する
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PATENTS_EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("PATENTS_EMBEDDING_CACHE", os.path.join(_TMP.name, "embeddings.sqlite3"))
+
+from patents_core.core import agent
+from patents_core.core.async_search import SearchHandle
+from patents_core.core.state import AppState, QueryCostEstimate, SearchQuery
+
+
+def estimate(total_bytes: int) -> QueryCostEstimate:
+    return QueryCostEstimate(total_bytes_processed=total_bytes, estimated_cost_usd=0.0, maximum_bytes_billed=10, exceeds_limit=total_bytes > 10)
+
+
+class TestExecuteSearch(unittest.TestCase):
+
+    def run_execute_search(self, state, new_estimate):
+        completed = Future()
+        completed.set_result((pd.DataFrame({"publication_number": ["JP-1-A"]}), None))
+        submitted = []
+
+        def submit(query, cost_estimate=None):
+            submitted.append((query, cost_estimate))
+            return SearchHandle(query, completed)
+
+        with mock.patch.object(agent, "get_search_backend", return_value="bigquery"), \
+                mock.patch.object(agent, "is_search_cached", return_value=False), \
+                mock.patch.object(agent, "estimate_query_cost", return_value=new_estimate) as estimate_query_cost, \
+                mock.patch.object(agent, "submit_search", side_effect=submit):
+            state = agent.execute_search(state)
+        return state, submitted, estimate_query_cost
+
+    def test_edited_query_is_estimated_again(self):
+        """SQL生成後に検索条件が編集された場合、編集前の見積もりではなく見積もり直した結果で投入し直す"""
+        old_query = SearchQuery(ipc_codes=["H01M"])
+        new_query = SearchQuery(ipc_codes=["G06N"])
+        state = AppState(search_query=new_query)
+        state.search_handle = SearchHandle(old_query, Future())
+        state.query_cost_estimate = estimate(1)
+
+        state, submitted, estimate_query_cost = self.run_execute_search(state, estimate(100))
+        self.assertIsNone(state.error)
+        estimate_query_cost.assert_called_once_with(new_query)
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual(submitted[0][1].total_bytes_processed, 100)
+        self.assertTrue(state.query_cost_estimate.exceeds_limit)
+
+    def test_submitted_search_is_reused_without_estimating(self):
+        query = SearchQuery(ipc_codes=["H01M"])
+        completed = Future()
+        completed.set_result((pd.DataFrame({"publication_number": ["JP-1-A"]}), None))
+        state = AppState(search_query=query)
+        state.search_handle = SearchHandle(query, completed)
+        state.query_cost_estimate = estimate(1)
+
+        state, submitted, estimate_query_cost = self.run_execute_search(state, estimate(100))
+        self.assertIsNone(state.error)
+        estimate_query_cost.assert_not_called()
+        self.assertEqual(submitted, [])
+        self.assertEqual(state.query_cost_estimate.total_bytes_processed, 1)
+        self.assertEqual(len(state.search_results), 1)
+
+    def test_cached_search_is_not_dry_run(self):
+        """検索結果キャッシュにある検索はBigQueryを実行しないため、ドライランもしない"""
+        query = SearchQuery(ipc_codes=["H01M"])
+        with mock.patch.object(agent, "get_search_backend", return_value="bigquery"), \
+                mock.patch.object(agent, "estimate_query_cost", return_value=estimate(1)) as estimate_query_cost:
+            with mock.patch.object(agent, "is_search_cached", return_value=True):
+                self.assertIsNone(agent.estimate_search_cost(query))
+            estimate_query_cost.assert_not_called()
+            with mock.patch.object(agent, "is_search_cached", return_value=False):
+                self.assertEqual(agent.estimate_search_cost(query).total_bytes_processed, 1)
+            estimate_query_cost.assert_called_once_with(query)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys
+import os
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# エージェントの読み込み時に埋め込みバックエンドが作られるため、外部APIを使わないバックエンドを先に指定する
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PATENTS_EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("PATENTS_EMBEDDING_CACHE", os.path.join(_TMP.name, "embeddings.sqlite3"))
+
+from patents_core.core.agent import analyze_results, compute_section_similarities, fetch_more_results
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.state import AppState, SearchQuery
+from patents_core.utils import config
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class TestFetchMoreResults(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        overrides = {
+            "bigquery": {"claims_fetch": "lazy"},
+            "cascade": {"enabled": False},
+            "result_cursor": {"max_per_country": 50, "max_rows": 1000, "path": self.tmp.name},
+            "search_cache": {"enabled": False},
+        }
+        self.config = mock.patch.object(config, "_load_config_file", return_value=overrides)
+        self.config.start()
+        env = {"PATENTS_SEARCH_BACKEND": "duckdb", "PATENTS_LOCAL_SNAPSHOT": str(FIXTURE_PATH)}
+        self.env = mock.patch.dict(os.environ, env)
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.config.stop()
+        self.tmp.cleanup()
+
+    def test_lazy_claims_are_fetched_for_new_rows(self):
+        """請求項を後から取得するモードでも、追加した行の請求項を取得して請求項類似度を計算する"""
+        query = SearchQuery(keyword_groups=[["sensor", "battery"]], max_results_per_country=2, limit=10)
+        state = AppState(search_query=query, plan_text="センサを用いた電池の異常検知")
+        state.search_results = search_patents_locally(query, include_claims=False)
+        state = analyze_results(state)
+        first_rows = len(state.search_results)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", FutureWarning)
+            state = fetch_more_results(state, 10)
+        self.assertIsNone(state.error)
+        self.assertEqual(len(state.search_results), first_rows + 10)
+
+        added = state.search_results.iloc[first_rows:]
+        self.assertFalse(added["claims"].isna().any())
+        # 追加した行の類似度は、請求項を最初から取得して計算した場合と一致する（埋め込みキャッシュの量子化誤差は許容する）
+        numbers = added["publication_number"].tolist()
+        eager = search_patents_locally(query.model_copy(update={"max_results_per_country": 50, "limit": 1000}))
+        eager = eager.set_index("publication_number").loc[numbers].reset_index()
+        expected, _ = compute_section_similarities(eager, state.plan_text, {})
+        np.testing.assert_allclose(state.section_similarities[first_rows:], expected, atol=1e-3)
+        self.assertTrue((state.section_similarities[first_rows:, 2] > 0).any())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import sys
+import os
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from patents_core.core.inverted_index import InvertedIndex, PostingList, search_patents_with_index
+from patents_core.core.local_backend import fetch_claims_locally, search_patents_locally
+from patents_core.core.state import SearchQuery
+from patents_core.core.tools import search_patents_with_cache
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+QUERIES = {
+    "ipc_only": SearchQuery(ipc_codes=["G06N3", "H01M"], max_results_per_country=4),
+    "ipc_full_code": SearchQuery(ipc_codes=["H04L63/14", "A61B"], max_results_per_country=100, limit=1000),
+    "keyword_groups": SearchQuery(keyword_groups=[["自動運転", "LiDAR"], ["neural network", "機械学習"]]),
+    "multi_token_keyword": SearchQuery(keyword_groups=[["lithium-ion battery", "Anomaly Detection"]], max_results_per_country=100, limit=1000),
+    "ipc_or_keywords": SearchQuery(ipc_codes=["B60W"], keyword_groups=[["battery"]], keyword_fields=["title"]),
+    "claims_only": SearchQuery(keyword_groups=[["異常検知"]], keyword_fields=["claims"], max_results_per_country=100),
+    "country_and_assignee": SearchQuery(
+        ipc_codes=["G06"], country_codes=["jp", "US"], assignees=["toyota motor corp.", "ｓｏｎｙ"],
+        max_results_per_country=100,
+    ),
+    "assignee_only": SearchQuery(assignees=["LG Electronics", "google"], max_results_per_country=100, limit=1000),
+    "date_range_and_limit": SearchQuery(
+        keyword_groups=[["sensor", "robot"]], publication_date_from="2015-01-01", publication_date_to="20201231",
+        max_results_per_country=2, limit=7,
+    ),
+    "date_only": SearchQuery(max_results_per_country=1),
+    "whole_corpus": SearchQuery(publication_date_from="19000101", publication_date_to="20991231", max_results_per_country=1000, limit=1000),
+    "no_match": SearchQuery(keyword_groups=[["quantum"]]),
+    "delimiter_only_keyword": SearchQuery(keyword_groups=[["--"]], ipc_codes=["G16H"]),
+}
+
+
+def rows(df):
+    return pa.Table.from_pandas(df, preserve_index=False).to_pylist()
+
+
+class TestInvertedIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index = InvertedIndex(pq.read_table(FIXTURE_PATH))
+
+    def test_results_match_duckdb_backend(self):
+        """同じ検索条件で、DuckDBのローカル検索と同じ行・同じ列・同じ順序の結果を返す"""
+        for name, query in QUERIES.items():
+            with self.subTest(query=name):
+                expected = search_patents_locally(query, snapshot_path=FIXTURE_PATH)
+                actual = search_patents_with_index(query, snapshot_path=FIXTURE_PATH)
+                self.assertEqual(actual.columns.tolist(), expected.columns.tolist())
+                self.assertEqual(rows(actual), rows(expected))
+
+    def test_without_claims_and_fetch_claims(self):
+        query = QUERIES["ipc_only"]
+        table = self.index.search(query, include_claims=False)
+        self.assertNotIn("claims", table.column_names)
+        numbers = table.column("publication_number").to_pylist() + ["XX-0000000-A1"]
+        self.assertEqual(self.index.fetch_claims(numbers), fetch_claims_locally(numbers, snapshot_path=FIXTURE_PATH))
+
+    def test_posting_lists_round_trip(self):
+        """疎なリストは差分を小さい整数型で、密なリストはビットマップで持ち、元のID列に戻せる"""
+        sparse = np.array([3, 10, 200, 100000])
+        dense = np.arange(0, 1000, 2)
+        for ids, universe in ((sparse, 200000), (dense, 1000), (np.array([], dtype=np.int64), 10)):
+            posting = PostingList(ids, universe)
+            np.testing.assert_array_equal(posting.decode(), ids)
+        self.assertIsNotNone(PostingList(dense, 1000).bitmap)
+        self.assertEqual(PostingList(np.array([1, 2, 300]), 1000).gaps.dtype, np.uint16)
+
+    def test_backend_is_selectable(self):
+        env = {"PATENTS_SEARCH_BACKEND": "index", "PATENTS_LOCAL_SNAPSHOT": str(FIXTURE_PATH)}
+        with mock.patch.dict(os.environ, env):
+            df, cache_age = search_patents_with_cache(QUERIES["keyword_groups"])
+        self.assertIsNone(cache_age)
+        expected = search_patents_locally(QUERIES["keyword_groups"], snapshot_path=FIXTURE_PATH)
+        self.assertEqual(df["publication_number"].tolist(), expected["publication_number"].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# エージェントの読み込み時に埋め込みバックエンドが作られるため、外部APIを使わないバックエンドを先に指定する
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PATENTS_EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("PATENTS_EMBEDDING_CACHE", os.path.join(_TMP.name, "embeddings.sqlite3"))
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from patents_core.core import agent, tools
+from patents_core.core.agent import run_analysis_workflow
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.state import AppState, SearchQuery
+from patents_core.utils import config
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class TestLazyClaims(unittest.TestCase):
+
+    def setUp(self):
+        env = {"PATENTS_SEARCH_BACKEND": "duckdb", "PATENTS_LOCAL_SNAPSHOT": str(FIXTURE_PATH)}
+        self.env = mock.patch.dict(os.environ, env)
+        self.env.start()
+        self.fetched = []
+        fetch_claims = tools.fetch_claims
+
+        def counting_fetch_claims(publication_numbers):
+            self.fetched.append(list(publication_numbers))
+            return fetch_claims(publication_numbers)
+
+        self.fetch = mock.patch.object(tools, "fetch_claims", counting_fetch_claims)
+        self.fetch.start()
+        self.prompts = []
+
+        def fake_model(prompt):
+            self.prompts.append(prompt.to_string())
+            return AIMessage(content="要約")
+
+        self.model = mock.patch.object(agent, "model", RunnableLambda(fake_model))
+        self.model.start()
+
+    def tearDown(self):
+        self.model.stop()
+        self.fetch.stop()
+        self.env.stop()
+
+    def run_workflow(self, overrides):
+        query = SearchQuery(keyword_groups=[["sensor", "battery", "robot"]], max_results_per_country=50, limit=100)
+        state = AppState(search_query=query, plan_text="センサを用いた電池の異常検知")
+        state.search_results = search_patents_locally(query, include_claims=False)
+        with mock.patch.object(config, "_load_config_file", return_value=overrides):
+            return run_analysis_workflow(state)
+
+    def test_claims_are_fetched_only_for_top_rows(self):
+        """請求項は、類似度計算の上位 lazy_claims_top_n 件と要約対象の上位 max_rows 件の分だけ取得する"""
+        overrides = {
+            "bigquery": {"claims_fetch": "lazy", "lazy_claims_top_n": 5},
+            "cascade": {"enabled": False},
+            "search_cache": {"enabled": False},
+            "summary": {"max_rows": 3},
+        }
+        state = self.run_workflow(overrides)
+        self.assertIsNone(state.error)
+        total_rows = len(state.analyzed_results)
+        self.assertGreater(total_rows, 20)
+
+        fetched = [n for call in self.fetched for n in call]
+        self.assertEqual(len(self.fetched[0]), 5)
+        self.assertLessEqual(len(fetched), 5 + 3)
+        self.assertEqual(len(fetched), len(set(fetched)))
+        self.assertEqual(state.selected_patents_for_summary, state.analyzed_results["publication_number"].tolist()[:3])
+        self.assertEqual(int((~state.analyzed_results["partially_scored"]).sum()), 5)
+        # 要約に渡した行には請求項が入っている
+        summarized = state.search_results.set_index("publication_number").loc[state.selected_patents_for_summary]
+        for claims in summarized["claims"].tolist():
+            self.assertIn(claims[:30], self.prompts[0])
+
+    def test_eager_mode_does_not_fetch_claims(self):
+        overrides = {"bigquery": {"claims_fetch": "eager"}, "search_cache": {"enabled": False}, "summary": {"max_rows": 3}}
+        query = SearchQuery(keyword_groups=[["sensor", "battery", "robot"]], max_results_per_country=50, limit=100)
+        state = AppState(search_query=query, plan_text="センサを用いた電池の異常検知")
+        state.search_results = search_patents_locally(query)
+        with mock.patch.object(config, "_load_config_file", return_value=overrides):
+            state = run_analysis_workflow(state)
+        self.assertEqual(self.fetched, [])
+        self.assertIsNone(state.partially_scored)
+        self.assertEqual(len(state.selected_patents_for_summary), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
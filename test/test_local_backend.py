@@ -0,0 +1,175 @@
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from patents_core.core.inverted_index import search_patents_with_index
+from patents_core.core.local_backend import fetch_claims_locally, search_patents_locally
+from patents_core.core.search_analyzer import analyze_search_text, search_matches
+from patents_core.core.search_cache import canonicalize_search_query, normalize_assignee
+from patents_core.core.state import SearchQuery
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+RESULT_COLUMNS = ['publication_number', 'title', 'abstract', 'claims', 'assignee_harmonized', 'publication_date', 'ipc_codes']
+
+QUERIES = {
+    "ipc_only": SearchQuery(ipc_codes=["G06N3", "H01M"], max_results_per_country=4),
+    "keyword_groups": SearchQuery(keyword_groups=[["自動運転", "LiDAR"], ["neural network", "機械学習"]]),
+    "ipc_or_keywords": SearchQuery(ipc_codes=["B60W"], keyword_groups=[["battery"]], keyword_fields=["title"]),
+    "claims_only": SearchQuery(keyword_groups=[["異常検知"]], keyword_fields=["claims"], max_results_per_country=100),
+    "country_and_assignee": SearchQuery(
+        ipc_codes=["G06"], country_codes=["jp", "US"], assignees=["toyota motor corp.", "ｓｏｎｙ"],
+        max_results_per_country=100,
+    ),
+    "date_range_and_limit": SearchQuery(
+        keyword_groups=[["sensor", "robot"]], publication_date_from="2015-01-01", publication_date_to="20201231",
+        max_results_per_country=2, limit=7,
+    ),
+    "date_only": SearchQuery(max_results_per_country=1),
+    "no_match": SearchQuery(keyword_groups=[["quantum"]]),
+    "delimiter_only_keyword": SearchQuery(keyword_groups=[["--"]], ipc_codes=["G16H"]),
+}
+
+
+def reference_search(rows, query: SearchQuery):
+    """build_patent_query の検索条件の意味をそのままPythonで評価した、結果の公開番号のリスト"""
+    query = canonicalize_search_query(query)
+    columns = {"title": "title_localized", "abstract": "abstract_localized", "claims": "claims_localized"}
+
+    def text_matches(row, keyword):
+        return any(
+            l["language"] in ("ja", "en") and search_matches(l["text"], keyword)
+            for field in query.keyword_fields for l in row[columns[field]]
+        )
+
+    def matches(row):
+        if not int(query.publication_date_from) <= row["publication_date"] <= int(query.publication_date_to):
+            return False
+        if query.country_codes and row["publication_number"][:2] not in query.country_codes:
+            return False
+        if query.assignees and not any(
+            f" {name} " in f" {normalize_assignee(a['name'])} " for a in row["assignee_harmonized"] for name in query.assignees
+        ):
+            return False
+        conditions = []
+        if query.ipc_codes:
+            conditions.append(any(c["code"].startswith(code) for c in row["ipc"] for code in query.ipc_codes))
+        if query.keyword_groups:
+            conditions.append(all(any(text_matches(row, kw) for kw in group) for group in query.keyword_groups))
+        return not conditions or any(conditions)
+
+    ordered = sorted(
+        (row for row in rows if matches(row)),
+        key=lambda row: (row["publication_date"], row["publication_number"]),
+        reverse=True,
+    )
+    per_country = {}
+    selected = []
+    for row in ordered:
+        country = row["publication_number"][:2]
+        per_country[country] = per_country.get(country, 0) + 1
+        if per_country[country] <= query.max_results_per_country:
+            selected.append(row["publication_number"])
+    return selected[:query.limit]
+
+
+class TestLocalBackend(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rows = pq.read_table(FIXTURE_PATH).to_pylist()
+
+    def test_results_match_reference_semantics(self):
+        """IPCの前方一致のOR・キーワードグループのANDのOR・国/出願人/日付の条件・国ごとの上位N件が、参照実装と同じ結果になる"""
+        for name, query in QUERIES.items():
+            with self.subTest(query=name):
+                df = search_patents_locally(query, snapshot_path=FIXTURE_PATH)
+                self.assertEqual(df["publication_number"].tolist(), reference_search(self.rows, query))
+
+    def test_queries_are_not_trivial(self):
+        """フィクスチャが検索条件を区別できていることの確認（一致なし以外は結果があり、全件ではない）"""
+        for name, query in QUERIES.items():
+            with self.subTest(query=name):
+                expected = reference_search(self.rows, query)
+                if name == "no_match":
+                    self.assertEqual(expected, [])
+                else:
+                    self.assertTrue(0 < len(expected) < len(self.rows))
+
+    def test_result_columns_match_bigquery_results(self):
+        df = search_patents_locally(QUERIES["keyword_groups"], snapshot_path=FIXTURE_PATH)
+        self.assertEqual(df.columns.tolist(), RESULT_COLUMNS)
+        row = df.iloc[0]
+        source = next(r for r in self.rows if r["publication_number"] == row["publication_number"])
+        languages = [l["language"] for l in source["title_localized"]]
+        expected_title = source["title_localized"][languages.index("ja" if "ja" in languages else "en")]["text"]
+        self.assertEqual(row["title"], expected_title)
+        self.assertEqual(row["assignee_harmonized"] or None, ",".join(a["name"] for a in source["assignee_harmonized"]) or None)
+        self.assertEqual(list(row["ipc_codes"]), [c["code"] for c in source["ipc"]])
+
+    def test_without_claims_and_fetch_claims(self):
+        """二段階取得の1段目では claims 列を返さず、2段目で公開番号ごとに取得できる"""
+        df = search_patents_locally(QUERIES["ipc_only"], include_claims=False, snapshot_path=FIXTURE_PATH)
+        self.assertNotIn("claims", df.columns)
+        numbers = df["publication_number"].tolist()[:3]
+        claims = fetch_claims_locally(numbers + ["XX-0000000-A1"], snapshot_path=FIXTURE_PATH)
+        self.assertIsNone(claims["XX-0000000-A1"])
+        for number in numbers:
+            self.assertTrue(claims[number].startswith("1. "))
+
+    def test_keyword_scope(self):
+        """キーワードは指定セクションの ja/en のテキストのいずれかに一致する行だけに一致し、出願人・公開番号・他の言語は対象外"""
+        def texts(*pairs):
+            return [{"text": text, "language": language, "truncated": False} for language, text in pairs]
+
+        def row(number, title, claims=(("en", "1. A device."),), assignee="ACME CORP"):
+            return {
+                "publication_number": number, "country_code": number[:2], "publication_date": 20240101,
+                "title_localized": texts(*title), "abstract_localized": texts(("en", "An apparatus.")),
+                "claims_localized": texts(*claims), "assignee_harmonized": [{"name": assignee, "country_code": number[:2]}],
+                "ipc": [{"code": "H01M10/42", "inventive": True, "first": True, "tree": []}],
+            }
+
+        rows = [
+            # 日本語のタイトルがあり、英語のタイトルにだけキーワードを含む
+            row("JP-7000001-A", [("ja", "電池の検査装置"), ("en", "Battery inspection device")]),
+            # 出願人名にだけキーワードを含む
+            row("JP-7000002-A", [("ja", "センサ装置")], assignee="BATTERY CORP"),
+            # ja/en 以外の言語のテキストにだけキーワードを含む
+            row("DE-7000003-A", [("de", "Battery Prüfgerät"), ("en", "Inspection device")]),
+            # 請求項にだけキーワードを含む
+            row("US-7000004-A", [("en", "Inspection device")], claims=[("en", "1. A battery pack.")]),
+        ]
+        table = pa.Table.from_pylist(rows, schema=pq.read_schema(FIXTURE_PATH))
+        cases = [
+            (SearchQuery(keyword_groups=[["battery"]]), ["US-7000004-A", "JP-7000001-A"]),
+            (SearchQuery(keyword_groups=[["battery"]], keyword_fields=["title", "abstract"]), ["JP-7000001-A"]),
+            (SearchQuery(keyword_groups=[["7000002"]]), []),
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot_path = Path(tmp) / "scope.parquet"
+            pq.write_table(table, snapshot_path)
+            for query, expected in cases:
+                query = query.model_copy(update={"publication_date_from": "20240101", "publication_date_to": "20240101"})
+                with self.subTest(query=query.keyword_groups, fields=query.keyword_fields):
+                    self.assertEqual(reference_search(rows, query), expected)
+                    self.assertEqual(search_patents_locally(query, snapshot_path=snapshot_path)["publication_number"].tolist(), expected)
+                    self.assertEqual(search_patents_with_index(query, snapshot_path=snapshot_path)["publication_number"].tolist(), expected)
+
+    def test_search_tokenizer_follows_log_analyzer_delimiters(self):
+        self.assertEqual(analyze_search_text("Lithium-ion BATTERY, 自動運転 / LiDAR"), ["lithium", "ion", "battery", "自動運転", "lidar"])
+        self.assertTrue(search_matches("A lithium-ion battery.", "Lithium ion"))
+        self.assertFalse(search_matches("電池、自動運転", "自動運転"))
+        self.assertFalse(search_matches("anything", "--"))
+
+
+if __name__ == '__main__':
+    unittest.main()
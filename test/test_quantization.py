@@ -0,0 +1,73 @@
+import sys
+import os
+import unittest
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from patents_core.core import quantization
+from patents_core.core.quantization import QuantizedMatrix, dequantize_vector, quantize_vector
+
+
+class TestQuantization(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        matrix = rng.standard_normal((300, 64)).astype(np.float32)
+        self.matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.vector = rng.standard_normal(64).astype(np.float32)
+        self.vector /= np.linalg.norm(self.vector)
+
+    def test_round_trip_error(self):
+        """復元誤差は float16 では相対 2^-11、int8 では行ごとのスケールの半分以内に収まる"""
+        q = QuantizedMatrix.from_float(self.matrix, "float32")
+        np.testing.assert_array_equal(q.to_float(), self.matrix)
+
+        q = QuantizedMatrix.from_float(self.matrix, "float16")
+        self.assertEqual(q.data.dtype, np.float16)
+        np.testing.assert_allclose(q.to_float(), self.matrix, rtol=2 ** -11, atol=1e-7)
+
+        q = QuantizedMatrix.from_float(self.matrix, "int8")
+        self.assertEqual(q.data.dtype, np.int8)
+        error = np.abs(q.to_float() - self.matrix)
+        self.assertTrue((error <= q.scale[:, None] / 2 + 1e-7).all())
+        self.assertEqual(q.nbytes, self.matrix.size + 300 * 4)
+
+    def test_zero_rows_stay_zero(self):
+        matrix = np.zeros((2, 8), dtype=np.float32)
+        for storage_dtype in ("float16", "int8"):
+            with self.subTest(storage_dtype=storage_dtype):
+                np.testing.assert_array_equal(QuantizedMatrix.from_float(matrix, storage_dtype).to_float(), matrix)
+
+    def test_dot_matches_float32_across_blocks(self):
+        """ブロック単位の内積は、復元した行列との内積と一致し、float32 との差は量子化誤差の範囲に収まる"""
+        expected = self.matrix @ self.vector
+        with mock.patch.object(quantization, "_BLOCK_ROWS", 128):
+            for storage_dtype, atol in (("float32", 1e-6), ("float16", 1e-3), ("int8", 2e-2)):
+                with self.subTest(storage_dtype=storage_dtype):
+                    q = QuantizedMatrix.from_float(self.matrix, storage_dtype)
+                    out = q.dot(self.vector)
+                    self.assertEqual(out.dtype, np.float32)
+                    np.testing.assert_allclose(out, q.to_float() @ self.vector, atol=1e-5)
+                    np.testing.assert_allclose(out, expected, atol=atol)
+
+    def test_vector_round_trip(self):
+        for storage_dtype in ("float32", "float16", "int8"):
+            with self.subTest(storage_dtype=storage_dtype):
+                blob, scale = quantize_vector(self.vector, storage_dtype)
+                self.assertEqual(len(blob), self.vector.size * np.dtype(storage_dtype).itemsize)
+                self.assertEqual(scale is not None, storage_dtype == "int8")
+                restored = dequantize_vector(blob, storage_dtype, scale)
+                expected = QuantizedMatrix.from_float(self.vector[None, :], storage_dtype).to_float()[0]
+                np.testing.assert_allclose(restored, expected, rtol=1e-6)
+
+    def test_unknown_storage_dtype(self):
+        with self.assertRaises(ValueError):
+            QuantizedMatrix.from_float(self.matrix, "bfloat16")
+
+
+if __name__ == '__main__':
+    unittest.main()
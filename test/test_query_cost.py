@@ -0,0 +1,95 @@
+import sys
+import os
+import unittest
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core import async_search, tools
+from patents_core.core.state import SearchQuery
+from patents_core.core.tools import QueryCostLimitExceeded, estimate_query_cost, search_patents_with_cache
+from patents_core.utils import config
+
+GIB = 1024 ** 3
+TIB = 1024 ** 4
+
+
+class FakeJob:
+
+    def __init__(self, total_bytes_processed):
+        self.total_bytes_processed = total_bytes_processed
+
+
+class FakeClient:
+    """ドライランで一定の処理量を返し、ドライランのジョブ設定を記録するクライアント"""
+
+    def __init__(self, total_bytes_processed):
+        self.total_bytes_processed = total_bytes_processed
+        self.dry_run_configs = []
+
+    def query(self, sql, job_config=None):
+        if not job_config.dry_run:
+            raise AssertionError("a job was submitted")
+        self.dry_run_configs.append(job_config)
+        return FakeJob(self.total_bytes_processed)
+
+
+class TestQueryCostLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.query = SearchQuery(ipc_codes=["H01M"], publication_date_from="20200101", publication_date_to="20221231")
+        self.overrides = {
+            "bigquery": {"date_shards": "none", "maximum_bytes_billed": 2 * GIB, "price_per_tib_usd": 6.25},
+            "search_cache": {"enabled": False},
+        }
+        for patcher in (
+            mock.patch.object(config, "_load_config_file", return_value=self.overrides),
+            mock.patch.dict(os.environ, {"PATENTS_SEARCH_BACKEND": "bigquery"}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_estimate_over_the_limit(self):
+        client = FakeClient(3 * GIB)
+        estimate = estimate_query_cost(self.query, client)
+        self.assertEqual(estimate.total_bytes_processed, 3 * GIB)
+        self.assertAlmostEqual(estimate.estimated_cost_usd, 3 * GIB / TIB * 6.25)
+        self.assertEqual(estimate.maximum_bytes_billed, 2 * GIB)
+        self.assertTrue(estimate.exceeds_limit)
+        # ドライランは課金されず、キャッシュされた結果の処理量（0）を返さないようにする
+        job_config = client.dry_run_configs[0]
+        self.assertTrue(job_config.dry_run)
+        self.assertFalse(job_config.use_query_cache)
+        self.assertEqual(job_config.maximum_bytes_billed, 2 * GIB)
+
+        self.assertFalse(estimate_query_cost(self.query, FakeClient(GIB)).exceeds_limit)
+        self.overrides["bigquery"]["maximum_bytes_billed"] = None
+        estimate = estimate_query_cost(self.query, FakeClient(100 * GIB))
+        self.assertIsNone(estimate.maximum_bytes_billed)
+        self.assertFalse(estimate.exceeds_limit)
+
+    def test_yearly_shards_multiply_the_estimate(self):
+        """年ごとの分割検索では、キャッシュにない年の数だけジョブの処理量がかかる"""
+        self.overrides["bigquery"]["date_shards"] = "year"
+        estimate = estimate_query_cost(self.query, FakeClient(GIB))
+        self.assertEqual(estimate.total_bytes_processed, 3 * GIB)
+        self.assertTrue(estimate.exceeds_limit)
+
+    def test_search_over_the_limit_is_refused(self):
+        """見積もりが上限を超える検索は、ジョブを投入せずに QueryCostLimitExceeded を送出する"""
+        estimate = estimate_query_cost(self.query, FakeClient(3 * GIB))
+        with mock.patch.object(tools, "fetch_search_results_arrow", side_effect=AssertionError("searched")):
+            with self.assertRaisesRegex(QueryCostLimitExceeded, "3.0 GiB"):
+                search_patents_with_cache(self.query, estimate)
+
+        with mock.patch.object(async_search, "submit_search_job", side_effect=AssertionError("submitted")), \
+                mock.patch.object(async_search, "get_bigquery_client", return_value=FakeClient(0)):
+            handle = async_search.submit_search(self.query, estimate)
+            self.assertTrue(handle.done())
+            with self.assertRaises(QueryCostLimitExceeded):
+                handle.result()
+
+
+if __name__ == '__main__':
+    unittest.main()
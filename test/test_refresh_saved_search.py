@@ -0,0 +1,91 @@
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# エージェントの読み込み時に埋め込みバックエンドが作られるため、外部APIを使わないバックエンドを先に指定する
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PATENTS_EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("PATENTS_EMBEDDING_CACHE", os.path.join(_TMP.name, "embeddings.sqlite3"))
+
+from patents_core.core import agent
+from patents_core.core.agent import analyze_results, refresh_saved_search, scored_results
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.saved_search import load_saved_search, save_search
+from patents_core.core.state import AppState, SearchQuery
+from patents_core.utils import config
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+TOP_K = 5
+
+
+class TestRefreshSavedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        overrides = {
+            "cascade": {"enabled": False},
+            "saved_search": {"path": self.tmp.name},
+            "scoring": {"top_k": TOP_K},
+            "search_cache": {"enabled": False},
+        }
+        self.config = mock.patch.object(config, "_load_config_file", return_value=overrides)
+        self.config.start()
+        self.query = SearchQuery(keyword_groups=[["sensor", "battery", "robot"]], max_results_per_country=1000, limit=1000)
+        results = search_patents_locally(self.query.model_copy(update={"publication_date_to": "20991231"}), snapshot_path=FIXTURE_PATH)
+        results = results.sort_values("publication_date", kind="stable").reset_index(drop=True)
+        self.initial = results.iloc[:20].reset_index(drop=True)
+        self.new_df = results.iloc[20:30].reset_index(drop=True)
+
+    def tearDown(self):
+        self.config.stop()
+        self.tmp.cleanup()
+
+    def save_initial(self):
+        state = AppState(search_query=self.query, plan_text="センサを用いた電池の異常検知")
+        state.search_results = self.initial
+        state = analyze_results(state)
+        self.assertEqual(len(state.analyzed_results), TOP_K)
+        save_search("watch", self.query, state.plan_text, scored_results(state), state.similarity_weights)
+
+    def test_refresh_stores_every_row_beyond_top_k(self):
+        """scoring.top_k より多い行を保存していても、再実行後の保存結果から上位k件以外の行が失われない"""
+        self.save_initial()
+        _, stored = load_saved_search("watch")
+        self.assertEqual(len(stored), len(self.initial))
+
+        with mock.patch.object(agent, "search_new_publications", return_value=self.new_df):
+            state = refresh_saved_search("watch")
+        self.assertIsNone(state.error)
+        self.assertEqual(len(state.analyzed_results), TOP_K)
+
+        _, stored = load_saved_search("watch")
+        expected = set(self.initial["publication_number"]) | set(self.new_df["publication_number"])
+        self.assertEqual(set(stored["publication_number"]), expected)
+        self.assertEqual(len(stored), len(expected))
+        # 保存結果はスコア順で、表示用の上位k件はその先頭と一致する
+        self.assertTrue((np.diff(stored["score"].to_numpy()) <= 0).all())
+        pd.testing.assert_series_equal(
+            state.analyzed_results["publication_number"].reset_index(drop=True),
+            stored["publication_number"].iloc[:TOP_K].reset_index(drop=True),
+        )
+
+        # 新しい公開がない再実行でも、保存結果は全行のまま
+        with mock.patch.object(agent, "search_new_publications", return_value=pd.DataFrame()):
+            state = refresh_saved_search("watch")
+        self.assertIsNone(state.error)
+        self.assertEqual(len(state.analyzed_results), TOP_K)
+        _, stored = load_saved_search("watch")
+        self.assertEqual(len(stored), len(expected))
+
+if __name__ == '__main__':
+    unittest.main()
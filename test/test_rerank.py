@@ -0,0 +1,79 @@
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# エージェントの読み込み時に埋め込みバックエンドが作られるため、外部APIを使わないバックエンドを先に指定する
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PATENTS_EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("PATENTS_EMBEDDING_CACHE", os.path.join(_TMP.name, "embeddings.sqlite3"))
+
+from patents_core.core import agent
+from patents_core.core.agent import analyze_results, rerank_results
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.state import AppState, SearchQuery
+from patents_core.utils import config
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class TestRerank(unittest.TestCase):
+
+    def setUp(self):
+        overrides = {"cascade": {"enabled": False}, "scoring": {"top_k": None}}
+        self.config = mock.patch.object(config, "_load_config_file", return_value=overrides)
+        self.config.start()
+        query = SearchQuery(keyword_groups=[["sensor", "battery"]], max_results_per_country=20, limit=60)
+        self.state = AppState(search_query=query, plan_text="センサを用いた電池の異常検知 battery sensor anomaly detection")
+        self.state.search_results = search_patents_locally(query, snapshot_path=FIXTURE_PATH)
+        self.state = analyze_results(self.state)
+
+    def tearDown(self):
+        self.config.stop()
+
+    def test_weights_change_the_order_without_embedding_again(self):
+        """重みを変えた再ランキングは、保持済みのセクション別類似度だけから計算し、埋め込みを計算し直さない"""
+        similarities = self.state.section_similarities.copy()
+        weights = {"title": 0.0, "abstract": 0.0, "claims": 1.0}
+        self.state.similarity_weights = weights
+        with mock.patch.object(agent, "embed_sections", side_effect=AssertionError("embedded again")):
+            state = rerank_results(self.state)
+
+        np.testing.assert_array_equal(state.section_similarities, similarities)
+        results = state.analyzed_results
+        self.assertEqual(len(results), len(state.search_results))
+        np.testing.assert_allclose(results["score"].to_numpy(), results["sim_claims"].to_numpy(), atol=1e-6)
+        self.assertTrue((np.diff(results["score"].to_numpy()) <= 0).all())
+        # 各行の類似度の列は、その行の検索結果と対応したまま並べ替えられる
+        by_number = dict(zip(state.search_results["publication_number"], similarities[:, 2]))
+        for number, sim_claims in zip(results["publication_number"], results["sim_claims"]):
+            self.assertAlmostEqual(by_number[number], sim_claims, places=6)
+
+    def test_reduced_dimensions_use_the_leading_components(self):
+        """embedding.dimensions を指定すると、各ベクトルの先頭の次元だけを再正規化してコサイン類似度を計算する"""
+        with mock.patch.dict(os.environ, {"PATENTS_EMBEDDING_DIMENSIONS": "512"}):
+            reduced, _ = agent.compute_section_similarities(self.state.search_results, self.state.plan_text, {})
+        self.assertEqual(reduced.shape, self.state.section_similarities.shape)
+
+        def leading(vectors):
+            vectors = np.asarray(vectors, dtype=np.float32)[..., :512]
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+        titles = self.state.search_results["title"].astype(str).tolist()
+        expected = leading(agent.embeddings_model.embed_documents(titles)) @ leading(agent.embeddings_model.embed_query(self.state.plan_text))
+        # 埋め込みキャッシュの量子化誤差は許容する
+        np.testing.assert_allclose(reduced[:, 0], expected, atol=1e-3)
+        self.assertTrue((expected != 0).any())
+        self.assertFalse(np.allclose(reduced[:, 0], self.state.section_similarities[:, 0], atol=1e-3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import sys
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core.local_backend import search_patents_locally
+import pyarrow as pa
+
+from patents_core.core.result_cursor import close_result_cursor, fetch_more, open_result_cursor
+from patents_core.core.state import ResultCursor, SearchQuery
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class TestResultCursor(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {"PATENTS_SEARCH_BACKEND": "duckdb", "PATENTS_LOCAL_SNAPSHOT": str(FIXTURE_PATH)}
+        self.env = mock.patch.dict(os.environ, env)
+        self.env.start()
+        self.config = mock.patch(
+            "patents_core.core.result_cursor.load_config_section",
+            return_value={"max_per_country": 20, "max_rows": 1000, "path": self.tmp.name, "ttl_hours": 1},
+        )
+        self.config.start()
+
+    def tearDown(self):
+        self.config.stop()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_pages_continue_without_repeating_rows(self):
+        """続きのページは取得済みの行を含まず、公開日の新しい順に、候補を読み終えるまで返る"""
+        query = SearchQuery(keyword_groups=[["sensor", "battery"]], max_results_per_country=2, limit=5)
+        first = search_patents_locally(query, snapshot_path=FIXTURE_PATH)["publication_number"].tolist()
+        cursor = open_result_cursor(query, first)
+
+        pages = [fetch_more(cursor, 7), fetch_more(cursor, 7)]
+        for page in pages:
+            self.assertEqual(len(page), 7)
+            dates = page["publication_date"].tolist()
+            self.assertEqual(dates, sorted(dates, reverse=True))
+        fetched = [n for page in pages for n in page["publication_number"].tolist()]
+        self.assertEqual(len(set(fetched + first)), len(fetched) + len(first))
+
+        rest = fetch_more(cursor, 10000)
+        wider = query.model_copy(update={"max_results_per_country": 20, "limit": 1000})
+        candidates = search_patents_locally(wider, snapshot_path=FIXTURE_PATH)["publication_number"].tolist()
+        self.assertEqual(sorted(first + fetched + rest["publication_number"].tolist()), sorted(candidates))
+        self.assertTrue(fetch_more(cursor, 5).empty)
+
+    def test_cursor_files_are_removed(self):
+        """読み終えたカーソル・閉じたカーソル・期限切れのカーソルのファイルは削除される"""
+        query = SearchQuery(keyword_groups=[["sensor", "battery"]], max_results_per_country=2, limit=5)
+        cursor = open_result_cursor(query)
+        self.assertTrue(Path(cursor.location).exists())
+        fetch_more(cursor, 5)
+        self.assertTrue(Path(cursor.location).exists())
+        fetch_more(cursor, 10000)
+        self.assertFalse(Path(cursor.location).exists())
+
+        cursor = open_result_cursor(query)
+        close_result_cursor(cursor)
+        self.assertFalse(Path(cursor.location).exists())
+
+        stale = open_result_cursor(query)
+        expired = time.time() - 2 * 3600
+        os.utime(stale.location, (expired, expired))
+        fresh = open_result_cursor(query)
+        self.assertFalse(Path(stale.location).exists())
+        self.assertTrue(Path(fresh.location).exists())
+
+    def test_bigquery_rows_are_read_as_job_results(self):
+        """BigQueryのカーソルは、一時テーブルではなくジョブの結果として（ORDER BY の順序で）位置を指定して読む"""
+        requests = []
+
+        class FakeRows:
+            def __init__(self, start, count):
+                self.start, self.count = start, count
+
+            def to_arrow(self, create_bqstorage_client=True):
+                self.create_bqstorage_client = create_bqstorage_client
+                numbers = [f"JP-{i}" for i in range(self.start, min(self.start + self.count, 3))]
+                return pa.table({"publication_number": pa.array(numbers, pa.string())})
+
+        class FakeJob:
+            def result(self, start_index=None, max_results=None):
+                rows = FakeRows(start_index, max_results)
+                requests.append(rows)
+                return rows
+
+        class FakeClient:
+            def get_job(self, job_id, location=None):
+                self.job = (job_id, location)
+                return FakeJob()
+
+        client = FakeClient()
+        cursor = ResultCursor(backend="bigquery", location="p.d.t", total_rows=3, job_id="job_1", job_location="US", seen=["JP-0"])
+        with mock.patch("patents_core.core.result_cursor.get_bigquery_client", return_value=client):
+            page = fetch_more(cursor, 2)
+        self.assertEqual(page["publication_number"].tolist(), ["JP-1", "JP-2"])
+        self.assertEqual(client.job, ("job_1", "US"))
+        self.assertEqual(requests[0].start, 0)
+        self.assertFalse(requests[0].create_bqstorage_client)
+        self.assertEqual(cursor.position, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import sys
+import os
+import datetime
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.saved_search import load_saved_search, record_run, save_search, search_new_publications
+from patents_core.core.state import SearchQuery
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+TODAY = datetime.date(2026, 1, 1)
+
+
+class TestSavedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = mock.patch(
+            "patents_core.core.saved_search.load_config_section",
+            return_value={"max_new_per_country": 1000, "max_new_rows": 5000, "path": self.tmp.name},
+        )
+        self.config.start()
+        self.query = SearchQuery(keyword_groups=[["sensor", "battery", "robot"]], max_results_per_country=1000, limit=1000)
+
+    def tearDown(self):
+        self.config.stop()
+        self.tmp.cleanup()
+
+    def search(self, snapshot_path):
+        """スナップショットを検索し、渡された検索条件を記録する検索関数"""
+        searched = []
+
+        def run(query):
+            searched.append(query)
+            return search_patents_locally(query, snapshot_path=snapshot_path)
+
+        return searched, run
+
+    def test_refresh_searches_only_from_the_watermark(self):
+        """保存時点のスナップショットになかった公開（ウォーターマークと同じ日に後から追加されたものを含む）だけが返る"""
+        full = search_patents_locally(self.query.model_copy(update={"publication_date_to": "20991231"}), snapshot_path=FIXTURE_PATH)
+        # 同じ公開日に2件以上ある日のうち、中ほどの日で区切る（その日の1件を後から追加された公開とする）
+        counts = full["publication_date"].value_counts()
+        dates = sorted(counts[counts >= 2].index.tolist())
+        cutoff = int(dates[len(dates) // 2])
+        held_back = full[full["publication_date"] == cutoff]["publication_number"].tolist()[0]
+
+        table = pq.read_table(FIXTURE_PATH)
+        old = table.filter(pc.and_(
+            pc.less_equal(table["publication_date"], cutoff),
+            pc.not_equal(table["publication_number"], held_back),
+        ))
+        old_path = Path(self.tmp.name) / "old.parquet"
+        pq.write_table(old, old_path)
+
+        initial = search_patents_locally(self.query.model_copy(update={"publication_date_to": "20991231"}), snapshot_path=old_path)
+        initial = initial.assign(sim_title=0.0, sim_abstract=0.0, sim_claims=0.0, score=0.0)
+        saved = save_search("watch", self.query, "センサとバッテリー", initial)
+        self.assertEqual(saved.watermark, cutoff)
+
+        searched, run = self.search(FIXTURE_PATH)
+        saved, stored = load_saved_search("watch")
+        self.assertEqual(len(stored), len(initial))
+        new_df = search_new_publications(saved, search=run, today=TODAY)
+        self.assertEqual(searched[0].publication_date_from, str(cutoff))
+        self.assertEqual(searched[0].publication_date_to, "20260101")
+
+        expected = full[(full["publication_date"] >= cutoff) & (full["publication_date"] <= 20260101)]
+        expected = [n for n in expected["publication_number"].tolist() if n not in set(initial["publication_number"])]
+        self.assertIn(held_back, expected)
+        self.assertEqual(sorted(new_df["publication_number"].tolist()), sorted(expected))
+
+        record_run(saved, stored, new_df)
+        saved, _ = load_saved_search("watch")
+        self.assertEqual(saved.watermark, int(new_df["publication_date"].max()))
+        self.assertEqual(len(saved.seen), len(initial) + len(new_df))
+        self.assertTrue(search_new_publications(saved, search=run, today=TODAY).empty)
+
+    def test_rejects_unscored_results_and_bad_names(self):
+        results = search_patents_locally(self.query, snapshot_path=FIXTURE_PATH)
+        with self.assertRaises(ValueError):
+            save_search("watch", self.query, "plan", results)
+        with self.assertRaises(ValueError):
+            save_search("../watch", self.query, "plan")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import sys
+import os
+import unittest
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from patents_core.core.scoring import ScoringEngine, rank, top_k_indices, weight_vector
+
+
+class TestTopKIndices(unittest.TestCase):
+
+    def test_matches_a_full_sort(self):
+        scores = np.random.default_rng(0).random(1000).astype(np.float32)
+        full = np.argsort(-scores, kind="stable")
+        for k in (1, 10, 999):
+            with self.subTest(k=k):
+                np.testing.assert_array_equal(top_k_indices(scores, k), full[:k])
+
+    def test_ties_are_ordered_by_index(self):
+        """同じスコアの行は、部分ソートでも全件ソートでもインデックスの小さい順に選ばれる"""
+        scores = np.array([0.5] * 10 + [0.9, 0.5, 0.1], dtype=np.float32)
+        np.testing.assert_array_equal(top_k_indices(scores, 3), [10, 0, 1])
+        np.testing.assert_array_equal(top_k_indices(scores, 11), [10] + list(range(10)))
+        np.testing.assert_array_equal(top_k_indices(scores, None)[:12], [10] + list(range(10)) + [11])
+
+    def test_k_outside_the_row_count(self):
+        scores = np.array([0.2, 0.8, 0.5], dtype=np.float32)
+        np.testing.assert_array_equal(top_k_indices(scores, 3), [1, 2, 0])
+        np.testing.assert_array_equal(top_k_indices(scores, 10), [1, 2, 0])
+        np.testing.assert_array_equal(top_k_indices(scores, None), [1, 2, 0])
+        self.assertEqual(top_k_indices(scores, 0).size, 0)
+        self.assertEqual(top_k_indices(np.empty(0, dtype=np.float32), 5).size, 0)
+
+
+class TestScoring(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.plan = rng.standard_normal(32).astype(np.float32)
+        self.matrices = {name: rng.standard_normal((50, 32)).astype(np.float32) for name in ("title", "abstract", "claims")}
+
+    def test_similarities_are_cosine(self):
+        engine = ScoringEngine(self.plan, self.matrices)
+        plan = self.plan / np.linalg.norm(self.plan)
+        for i, name in enumerate(("title", "abstract", "claims")):
+            matrix = self.matrices[name] / np.linalg.norm(self.matrices[name], axis=1, keepdims=True)
+            np.testing.assert_allclose(engine.similarities()[:, i], matrix @ plan, atol=1e-6)
+
+    def test_quantized_engines_rank_like_float32(self):
+        """float16 / int8 で保持しても、スコアは float32 と量子化誤差の範囲で一致する"""
+        weights = {"title": 0.5, "abstract": 0.3, "claims": 0.2}
+        expected = ScoringEngine(self.plan, self.matrices).score(weights)
+        for storage_dtype, atol in (("float16", 1e-3), ("int8", 2e-2)):
+            with self.subTest(storage_dtype=storage_dtype):
+                score = ScoringEngine(self.plan, self.matrices, storage_dtype=storage_dtype).score(weights)
+                np.testing.assert_allclose(score, expected, atol=atol)
+
+    def test_rank_returns_top_k_and_all_scores(self):
+        similarities = ScoringEngine(self.plan, self.matrices).similarities()
+        weights = {"title": 1.0, "abstract": 0.0, "claims": 0.0}
+        order, score = rank(similarities, weights, top_k=5)
+        self.assertEqual(score.shape, (50,))
+        np.testing.assert_allclose(score, similarities[:, 0], atol=1e-6)
+        np.testing.assert_array_equal(order, np.argsort(-score, kind="stable")[:5])
+        order, _ = rank(similarities, weights, top_k=100)
+        self.assertEqual(sorted(order.tolist()), list(range(50)))
+
+    def test_missing_weights_use_the_defaults(self):
+        np.testing.assert_allclose(weight_vector({"claims": 1.0}), [0.4, 0.4, 1.0])
+        np.testing.assert_allclose(weight_vector({}, ("claims", "other")), [0.2, 0.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import os
+import datetime
+import tempfile
+import unittest
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+
+from patents_core.core.search_cache import (
+    DEFAULT_PUBLICATION_DATE_FROM,
+    SearchResultCache,
+    canonicalize_search_query,
+    default_publication_date_to,
+    search_query_hash,
+)
+from patents_core.core.state import SearchQuery
+
+TEMPLATE_VERSION = "test-1"
+
+
+class TestSearchQueryHash(unittest.TestCase):
+
+    def assertSameHash(self, a: SearchQuery, b: SearchQuery):
+        self.assertEqual(search_query_hash(a, TEMPLATE_VERSION), search_query_hash(b, TEMPLATE_VERSION))
+
+    def assertDifferentHash(self, a: SearchQuery, b: SearchQuery):
+        self.assertNotEqual(search_query_hash(a, TEMPLATE_VERSION), search_query_hash(b, TEMPLATE_VERSION))
+
+    def test_ipc_width_case_and_spacing(self):
+        self.assertSameHash(
+            SearchQuery(ipc_codes=["Ｇ０６Ｆ　１７／００", "h01m 10/05"]),
+            SearchQuery(ipc_codes=["H01M10/05", "G06F17/00", "g06f17/00"]),
+        )
+        self.assertDifferentHash(SearchQuery(ipc_codes=["G06F17/00"]), SearchQuery(ipc_codes=["G06F17/10"]))
+
+    def test_keyword_order_and_width(self):
+        self.assertSameHash(
+            SearchQuery(keyword_groups=[["battery", "ｓｅｎｓｏｒ "], ["電池"]]),
+            SearchQuery(keyword_groups=[["電池", "電池"], ["sensor", "battery"], []]),
+        )
+        # グループの組み方（AND と OR）が違えば別の検索になる
+        self.assertDifferentHash(
+            SearchQuery(keyword_groups=[["battery", "sensor"]]),
+            SearchQuery(keyword_groups=[["battery"], ["sensor"]]),
+        )
+
+    def test_date_formats_and_defaults(self):
+        self.assertSameHash(
+            SearchQuery(publication_date_from="2020-01-01", publication_date_to="2021/12/31"),
+            SearchQuery(publication_date_from="20200101", publication_date_to="20211231"),
+        )
+        self.assertSameHash(
+            SearchQuery(),
+            SearchQuery(publication_date_from=DEFAULT_PUBLICATION_DATE_FROM, publication_date_to=default_publication_date_to()),
+        )
+        self.assertDifferentHash(SearchQuery(publication_date_from="20200101"), SearchQuery(publication_date_from="20200102"))
+
+    def test_other_fields(self):
+        self.assertSameHash(
+            SearchQuery(country_codes=["jp", "US"], assignees=["Toyota Motor Corp.", "ＳＯＮＹ"], keyword_fields=["Claims", "title"]),
+            SearchQuery(country_codes=["US", "JP"], assignees=["sony", "TOYOTA MOTOR CORP"], keyword_fields=["title", "claims"]),
+        )
+        # 表示用の keywords はSQLに使われないため、キーに含めない
+        self.assertSameHash(SearchQuery(ipc_codes=["H01M"], keywords=["a", "b"]), SearchQuery(ipc_codes=["H01M"]))
+        self.assertDifferentHash(SearchQuery(ipc_codes=["H01M"], limit=10), SearchQuery(ipc_codes=["H01M"], limit=20))
+
+    def test_template_version_is_part_of_the_key(self):
+        query = SearchQuery(ipc_codes=["H01M"])
+        self.assertNotEqual(search_query_hash(query, "v1"), search_query_hash(query, "v2"))
+
+    def test_canonical_form(self):
+        canonical = canonicalize_search_query(SearchQuery(
+            ipc_codes=[" h01m 10/05 ", ""],
+            keyword_groups=[["b", "a"], []],
+            publication_date_from="2020.01.01",
+            publication_date_to="2020",
+        ))
+        self.assertEqual(canonical.ipc_codes, ["H01M10/05"])
+        self.assertEqual(canonical.keyword_groups, [["a", "b"]])
+        self.assertEqual(canonical.publication_date_from, "20200101")
+        # 8桁にならない日付は既定の範囲（終了日は当日）で埋める
+        self.assertEqual(canonical.publication_date_to, default_publication_date_to())
+        self.assertEqual(default_publication_date_to(datetime.date(2026, 3, 4)), "20260304")
+
+
+class TestSearchResultCache(unittest.TestCase):
+
+    def test_contains_follows_ttl_without_reading(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = SearchResultCache(tmp, ttl_seconds=3600, max_bytes=1024 ** 2)
+            self.assertFalse(cache.contains("key"))
+            cache.put("key", pd.DataFrame({"publication_number": ["JP-1-A"]}))
+            self.assertTrue(cache.contains("key"))
+            cache.ttl_seconds = -1
+            self.assertFalse(cache.contains("key"))
+            self.assertIsNone(cache.get("key"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import sys
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core.local_backend import search_patents_locally
+from patents_core.core.search_cache import SearchResultCache
+from patents_core.core.sharded_search import search_patents_sharded, split_date_range
+from patents_core.core.state import SearchQuery
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class TestShardedSearch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SearchResultCache(Path(self.tmp.name), ttl_seconds=3600, max_bytes=64 * 1024 * 1024)
+        self.executed = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_shard(self, shard_query: SearchQuery):
+        self.executed.append((shard_query.publication_date_from, shard_query.publication_date_to))
+        return search_patents_locally(shard_query, snapshot_path=FIXTURE_PATH)
+
+    def test_split_date_range_by_year(self):
+        self.assertEqual(
+            split_date_range("20190315", "20210110"),
+            [("20190315", "20191231"), ("20200101", "20201231"), ("20210101", "20210110")],
+        )
+        self.assertEqual(split_date_range("20200101", "20200101"), [("20200101", "20200101")])
+
+    def test_merged_shards_match_single_query(self):
+        """年ごとの結果をマージした結果が、全期間を1つのクエリで検索した結果と一致する"""
+        queries = [
+            SearchQuery(max_results_per_country=3, limit=100, publication_date_from="20080101", publication_date_to="20251231"),
+            SearchQuery(ipc_codes=["G06N", "H04L"], max_results_per_country=5, limit=12, publication_date_from="20080101"),
+            SearchQuery(keyword_groups=[["sensor", "電池"]], country_codes=["JP", "US"], max_results_per_country=40),
+        ]
+        for query in queries:
+            with self.subTest(query=query):
+                merged, _ = search_patents_sharded(query, run_shard=self.run_shard, cache=self.cache)
+                single = search_patents_locally(query, snapshot_path=FIXTURE_PATH)
+                self.assertEqual(merged["publication_number"].tolist(), single["publication_number"].tolist())
+
+    def test_widening_the_date_range_only_runs_new_shards(self):
+        query = SearchQuery(ipc_codes=["G06"], publication_date_from="20180101", publication_date_to="20191231")
+        _, age = search_patents_sharded(query, run_shard=self.run_shard, cache=self.cache)
+        self.assertIsNone(age)
+        self.assertEqual(len(self.executed), 2)
+
+        self.executed.clear()
+        wider = query.model_copy(update={"publication_date_to": "20201231"})
+        _, age = search_patents_sharded(wider, run_shard=self.run_shard, cache=self.cache)
+        self.assertEqual(self.executed, [("20200101", "20201231")])
+        self.assertIsNone(age)
+
+        self.executed.clear()
+        _, age = search_patents_sharded(wider, run_shard=self.run_shard, cache=self.cache)
+        self.assertEqual(self.executed, [])
+        self.assertIsNotNone(age)
+
+
+if __name__ == '__main__':
+    unittest.main()
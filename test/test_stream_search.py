@@ -0,0 +1,61 @@
+import sys
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# エージェントの読み込み時に埋め込みバックエンドが作られるため、外部APIを使わないバックエンドを先に指定する
+_TMP = tempfile.TemporaryDirectory()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("PATENTS_EMBEDDING_BACKEND", "hashing")
+os.environ.setdefault("PATENTS_EMBEDDING_CACHE", os.path.join(_TMP.name, "embeddings.sqlite3"))
+
+from patents_core.core.agent import run_streaming_search
+from patents_core.core.async_search import SearchHandle
+from patents_core.core.state import AppState, SearchQuery
+from patents_core.utils import config
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "fixtures" / "publications_fixture.parquet"
+
+
+class FakeQueryJob:
+    job_id = "job_1"
+
+    def __init__(self):
+        self.cancel_requested = False
+
+    def done(self):
+        return False
+
+    def cancel(self):
+        self.cancel_requested = True
+
+
+class TestStreamSearch(unittest.TestCase):
+
+    def test_streaming_cancels_the_submitted_search(self):
+        """ページ単位で検索する場合は、SQL生成時に投入済みの検索を中止して二重に実行しない"""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        overrides = {"search_cache": {"enabled": False}, "streaming": {"page_size": 20, "spill_dir": tmp.name, "top_k": 10}}
+        env = {"PATENTS_SEARCH_BACKEND": "duckdb", "PATENTS_LOCAL_SNAPSHOT": str(FIXTURE_PATH)}
+        query = SearchQuery(keyword_groups=[["sensor", "battery"]], max_results_per_country=50, limit=100)
+        job = FakeQueryJob()
+        state = AppState(search_query=query, plan_text="センサを用いた電池の異常検知")
+        state.search_handle = SearchHandle(query, Future(), job)
+
+        with mock.patch.object(config, "_load_config_file", return_value=overrides), mock.patch.dict(os.environ, env):
+            state = run_streaming_search(state)
+        self.assertTrue(job.cancel_requested)
+        self.assertIsNone(state.search_handle)
+        self.assertIsNone(state.error)
+        self.assertEqual(len(state.analyzed_results), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
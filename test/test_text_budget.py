@@ -0,0 +1,52 @@
+import sys
+import os
+import unittest
+
+# プロジェクトルートをPythonパスに追加
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from patents_core.core.text_budget import DEFAULT_BUDGET_CONFIG, apply_text_budget, count_tokens, extract_first_claim
+
+EN_CLAIMS = "1. A battery pack comprising a sensor. 2. The battery pack of claim 1, wherein the sensor is a thermistor. 3. A vehicle."
+JA_CLAIMS = "【請求項１】電池と、センサとを備える電池パック。【請求項２】前記センサはサーミスタである請求項１に記載の電池パック。"
+
+
+class TestTextBudget(unittest.TestCase):
+
+    def test_sections_are_truncated_to_their_budget(self):
+        config = {**DEFAULT_BUDGET_CONFIG, "title_tokens": 5, "abstract_tokens": 12}
+        stats = {}
+        long_text = "battery sensor anomaly detection " * 20
+        for section in ("title", "abstract"):
+            with self.subTest(section=section):
+                pieces = apply_text_budget(section, long_text, config, stats)
+                self.assertEqual(len(pieces), 1)
+                self.assertLessEqual(count_tokens(pieces[0]), config[f"{section}_tokens"])
+                self.assertTrue(long_text.startswith(pieces[0]))
+        self.assertEqual(stats["tokens_original"], 2 * count_tokens(long_text))
+        self.assertEqual(stats["tokens_saved"], stats["tokens_original"] - stats["tokens_budgeted"])
+        self.assertEqual(apply_text_budget("title", "  ", config), [])
+
+    def test_first_claim_mode(self):
+        self.assertEqual(extract_first_claim(EN_CLAIMS), "A battery pack comprising a sensor.")
+        self.assertEqual(extract_first_claim(JA_CLAIMS), "電池と、センサとを備える電池パック。")
+        self.assertEqual(extract_first_claim("no numbered claims"), "no numbered claims")
+        pieces = apply_text_budget("claims", EN_CLAIMS, {**DEFAULT_BUDGET_CONFIG, "claims_mode": "first_claim"})
+        self.assertEqual(pieces, ["A battery pack comprising a sensor."])
+
+    def test_chunk_mode_is_limited_by_chunk_size_and_budget(self):
+        claims = "a battery pack with a sensor " * 200
+        config = {**DEFAULT_BUDGET_CONFIG, "claims_mode": "chunk", "chunk_tokens": 16, "max_chunks": 8, "claims_tokens": 48}
+        pieces = apply_text_budget("claims", claims, config)
+        # 予算（48トークン）に収まるチャンク数（3個）までに制限される
+        self.assertEqual(len(pieces), 3)
+        for piece in pieces:
+            self.assertLessEqual(count_tokens(piece), 16)
+        self.assertTrue(claims.startswith("".join(pieces)))
+
+        pieces = apply_text_budget("claims", claims, {**config, "claims_tokens": 10 ** 6})
+        self.assertEqual(len(pieces), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()